@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Stand-in for talosctl, to exercise rollout.py without a cluster.
+
+Implements the calls rollout.py makes, against nodes simulated in a state
+directory: apply-config, upgrade, read of the boot ID and get of
+machinestatus and the etcd service. apply-config in auto or reboot mode
+returns at once and takes the node down for --reboot-seconds, after which it
+comes back with a new boot ID, like a real node does. upgrade reboots the
+node before it returns, like `talosctl upgrade --wait`.
+
+Configured from the environment, since rollout.py passes talosctl arguments only:
+
+    FAKE_TALOSCTL_STATE           State directory (default: <tmp>/fake-talosctl)
+    FAKE_TALOSCTL_REBOOT_SECONDS  How long a reboot keeps a node down (default: 3)
+    FAKE_TALOSCTL_FAIL            Comma-separated addresses whose apply or upgrade fails
+    FAKE_TALOSCTL_SICK            Comma-separated addresses whose etcd never gets healthy
+
+Usage (after `task configure`, from the repository root):
+    TALOSCTL=.taskfiles/talos/resources/fake_talosctl.py \\
+        python .taskfiles/talos/resources/rollout.py apply --poll-interval 0.5
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+STATE_DIR = Path(
+    os.environ.get("FAKE_TALOSCTL_STATE", Path(tempfile.gettempdir()) / "fake-talosctl")
+)
+REBOOT_SECONDS = float(os.environ.get("FAKE_TALOSCTL_REBOOT_SECONDS", "3"))
+FAILING = set(filter(None, os.environ.get("FAKE_TALOSCTL_FAIL", "").split(",")))
+SICK = set(filter(None, os.environ.get("FAKE_TALOSCTL_SICK", "").split(",")))
+
+
+def option(args: list[str], name: str) -> str | None:
+    return args[args.index(name) + 1] if name in args else None
+
+
+def load(node: str) -> dict:
+    path = STATE_DIR / f"{node}.json"
+    if path.exists():
+        return json.loads(path.read_text())
+    return {"boot_id": str(uuid.uuid4()), "down_until": 0.0}
+
+
+def save(node: str, state: dict) -> None:
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    (STATE_DIR / f"{node}.json").write_text(json.dumps(state))
+
+
+def reboot(state: dict) -> None:
+    state["boot_id"] = str(uuid.uuid4())
+    state["down_until"] = time.time() + REBOOT_SECONDS
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    node = option(args, "--nodes")
+    if not args or node is None:
+        print("fake talosctl: --nodes is required", file=sys.stderr)
+        return 1
+    state = load(node)
+    down = time.time() < state["down_until"]
+
+    if args[0] in ("apply-config", "upgrade"):
+        if down:
+            print(f"rpc error: {node} is unreachable", file=sys.stderr)
+            return 1
+        if node in FAILING:
+            print(f"rpc error: {args[0]} failed on {node}", file=sys.stderr)
+            return 1
+        if args[0] == "upgrade":
+            reboot(state)
+            time.sleep(REBOOT_SECONDS)
+        elif option(args, "--mode") in ("auto", "reboot"):
+            reboot(state)
+            print("Applied configuration with a reboot", file=sys.stderr)
+        else:
+            print("Applied configuration without a reboot", file=sys.stderr)
+        save(node, state)
+        return 0
+
+    if down:
+        print(f"rpc error: {node} is unreachable", file=sys.stderr)
+        return 1
+    save(node, state)
+    if args[0] == "read":
+        print(state["boot_id"])
+        return 0
+    if args[0] == "get" and args[1] == "machinestatus":
+        spec = {"stage": "running", "status": {"ready": True}}
+    elif args[0] == "get" and args[1:3] == ["service", "etcd"]:
+        spec = {"running": True, "healthy": node not in SICK}
+    else:
+        print(f"fake talosctl: unsupported command: {' '.join(args)}", file=sys.stderr)
+        return 1
+    print(json.dumps({"spec": spec}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Generate Talos machine configs per node, only for nodes whose inputs changed.
+
+`talhelper genconfig` builds the machine config of every node in
+talconfig.yaml on every run, even when a single node's mac_addr or disk
+changed. A node's machine config only depends on the cluster-wide settings,
+its own entry and the patches that apply to it. So talconfig.yaml is split
+into one shard per node:
+
+- the cluster-wide keys, without the controlPlane or worker section that does
+  not apply to the node,
+- the node's entry,
+- patch references rewritten to absolute paths, so the shard can live outside
+  the talos directory.
+
+Each shard is written to .cache/talos/shards/<hostname>.yaml. Its hash covers
+the shard, the patch files it references, the env and secret files talhelper
+reads, and the talhelper version. Only shards whose hash changed, or whose
+machine config is missing, run `talhelper genconfig`. Those runs use a
+bounded pool of workers, each with its own output directory, and the node's
+file is then moved into clusterconfig/.
+
+The talosconfig lists every control plane node as an endpoint. It comes from
+one more shard that holds every control plane entry, and it is generated
+again only when that shard changes.
+
+A secret file (talsecret.sops.yaml) is required: without one, talhelper
+generates new cluster secrets on every run, and the shards would not belong
+to the same cluster.
+
+The machine configs in clusterconfig/ are git-ignored and written in
+plaintext, as `talhelper genconfig` does, so nothing is encrypted here.
+
+Usage:
+    python genconfig.py                   # Regenerate the nodes whose shard changed
+    python genconfig.py --jobs 4          # Limit the worker pool
+    python genconfig.py --force           # Regenerate every node
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+ROOT_DIR = Path(__file__).resolve().parents[3]
+DEFAULT_TALOS_DIR = ROOT_DIR / "talos"
+DEFAULT_CACHE_DIR = ROOT_DIR / ".cache" / "talos"
+CACHE_FILE = "shards.json"
+# Bump to regenerate every node when the sharding scheme changes
+CACHE_VERSION = 1
+OUTPUT_DIR = "clusterconfig"
+TALOSCONFIG = "talosconfig"
+# Shard name of the talosconfig; hostnames cannot start with a dot
+CLIENT_SHARD = ".talosconfig"
+
+# The files talhelper genconfig reads by default, besides the config file
+ENV_FILES = ("talenv.yaml", "talenv.sops.yaml", "talenv.yml", "talenv.sops.yml")
+SECRET_FILES = ("talsecret.yaml", "talsecret.sops.yaml", "talsecret.yml", "talsecret.sops.yml")
+
+LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+@dataclass
+class Shard:
+    name: str
+    content: bytes
+    digest: str
+
+
+@dataclass
+class Result:
+    shard: Shard
+    status: str  # "generated" or "failed"
+    output: str | None = None
+    message: str = ""
+
+
+def absolute_patches(value: Any, talos_dir: Path) -> Any:
+    """value with every "@relative/path" patch reference made absolute."""
+    if isinstance(value, str) and value.startswith("@") and not value.startswith("@/"):
+        return "@" + str((talos_dir / value[1:]).resolve())
+    if isinstance(value, list):
+        return [absolute_patches(item, talos_dir) for item in value]
+    if isinstance(value, dict):
+        return {key: absolute_patches(item, talos_dir) for key, item in value.items()}
+    return value
+
+
+def patch_files(value: Any) -> list[Path]:
+    """Every file referenced as an "@/path" patch in value, in order."""
+    if isinstance(value, str) and value.startswith("@"):
+        return [Path(value[1:])]
+    if isinstance(value, list):
+        return [path for item in value for path in patch_files(item)]
+    if isinstance(value, dict):
+        return [path for item in value.values() for path in patch_files(item)]
+    return []
+
+
+def talhelper_version() -> str:
+    result = subprocess.run(["talhelper", "--version"], capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+def fingerprint(talos_dir: Path) -> str:
+    """Digest of the inputs every shard shares besides talconfig.yaml."""
+    hasher = hashlib.sha256()
+    hasher.update(f"shards-v{CACHE_VERSION}\n{talhelper_version()}\n".encode())
+    for name in (*ENV_FILES, *SECRET_FILES):
+        path = talos_dir / name
+        if path.is_file():
+            hasher.update(name.encode() + b"\0" + path.read_bytes())
+    return hasher.hexdigest()
+
+
+def make_shard(name: str, config: dict[str, Any], shared: str) -> Shard:
+    content = yaml.dump(config, Dumper=DUMPER, sort_keys=False).encode()
+    hasher = hashlib.sha256()
+    hasher.update(shared.encode() + b"\0" + content)
+    for path in patch_files(config):
+        hasher.update(str(path).encode() + b"\0")
+        hasher.update(path.read_bytes() if path.is_file() else b"<missing>")
+    return Shard(name, content, hasher.hexdigest())
+
+
+def split_config(talos_dir: Path, shared: str) -> list[Shard]:
+    """One shard per node, then the talosconfig shard."""
+    with open(talos_dir / "talconfig.yaml", "rb") as file:
+        config = absolute_patches(yaml.load(file, Loader=LOADER), talos_dir)
+    nodes = config.pop("nodes", None) or []
+
+    shards = []
+    for node in nodes:
+        controller = bool(node.get("controlPlane"))
+        # controlPlane patches only apply to control plane nodes, worker patches to the rest
+        skip = "worker" if controller else "controlPlane"
+        cluster = {key: value for key, value in config.items() if key != skip}
+        shards.append(make_shard(node["hostname"], {**cluster, "nodes": [node]}, shared))
+
+    controllers = [node for node in nodes if node.get("controlPlane")]
+    cluster = {key: value for key, value in config.items() if key != "worker"}
+    shards.append(make_shard(CLIENT_SHARD, {**cluster, "nodes": controllers}, shared))
+    return shards
+
+
+class ShardCache:
+    """Digest and output file of each shard as of its last successful generation."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: dict[str, dict[str, str]] = {}
+        if path.is_file():
+            try:
+                stored = json.loads(path.read_text())
+            except (OSError, ValueError):
+                stored = {}
+            if stored.get("version") == CACHE_VERSION:
+                self.entries = stored.get("shards", {})
+
+    def is_current(self, shard: Shard, output_dir: Path) -> bool:
+        entry = self.entries.get(shard.name)
+        return (
+            entry is not None
+            and entry.get("digest") == shard.digest
+            and (output_dir / entry["output"]).is_file()
+        )
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"version": CACHE_VERSION, "shards": self.entries}
+        self.path.write_text(json.dumps(payload, indent=2, sort_keys=True) + "\n")
+
+
+def generate(shard: Shard, talos_dir: Path, shard_dir: Path, output_dir: Path) -> Result:
+    """Run talhelper genconfig on one shard and move its output into output_dir."""
+    shard_file = shard_dir / f"{shard.name}.yaml"
+    shard_file.write_bytes(shard.content)
+    with tempfile.TemporaryDirectory(dir=shard_dir) as directory:
+        # talhelper picks up talenv and talsecret from the talos directory
+        result = subprocess.run(
+            [
+                "talhelper",
+                "genconfig",
+                "--config-file",
+                str(shard_file),
+                "--out-dir",
+                directory,
+                "--no-gitignore",
+            ],
+            capture_output=True,
+            text=True,
+            cwd=talos_dir,
+        )
+        if result.returncode != 0:
+            return Result(shard, "failed", message=(result.stderr or result.stdout).strip())
+
+        if shard.name == CLIENT_SHARD:
+            produced = Path(directory) / TALOSCONFIG
+        else:
+            configs = [
+                path for path in Path(directory).glob("*.yaml") if path.name != TALOSCONFIG
+            ]
+            if len(configs) != 1:
+                message = f"expected one machine config, got {len(configs)}"
+                return Result(shard, "failed", message=message)
+            produced = configs[0]
+        if not produced.is_file():
+            return Result(shard, "failed", message=f"talhelper wrote no {produced.name}")
+        os.replace(produced, output_dir / produced.name)
+    return Result(shard, "generated", output=produced.name)
+
+
+def run(talos_dir: Path, cache_dir: Path, jobs: int, force: bool) -> int:
+    # Without a secret file each talhelper run would make up its own cluster CA and tokens
+    if not any((talos_dir / name).is_file() for name in SECRET_FILES):
+        print(f"None of {', '.join(SECRET_FILES)} found in {talos_dir}", file=sys.stderr)
+        return 1
+
+    shard_dir = cache_dir / "shards"
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    output_dir = talos_dir / OUTPUT_DIR
+    output_dir.mkdir(exist_ok=True)
+
+    shards = split_config(talos_dir, fingerprint(talos_dir))
+    cache = ShardCache(cache_dir / CACHE_FILE)
+    stale = [shard for shard in shards if force or not cache.is_current(shard, output_dir)]
+
+    failures: list[Result] = []
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        results = pool.map(lambda shard: generate(shard, talos_dir, shard_dir, output_dir), stale)
+        for result in results:
+            print(f"{result.status:>9}  {result.shard.name}")
+            if result.status == "failed":
+                failures.append(result)
+                cache.entries.pop(result.shard.name, None)
+            else:
+                previous = cache.entries.get(result.shard.name)
+                if previous is not None and previous["output"] != result.output:
+                    (output_dir / previous["output"]).unlink(missing_ok=True)
+                cache.entries[result.shard.name] = {
+                    "digest": result.shard.digest,
+                    "output": result.output,
+                }
+
+    # Machine configs of nodes no longer in talconfig.yaml would be applied by mistake
+    names = {shard.name for shard in shards}
+    for name in sorted(set(cache.entries) - names):
+        entry = cache.entries.pop(name)
+        (output_dir / entry["output"]).unlink(missing_ok=True)
+        (shard_dir / f"{name}.yaml").unlink(missing_ok=True)
+        print(f"{'removed':>9}  {name}")
+    cache.save()
+
+    for result in failures:
+        print(f"\n=== {result.shard.name} ===", file=sys.stderr)
+        print(result.message or "(no output)", file=sys.stderr)
+    print(
+        f"{len(shards)} shards ({len(shards) - 1} nodes and the talosconfig): "
+        f"{len(stale) - len(failures)} generated, {len(shards) - len(stale)} unchanged, "
+        f"{len(failures)} failed"
+    )
+    return 1 if failures else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Generate Talos machine configs, only for nodes whose talconfig shard changed"
+    )
+    parser.add_argument(
+        "--talos-dir",
+        type=Path,
+        default=DEFAULT_TALOS_DIR,
+        help=f"Directory holding talconfig.yaml (default: {DEFAULT_TALOS_DIR})",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+        help=f"Where the shards and their hashes are kept (default: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        help="Concurrent talhelper runs, 0 uses one per CPU (default: 0)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerate every node, whatever its shard hash",
+    )
+    args = parser.parse_args()
+
+    talos_dir = args.talos_dir.resolve()
+    if not (talos_dir / "talconfig.yaml").is_file():
+        print(f"talconfig.yaml not found in {talos_dir}", file=sys.stderr)
+        return 1
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    try:
+        return run(talos_dir, args.cache_dir.resolve(), jobs, args.force)
+    except FileNotFoundError as e:
+        print(f"Required tool not found: {e.filename}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
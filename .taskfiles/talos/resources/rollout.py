@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Apply configs to, upgrade or verify every Talos node in quorum-safe waves.
+
+`task talos:upgrade-node` handles one node per invocation and looks up its
+image with yq each time, and bootstrap-talos-apply.sh applies at most two
+nodes at once. This orchestrator reads talconfig.yaml and talenv.yaml once,
+plans the rollout as waves, and runs every node of a wave concurrently:
+
+- Control plane nodes go first. A wave never takes down more than a
+  minority of them, (controllers - 1) // 2, so etcd keeps quorum. A single
+  control plane node is a wave of its own.
+- Workers follow in wide waves, --worker-batch at a time (a count or a
+  percentage of the workers).
+
+A node passes its health gate once `talosctl get machinestatus` reports it
+running and ready, and, on control plane nodes, etcd is running and healthy.
+After an --insecure apply, etcd is not bootstrapped yet, so the gate only
+waits for the node to leave maintenance mode and boot the installed config.
+An apply in auto or reboot mode returns before the node goes down, while it
+still reports healthy, so the node's boot ID is read first and the gate only
+starts once a different one is read back. An auto apply that talosctl
+reports as done "without a reboot" goes straight to the gate.
+The next wave only starts when every node of the current one passed. A
+failed command or gate stops the rollout, and the nodes still to do are listed.
+A full cluster upgrade so takes time in the number of waves, not of nodes.
+
+talosctl is taken from --talosctl (default: $TALOSCTL or talosctl), so the
+orchestrator can be exercised against fake_talosctl.py, a stand-in that
+simulates the nodes, reboots included.
+
+Usage:
+    python rollout.py upgrade --plan                  # Print the waves, run nothing
+    python rollout.py apply --insecure                # First apply to nodes in maintenance mode
+    python rollout.py upgrade --worker-batch 50%      # Upgrade, half the workers at a time
+    python rollout.py verify                          # Only run the health gates
+    python rollout.py upgrade --nodes k8s-0,k8s-1     # Limit the rollout to some nodes
+    TALOSCTL=./fake_talosctl.py python rollout.py apply --poll-interval 0.5   # Dry run
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import yaml
+
+ROOT_DIR = Path(__file__).resolve().parents[3]
+DEFAULT_TALOS_DIR = ROOT_DIR / "talos"
+OUTPUT_DIR = "clusterconfig"
+DEFAULT_WORKER_BATCH = "25%"
+DEFAULT_TIMEOUT_SECONDS = 600
+DEFAULT_POLL_SECONDS = 5.0
+ACTIONS = ("apply", "upgrade", "verify")
+# apply-config modes that may reboot the node
+REBOOT_MODES = ("auto", "reboot")
+# What talosctl reports when an auto apply did not need a reboot
+NO_REBOOT_MESSAGE = "without a reboot"
+BOOT_ID_PATH = "/proc/sys/kernel/random/boot_id"
+
+LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+@dataclass(frozen=True)
+class Node:
+    hostname: str
+    address: str
+    controller: bool
+    image: str
+
+
+@dataclass
+class Result:
+    node: Node
+    status: str  # "done" or "failed"
+    message: str = ""
+
+
+class RolloutError(Exception):
+    """Raised when talconfig.yaml cannot be planned."""
+
+
+def load_nodes(talos_dir: Path) -> tuple[str, list[Node]]:
+    """The cluster name and every node of talconfig.yaml, with its installer image."""
+    with open(talos_dir / "talconfig.yaml", "rb") as file:
+        config = yaml.load(file, Loader=LOADER)
+    with open(talos_dir / "talenv.yaml", "rb") as file:
+        version = (yaml.load(file, Loader=LOADER) or {}).get("talosVersion")
+    if not version:
+        raise RolloutError(f"talosVersion is not set in {talos_dir / 'talenv.yaml'}")
+
+    nodes = [
+        Node(
+            hostname=node["hostname"],
+            address=node["ipAddress"],
+            controller=bool(node.get("controlPlane")),
+            image=f"{node.get('talosImageURL', 'ghcr.io/siderolabs/installer')}:{version}",
+        )
+        for node in config.get("nodes") or []
+    ]
+    return config["clusterName"], nodes
+
+
+def parse_batch(value: str, total: int) -> int:
+    """Wave width from a count ("3") or a share of total ("25%"), at least 1."""
+    try:
+        if value.endswith("%"):
+            width = math.ceil(total * float(value[:-1]) / 100)
+        else:
+            width = int(value)
+    except ValueError:
+        raise RolloutError(f"Invalid batch size: {value!r}")
+    return max(width, 1)
+
+
+def plan_waves(nodes: list[Node], members: int, worker_batch: str) -> list[list[Node]]:
+    """Control plane waves that keep quorum among members etcd members, then worker waves."""
+    controllers = [node for node in nodes if node.controller]
+    workers = [node for node in nodes if not node.controller]
+
+    waves = []
+    # etcd with n members tolerates (n - 1) // 2 of them being down
+    width = max((members - 1) // 2, 1)
+    for start in range(0, len(controllers), width):
+        waves.append(controllers[start : start + width])
+    width = parse_batch(worker_batch, len(workers))
+    for start in range(0, len(workers), width):
+        waves.append(workers[start : start + width])
+    return waves
+
+
+class Talosctl:
+    """Runs talosctl commands against single nodes."""
+
+    def __init__(self, binary: str):
+        self.binary = binary
+
+    def run(
+        self, node: Node, *args: str, insecure: bool = False
+    ) -> subprocess.CompletedProcess[str]:
+        command = [self.binary, *args, "--nodes", node.address]
+        if insecure:
+            command.append("--insecure")
+        return subprocess.run(command, capture_output=True, text=True)
+
+    def resource(self, node: Node, *args: str) -> dict | None:
+        """spec of a resource from `talosctl get -o json`, None when it cannot be read."""
+        result = self.run(node, "get", *args, "--output", "json")
+        if result.returncode != 0:
+            return None
+        try:
+            return json.loads(result.stdout).get("spec") or {}
+        except ValueError:
+            return None
+
+    def boot_id(self, node: Node) -> str | None:
+        """ID of the node's current boot, None while it cannot be reached."""
+        result = self.run(node, "read", BOOT_ID_PATH)
+        if result.returncode != 0:
+            return None
+        return result.stdout.strip() or None
+
+    def is_healthy(self, node: Node, bootstrap: bool) -> bool:
+        status = self.resource(node, "machinestatus")
+        if bootstrap:
+            return bool(status) and status.get("stage") in ("booting", "running")
+        if not status or status.get("stage") != "running":
+            return False
+        if not (status.get("status") or {}).get("ready"):
+            return False
+        if node.controller:
+            etcd = self.resource(node, "service", "etcd")
+            return bool(etcd and etcd.get("running") and etcd.get("healthy"))
+        return True
+
+
+@dataclass
+class Rollout:
+    talosctl: Talosctl
+    action: str
+    config_dir: Path
+    cluster_name: str
+    mode: str
+    # Nodes are in maintenance mode and reached without the talosconfig
+    insecure: bool
+    timeout: float
+    poll_interval: float
+
+    def command(self, node: Node) -> list[str] | None:
+        """talosctl arguments performing the action on node, None for verify."""
+        if self.action == "apply":
+            config_file = self.config_dir / f"{self.cluster_name}-{node.hostname}.yaml"
+            return ["apply-config", "--file", str(config_file), "--mode", self.mode]
+        if self.action == "upgrade":
+            return ["upgrade", "--image", node.image, "--wait", "--timeout", f"{int(self.timeout)}s"]
+        return None
+
+    def may_reboot(self) -> bool:
+        """Whether the command returns before a reboot it triggers (upgrade --wait does not)."""
+        return self.action == "apply" and not self.insecure and self.mode in REBOOT_MODES
+
+    def wait(self, check: Callable[[], bool]) -> bool:
+        """Poll check until it passes, False once the timeout ran out."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            if check():
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+
+    def process(self, node: Node) -> Result:
+        boot_id = None
+        if self.may_reboot():
+            boot_id = self.talosctl.boot_id(node)
+            if boot_id is None:
+                return Result(node, "failed", f"cannot read {BOOT_ID_PATH}")
+        args = self.command(node)
+        if args is not None:
+            result = self.talosctl.run(node, *args, insecure=self.insecure)
+            if result.returncode != 0:
+                return Result(node, "failed", (result.stderr or result.stdout).strip())
+            rebooting = boot_id is not None and not (
+                self.mode == "auto" and NO_REBOOT_MESSAGE in result.stdout + result.stderr
+            )
+            if rebooting and not self.wait(
+                lambda: self.talosctl.boot_id(node) not in (None, boot_id)
+            ):
+                return Result(node, "failed", f"no new boot ID after {self.timeout:g}s")
+        if not self.wait(lambda: self.talosctl.is_healthy(node, bootstrap=self.insecure)):
+            return Result(node, "failed", f"not healthy after {self.timeout:g}s")
+        return Result(node, "done")
+
+    def run(self, waves: list[list[Node]]) -> int:
+        start = time.perf_counter()
+        for number, wave in enumerate(waves, 1):
+            wave_start = time.perf_counter()
+            names = ", ".join(node.hostname for node in wave)
+            print(f"Wave {number}/{len(waves)}: {self.action} {names}")
+            with ThreadPoolExecutor(max_workers=len(wave)) as pool:
+                results = list(pool.map(self.process, wave))
+
+            failures = [result for result in results if result.status == "failed"]
+            for result in results:
+                print(f"{result.status:>9}  {result.node.hostname} ({result.node.address})")
+            print(f"Wave {number} finished in {time.perf_counter() - wave_start:.1f}s")
+
+            if failures:
+                for result in failures:
+                    print(f"\n=== {result.node.hostname} ===", file=sys.stderr)
+                    print(result.message or "(no output)", file=sys.stderr)
+                remaining = [node.hostname for later in waves[number:] for node in later]
+                if remaining:
+                    print(f"\nStopped before: {', '.join(remaining)}", file=sys.stderr)
+                return 1
+
+        nodes = sum(len(wave) for wave in waves)
+        elapsed = time.perf_counter() - start
+        print(f"{self.action} finished on {nodes} nodes in {len(waves)} waves in {elapsed:.1f}s")
+        return 0
+
+
+def print_plan(action: str, waves: list[list[Node]]) -> None:
+    for number, wave in enumerate(waves, 1):
+        print(f"Wave {number}/{len(waves)}:")
+        for node in wave:
+            role = "controller" if node.controller else "worker"
+            detail = f"  {node.image}" if action == "upgrade" else ""
+            print(f"  {node.hostname:<24} {node.address:<16} {role:<10}{detail}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Apply, upgrade or verify Talos nodes in waves that keep etcd quorum"
+    )
+    parser.add_argument("action", choices=ACTIONS, help="What to do on every node")
+    parser.add_argument(
+        "--talos-dir",
+        type=Path,
+        default=DEFAULT_TALOS_DIR,
+        help=f"Directory holding talconfig.yaml and talenv.yaml (default: {DEFAULT_TALOS_DIR})",
+    )
+    parser.add_argument(
+        "--nodes",
+        help="Comma-separated hostnames or addresses to roll out to (default: every node)",
+    )
+    parser.add_argument(
+        "--worker-batch",
+        default=DEFAULT_WORKER_BATCH,
+        help="Workers per wave, a count or a percentage of the workers (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--mode",
+        default="auto",
+        help="apply-config mode: auto, reboot, no-reboot or staged (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--insecure",
+        action="store_true",
+        help="Talk to nodes in maintenance mode, without the talosconfig",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT_SECONDS,
+        help="Seconds a node may take to pass its health gate (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_SECONDS,
+        help="Seconds between health checks of a node (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--talosctl",
+        default=os.environ.get("TALOSCTL", "talosctl"),
+        help="talosctl binary to run (default: $TALOSCTL or talosctl)",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Print the waves and exit without running anything",
+    )
+    args = parser.parse_args()
+
+    talos_dir = args.talos_dir.resolve()
+    try:
+        cluster_name, nodes = load_nodes(talos_dir)
+        members = sum(1 for node in nodes if node.controller)
+        if args.nodes:
+            selected = set(args.nodes.split(","))
+            unknown = selected - {node.hostname for node in nodes} - {node.address for node in nodes}
+            if unknown:
+                raise RolloutError(f"Unknown nodes: {', '.join(sorted(unknown))}")
+            nodes = [node for node in nodes if selected & {node.hostname, node.address}]
+        waves = plan_waves(nodes, members, args.worker_batch)
+    except (OSError, KeyError, RolloutError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    if args.plan:
+        print_plan(args.action, waves)
+        return 0
+
+    rollout = Rollout(
+        talosctl=Talosctl(args.talosctl),
+        action=args.action,
+        config_dir=talos_dir / OUTPUT_DIR,
+        cluster_name=cluster_name,
+        mode=args.mode,
+        insecure=args.insecure,
+        timeout=args.timeout,
+        poll_interval=args.poll_interval,
+    )
+    try:
+        return rollout.run(waves)
+    except FileNotFoundError as e:
+        print(f"Required tool not found: {e.filename}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,17 +18,18 @@ import (
 	cluster_svc_cidr: *"10.43.0.0/16" | net.IPCIDR & !=node_cidr & !=cluster_pod_cidr
 	cluster_api_addr: net.IPv4
 	cluster_api_tls_sans?: [...net.FQDN]
-	cluster_gateway_addr: net.IPv4 & !=cluster_api_addr & !=cloudflare_gateway_addr
+	// The LoadBalancer IPs are optional: unset ones are allocated from the top of
+	// cilium_lb_pool_cidr, or node_cidr, and the plugin checks that they are unique
+	cluster_gateway_addr?: net.IPv4 & !=cluster_api_addr
 	// cluster_dns_gateway_addr is only required when NOT using UniFi DNS integration
 	// When unifi_host and unifi_api_key are set, k8s-gateway is replaced by external-dns-unifi
-	cluster_dns_gateway_addr?: net.IPv4 & !=cluster_api_addr & !=cluster_gateway_addr & !=cloudflare_gateway_addr
+	cluster_dns_gateway_addr?: net.IPv4 & !=cluster_api_addr
 	repository_name: string
 	repository_branch?: string & !=""
 	repository_visibility?: *"public" | "private"
 	cloudflare_domain: net.FQDN
 	cloudflare_token: string
-	// NOTE: Cannot constrain against optional cluster_dns_gateway_addr - that constraint is on line 20 instead
-	cloudflare_gateway_addr: net.IPv4 & !=cluster_api_addr & !=cluster_gateway_addr
+	cloudflare_gateway_addr?: net.IPv4 & !=cluster_api_addr
 	// Cilium LoadBalancer configuration
 	cilium_loadbalancer_mode?: *"dsr" | "snat"
 
@@ -83,6 +84,14 @@ import (
 	// Infrastructure (OpenTofu/Proxmox) - Optional for VM deployments
 	proxmox_api_url?:      string & =~"^https?://"
 	proxmox_node?:         string & !=""
+	// Proxmox hosts to spread the VMs across, with the capacity VMs may use
+	// memory in MiB and disk in GB, as vm_memory and vm_disk_size; no disk means shared storage
+	proxmox_hosts?: [...{
+		name:   string & !=""
+		cores:  int & >=1
+		memory: int & >=1024
+		disk?:  int & >=32
+	}]
 	proxmox_iso_storage?:  *"local" | string & !=""
 	proxmox_disk_storage?: *"local-lvm" | string & !=""
 	proxmox_vm_defaults?: {
@@ -118,7 +127,7 @@ import (
 		net_queues?:   *4 | int & >=1 & <=16
 		disk_discard?: *true | bool
 		disk_ssd?:     *true | bool
-		tags?: [...string]
+		tags?: *["kubernetes", "linux", "talos"] | [...string]
 		// Network configuration
 		network_bridge?: *"vmbr0" | string & !=""
 		// Guest OS configuration
@@ -0,0 +1,459 @@
+"""
+Tokenizer, AST and recursive-descent parser for the CUE subset used by
+cluster.schema.cue and nodes.schema.cue.
+
+The source is tokenized in a single regex pass and parsed once into frozen
+AST nodes. Files of the same package are combined so `#Definition`
+references resolve across files, the way `cue vet` sees them.
+
+Supported: package and import clauses, definitions, regular, optional (`?`),
+required (`!`), hidden (`_`) and pattern (`[string]:`) fields, structs,
+`[...T]` list types, list literals and comprehensions, `|` disjunctions with
+`*` defaults, `&` conjunctions, the comparison and regex operators, selectors
+(`net.IPv4`) and calls (`strings.MinRunes(2)`). `//` comment lines directly
+above a field become its doc comment; a blank line discards them.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Union
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<comment>//[^\n]*)
+    |(?P<newline>\n)
+    |(?P<space>[ \t\r]+)
+    |(?P<string>"(?:[^"\\\n]|\\.)*")
+    |(?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    |(?P<ident>(?:\#|_\#|_)?[A-Za-z_$][\w$]*)
+    |(?P<op>\.\.\.|=~|!~|!=|>=|<=|==|[<>{}\[\]():?!,|&*.=])
+    |(?P<error>.)
+    """,
+    re.VERBOSE,
+)
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", '"': '"', "\\": "\\", "/": "/"}
+_ESCAPE_RE = re.compile(r"\\(.)")
+
+# Operators that prefix a bound or regex constraint
+UNARY_OPERATORS = ("=~", "!~", "!=", "==", ">=", "<=", ">", "<")
+
+# Keywords that are literals rather than references
+_LITERALS = {"true": True, "false": False, "null": None}
+
+
+class CueSyntaxError(ValueError):
+    """Raised for source outside the supported CUE subset."""
+
+
+@dataclass(frozen=True, slots=True)
+class Token:
+    kind: str
+    text: str
+    pos: int
+
+
+def _location(source: str, pos: int) -> str:
+    line = source.count("\n", 0, pos) + 1
+    column = pos - source.rfind("\n", 0, pos)
+    return f"{line}:{column}"
+
+
+def tokenize(source: str, name: str = "<string>") -> list[Token]:
+    """Split source into tokens in one pass. Whitespace is dropped, newlines and comments kept."""
+    tokens = []
+    for match in _TOKEN_RE.finditer(source):
+        kind = match.lastgroup
+        if kind == "space":
+            continue
+        if kind == "error":
+            location = _location(source, match.start())
+            raise CueSyntaxError(f"{name}:{location}: unexpected character {match.group()!r}")
+        tokens.append(Token(kind, match.group(), match.start()))
+    tokens.append(Token("eof", "", len(source)))
+    return tokens
+
+
+def unquote(text: str) -> str:
+    """Decode a double-quoted CUE string literal."""
+    return _ESCAPE_RE.sub(lambda m: _ESCAPES.get(m.group(1), m.group(1)), text[1:-1])
+
+
+@dataclass(frozen=True, slots=True)
+class Literal:
+    """A string, number, bool or null value."""
+
+    value: Any
+
+
+@dataclass(frozen=True, slots=True)
+class Ref:
+    """A reference such as `string`, `net.IPv4`, `#Node` or `cluster_pod_cidr`."""
+
+    name: str
+
+
+@dataclass(frozen=True, slots=True)
+class Call:
+    """A builtin call such as `strings.MinRunes(2)` or `list.UniqueItems()`."""
+
+    name: str
+    args: tuple[Expr, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Unary:
+    """A bound or regex constraint such as `>=1`, `!=""` or `=~"^age1"`."""
+
+    op: str
+    operand: Expr
+
+
+@dataclass(frozen=True, slots=True)
+class Default:
+    """A disjunct marked as the default with `*`."""
+
+    value: Expr
+
+
+@dataclass(frozen=True, slots=True)
+class Disjunction:
+    options: tuple[Expr, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Conjunction:
+    terms: tuple[Expr, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class ListType:
+    """An open list `[...T]`."""
+
+    element: Expr
+
+
+@dataclass(frozen=True, slots=True)
+class ListLit:
+    items: tuple[Expr, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Comprehension:
+    """A list comprehension `[for x in source {body}]`, kept unevaluated."""
+
+    names: tuple[str, ...]
+    source: Expr
+    body: Expr
+
+
+@dataclass(frozen=True, slots=True)
+class Field:
+    name: str
+    value: Expr
+    optional: bool = False
+    doc: str = ""
+
+    @property
+    def hidden(self) -> bool:
+        return self.name.startswith(("_", "#"))
+
+
+@dataclass(frozen=True, slots=True)
+class Struct:
+    fields: tuple[Field, ...] = ()
+    # (key constraint, value) for `[string]: value` pattern fields
+    patterns: tuple[tuple[Expr, Expr], ...] = ()
+    embeds: tuple[Expr, ...] = ()
+    # Comment on the line of the opening brace
+    comment: str = ""
+
+    def field(self, name: str) -> Field | None:
+        return next((f for f in self.fields if f.name == name), None)
+
+
+Expr = Union[
+    Literal, Ref, Call, Unary, Default, Disjunction, Conjunction, ListType, ListLit,
+    Comprehension, Struct,
+]
+
+
+@dataclass(frozen=True, slots=True)
+class File:
+    name: str
+    package: str
+    imports: tuple[str, ...]
+    body: Struct
+
+
+class Parser:
+    """Recursive-descent parser over the token list of one file."""
+
+    def __init__(self, source: str, name: str = "<string>"):
+        self.source = source
+        self.name = name
+        self.tokens = tokenize(source, name)
+        self.index = 0
+        self.last = Token("newline", "\n", 0)
+
+    def error(self, message: str, token: Token | None = None) -> CueSyntaxError:
+        location = _location(self.source, (token or self.peek()).pos)
+        return CueSyntaxError(f"{self.name}:{location}: {message}")
+
+    def peek(self, offset: int = 0) -> Token:
+        return self.tokens[min(self.index + offset, len(self.tokens) - 1)]
+
+    def advance(self) -> Token:
+        token = self.tokens[self.index]
+        if token.kind != "eof":
+            self.index += 1
+        self.last = token
+        return token
+
+    def at(self, text: str) -> bool:
+        token = self.peek()
+        return token.kind in ("op", "ident") and token.text == text
+
+    def expect(self, text: str) -> Token:
+        if not self.at(text):
+            token = self.peek()
+            raise self.error(f"expected {text!r}, found {token.text or token.kind!r}")
+        return self.advance()
+
+    def skip_newlines(self) -> None:
+        while self.peek().kind in ("newline", "comment"):
+            self.advance()
+
+    def parse_file(self) -> File:
+        self.skip_newlines()
+        package = ""
+        if self.at("package"):
+            self.advance()
+            package = self.advance().text
+            self.skip_newlines()
+
+        imports: list[str] = []
+        while self.at("import"):
+            self.advance()
+            if self.at("("):
+                self.advance()
+                self.skip_newlines()
+                while self.peek().kind == "string":
+                    imports.append(unquote(self.advance().text))
+                    self.skip_newlines()
+                self.expect(")")
+            else:
+                imports.append(unquote(self.advance().text))
+            self.skip_newlines()
+
+        body = self.parse_declarations(closing="eof")
+        return File(self.name, package, tuple(imports), body)
+
+    def parse_declarations(self, closing: str) -> Struct:
+        """Parse fields and embeddings up to closing, collecting doc comments."""
+        fields: list[Field] = []
+        patterns: list[tuple[Expr, Expr]] = []
+        embeds: list[Expr] = []
+        doc: list[str] = []
+        comment = ""
+
+        while True:
+            token = self.peek()
+            if token.kind == "eof" or (token.kind == "op" and token.text == closing):
+                break
+            if token.kind == "newline":
+                # A blank line separates a comment block from the next field
+                if self.last.kind == "newline":
+                    doc.clear()
+                self.advance()
+                continue
+            if token.kind == "comment":
+                text = token.text[2:].strip()
+                if self.last.kind == "op" and self.last.text == "{":
+                    comment = text
+                elif self.last.kind in ("newline", "comment"):
+                    doc.append(text)
+                self.advance()
+                continue
+            if self.at(","):
+                self.advance()
+                continue
+
+            start = self.peek()
+            value = self.parse_expr()
+            optional = False
+            if self.at("?") or self.at("!"):
+                optional = self.advance().text == "?"
+                if not self.at(":"):
+                    raise self.error("expected ':' after field label")
+            if not self.at(":"):
+                embeds.append(value)
+                doc.clear()
+                continue
+
+            self.advance()
+            field_value = self.parse_expr()
+            if isinstance(value, ListLit) and len(value.items) == 1:
+                patterns.append((value.items[0], field_value))
+            elif isinstance(value, Ref) and "." not in value.name:
+                fields.append(Field(value.name, field_value, optional, " ".join(doc)))
+            elif isinstance(value, Literal) and isinstance(value.value, str):
+                fields.append(Field(value.value, field_value, optional, " ".join(doc)))
+            else:
+                raise self.error("unsupported field label", start)
+            doc.clear()
+
+        return Struct(tuple(fields), tuple(patterns), tuple(embeds), comment)
+
+    def parse_expr(self) -> Expr:
+        options = [self.parse_conjunction()]
+        while self.at("|"):
+            self.advance()
+            options.append(self.parse_conjunction())
+        return options[0] if len(options) == 1 else Disjunction(tuple(options))
+
+    def parse_conjunction(self) -> Expr:
+        terms = [self.parse_unary()]
+        while self.at("&"):
+            self.advance()
+            terms.append(self.parse_unary())
+        return terms[0] if len(terms) == 1 else Conjunction(tuple(terms))
+
+    def parse_unary(self) -> Expr:
+        token = self.peek()
+        if token.kind == "op" and token.text == "*":
+            self.advance()
+            return Default(self.parse_unary())
+        if token.kind == "op" and token.text in UNARY_OPERATORS:
+            self.advance()
+            return Unary(token.text, self.parse_unary())
+        return self.parse_primary()
+
+    def parse_primary(self) -> Expr:
+        expr = self.parse_operand()
+        while True:
+            if self.at(".") and isinstance(expr, Ref):
+                self.advance()
+                expr = Ref(f"{expr.name}.{self.advance().text}")
+            elif self.at("(") and isinstance(expr, Ref):
+                self.advance()
+                args = []
+                while not self.at(")"):
+                    args.append(self.parse_expr())
+                    if not self.at(")"):
+                        self.expect(",")
+                self.advance()
+                expr = Call(expr.name, tuple(args))
+            else:
+                return expr
+
+    def parse_operand(self) -> Expr:
+        token = self.peek()
+        if token.kind == "string":
+            self.advance()
+            return Literal(unquote(token.text))
+        if token.kind == "number":
+            self.advance()
+            is_float = any(c in token.text for c in ".eE")
+            return Literal(float(token.text) if is_float else int(token.text))
+        if token.kind == "ident":
+            self.advance()
+            if token.text in _LITERALS:
+                return Literal(_LITERALS[token.text])
+            return Ref(token.text)
+        if self.at("{"):
+            self.advance()
+            body = self.parse_declarations(closing="}")
+            self.expect("}")
+            return body
+        if self.at("["):
+            return self.parse_list()
+        if self.at("("):
+            self.advance()
+            expr = self.parse_expr()
+            self.expect(")")
+            return expr
+        raise self.error(f"unexpected {token.text or token.kind!r}")
+
+    def parse_list(self) -> Expr:
+        self.expect("[")
+        self.skip_newlines()
+
+        if self.at("..."):
+            self.advance()
+            element = Ref("_") if self.at("]") else self.parse_expr()
+            self.skip_newlines()
+            self.expect("]")
+            return ListType(element)
+
+        if self.at("for"):
+            self.advance()
+            names = [self.advance().text]
+            while self.at(","):
+                self.advance()
+                names.append(self.advance().text)
+            self.expect("in")
+            source = self.parse_primary()
+            body = self.parse_operand()
+            self.skip_newlines()
+            self.expect("]")
+            return Comprehension(tuple(names), source, body)
+
+        items: list[Expr] = []
+        while not self.at("]"):
+            items.append(self.parse_expr())
+            self.skip_newlines()
+            if not self.at("]"):
+                self.expect(",")
+                self.skip_newlines()
+        self.advance()
+        return ListLit(tuple(items))
+
+
+def parse(source: str, name: str = "<string>") -> File:
+    """Parse one CUE file."""
+    return Parser(source, name).parse_file()
+
+
+@dataclass
+class Package:
+    """The files of one CUE package, with definitions combined across files."""
+
+    files: dict[str, File] = field(default_factory=dict)
+    definitions: dict[str, list[Expr]] = field(default_factory=dict)
+
+    def add(self, file: File) -> None:
+        packages = {f.package for f in self.files.values()}
+        if packages and file.package not in packages:
+            raise CueSyntaxError(
+                f"{file.name}: package {file.package!r} does not match {packages.pop()!r}"
+            )
+        self.files[file.name] = file
+        for decl in file.body.fields:
+            if decl.name.startswith("#"):
+                self.definitions.setdefault(decl.name, []).append(decl.value)
+
+    def definition(self, name: str) -> Expr:
+        """The definition name, unified across every file that declares it."""
+        values = self.definitions.get(name)
+        if not values:
+            raise CueSyntaxError(f"undefined reference {name}")
+        return values[0] if len(values) == 1 else Conjunction(tuple(values))
+
+    def file_definition(self, file_name: str, name: str) -> Expr:
+        """The definition name as declared in a single file."""
+        decl = self.files[file_name].body.field(name)
+        if decl is None:
+            raise CueSyntaxError(f"{file_name}: could not find {name}")
+        return decl.value
+
+
+def load_package(paths: list[Path]) -> Package:
+    """Parse paths into one package."""
+    package = Package()
+    for path in paths:
+        package.add(parse(path.read_text(), path.name))
+    return package
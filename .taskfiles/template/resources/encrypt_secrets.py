@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Encrypt the rendered *.sops.* files in place, reusing ciphertext for unchanged secrets.
+
+A file already carrying a `sops:` metadata block with a MAC is left alone.
+The check reads the file directly instead of spawning `sops filestatus`.
+
+Every render writes the plaintext again. Encrypting it afresh would produce
+new ciphertext and churn git even though nothing changed. For each plaintext
+file, the last ciphertext is reused when it is known to hold the same secret:
+
+1. The cache (.cache/sops/encrypted.json) records the ciphertext of each
+   file under an HMAC of its plaintext. The HMAC is keyed with the age key
+   and .sops.yaml, so it reveals nothing about the secret, and a new key or
+   new creation rules invalidate it.
+2. On a cache miss, such as a fresh clone, the committed version is
+   decrypted. It is reused if it holds the same data as the new plaintext.
+
+Only the remaining files are piped through `sops encrypt`, run concurrently
+by a bounded pool of workers. render.py --encrypt uses the same Encryptor on
+the rendered text, so secrets are never written as plaintext at all.
+
+Usage:
+    python encrypt_secrets.py bootstrap infrastructure kubernetes talos
+    python encrypt_secrets.py kubernetes --jobs 4        # Limit the worker pool
+    python encrypt_secrets.py kubernetes --no-cache      # Encrypt every plaintext file
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+ROOT_DIR = Path(__file__).resolve().parents[3]
+DEFAULT_CACHE_DIR = ROOT_DIR / ".cache" / "sops"
+CACHE_FILE = "encrypted.json"
+# Bump to drop every cached ciphertext when the keying scheme changes
+CACHE_VERSION = 1
+SOPS_CONFIG = ROOT_DIR / ".sops.yaml"
+DEFAULT_AGE_KEY = Path(os.environ.get("SOPS_AGE_KEY_FILE", ROOT_DIR / "age.key"))
+
+SECRET_PATTERN = "*.sops.*"
+LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def find_secrets(directories: Iterable[Path]) -> list[Path]:
+    return sorted(
+        path
+        for directory in directories
+        if directory.is_dir()
+        for path in directory.rglob(SECRET_PATTERN)
+        if path.is_file()
+    )
+
+
+def relative_name(path: Path) -> str:
+    """Cache key for a file: its path relative to the repository root when inside it."""
+    resolved = path.resolve()
+    if resolved.is_relative_to(ROOT_DIR):
+        return resolved.relative_to(ROOT_DIR).as_posix()
+    return str(path)
+
+
+def load_documents(content: bytes) -> list[Any] | None:
+    """Every YAML (or JSON) document in content, or None if it does not parse."""
+    try:
+        return list(yaml.load_all(content, Loader=LOADER))
+    except yaml.YAMLError:
+        return None
+
+
+def is_encrypted(content: bytes) -> bool:
+    """True when a document carries SOPS metadata, as `sops filestatus` reports."""
+    if b"sops" not in content:
+        return False
+    documents = load_documents(content) or []
+    return any(
+        isinstance(document, dict)
+        and isinstance(document.get("sops"), dict)
+        and "mac" in document["sops"]
+        for document in documents
+    )
+
+
+@dataclass
+class Result:
+    path: Path
+    status: str  # "encrypted", "unchanged", "skipped" or "failed"
+    key: str | None = None
+    ciphertext: str | None = None
+    output: str = ""
+
+
+class CiphertextCache:
+    """Last ciphertext of each secret, keyed by an HMAC of the plaintext it encrypts."""
+
+    def __init__(self, path: Path | None):
+        self.path = path
+        self.entries: dict[str, dict[str, str]] = {}
+        if path is not None and path.is_file():
+            try:
+                stored = json.loads(path.read_text())
+            except (OSError, ValueError):
+                stored = {}
+            if stored.get("version") == CACHE_VERSION:
+                self.entries = stored.get("files", {})
+
+    def lookup(self, name: str, key: str) -> str | None:
+        entry = self.entries.get(name)
+        return entry["ciphertext"] if entry and entry.get("key") == key else None
+
+    def save(self, keep: Iterable[str] | None = None) -> None:
+        """Persist the entries, only those named in keep when given, so removed secrets do not linger."""
+        if self.path is None:
+            return
+        if keep is not None:
+            names = set(keep)
+            self.entries = {name: entry for name, entry in self.entries.items() if name in names}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"version": CACHE_VERSION, "files": self.entries}
+        self.path.write_text(json.dumps(payload, indent=2, sort_keys=True) + "\n")
+
+
+def committed_version(name: str) -> bytes | None:
+    """A file's content at HEAD, or None outside git or when it is not committed."""
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(ROOT_DIR), "show", f"HEAD:{name}"],
+            capture_output=True,
+        )
+    except FileNotFoundError:
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def decrypt(ciphertext: bytes, suffix: str) -> bytes | None:
+    """The plaintext of SOPS ciphertext, or None when sops is missing or cannot decrypt it."""
+    with tempfile.TemporaryDirectory() as directory:
+        encrypted = Path(directory) / f"encrypted{suffix}"
+        encrypted.write_bytes(ciphertext)
+        try:
+            result = subprocess.run(["sops", "--decrypt", str(encrypted)], capture_output=True)
+        except FileNotFoundError:
+            return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def decrypts_to(ciphertext: bytes, suffix: str, plaintext: bytes) -> bool:
+    """True when ciphertext decrypts to the same data as plaintext."""
+    expected = load_documents(plaintext)
+    if expected is None:
+        return False
+    decrypted = decrypt(ciphertext, suffix)
+    return decrypted is not None and load_documents(decrypted) == expected
+
+
+class Encryptor:
+    """Encrypts secrets in memory, reusing earlier ciphertext of the same plaintext when reuse is on."""
+
+    def __init__(self, cache: CiphertextCache, secret: bytes, reuse: bool):
+        self.cache = cache
+        self.secret = secret
+        self.reuse = reuse
+
+    def plaintext_key(self, name: str, content: bytes) -> str:
+        return hmac.new(self.secret, name.encode() + b"\0" + content, hashlib.sha256).hexdigest()
+
+    def encrypt(self, path: Path, content: bytes) -> Result:
+        """Ciphertext for the plaintext content of path. Nothing is written."""
+        name = relative_name(path)
+        key = self.plaintext_key(name, content)
+        ciphertext = self.cache.lookup(name, key) if self.reuse else None
+        if ciphertext is None and self.reuse:
+            committed = committed_version(name)
+            if (
+                committed is not None
+                and is_encrypted(committed)
+                and decrypts_to(committed, path.suffix, content)
+            ):
+                ciphertext = committed.decode()
+        if ciphertext is not None:
+            return Result(path, "unchanged", key, ciphertext)
+
+        # The override path selects the .sops.yaml creation rule and the file format
+        result = subprocess.run(
+            ["sops", "encrypt", "--filename-override", name, "/dev/stdin"],
+            input=content,
+            capture_output=True,
+            cwd=ROOT_DIR,
+        )
+        if result.returncode != 0:
+            return Result(path, "failed", output=result.stderr.decode().strip())
+        return Result(path, "encrypted", key, result.stdout.decode())
+
+    def process(self, path: Path) -> Result:
+        """Encrypt a plaintext file in place; files with SOPS metadata are skipped."""
+        content = path.read_bytes()
+        if is_encrypted(content):
+            return Result(path, "skipped")
+        result = self.encrypt(path, content)
+        if result.ciphertext is not None:
+            path.write_text(result.ciphertext)
+        return result
+
+    def record(self, result: Result) -> None:
+        if result.key is not None and result.ciphertext is not None:
+            self.cache.entries[relative_name(result.path)] = {
+                "key": result.key,
+                "ciphertext": result.ciphertext,
+            }
+
+
+def open_encryptor(cache_dir: Path | None, age_key: Path = DEFAULT_AGE_KEY) -> Encryptor:
+    """An Encryptor whose plaintext hashes are keyed by the age key and .sops.yaml.
+
+    Without a cache directory nothing is reused and every secret is encrypted afresh.
+    """
+    cache = CiphertextCache(cache_dir / CACHE_FILE if cache_dir is not None else None)
+    rules = SOPS_CONFIG.read_bytes() if SOPS_CONFIG.is_file() else b""
+    return Encryptor(cache, age_key.read_bytes() + b"\0" + rules, reuse=cache_dir is not None)
+
+
+def run(directories: list[Path], jobs: int, cache_dir: Path | None, age_key: Path) -> int:
+    secrets = find_secrets(directories)
+    encryptor = open_encryptor(cache_dir, age_key)
+
+    failures: list[Result] = []
+    counts = {"encrypted": 0, "unchanged": 0, "skipped": 0, "failed": 0}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for result in pool.map(encryptor.process, secrets):
+            counts[result.status] += 1
+            encryptor.record(result)
+            if result.status == "failed":
+                failures.append(result)
+            if result.status != "skipped":
+                print(f"{result.status:>9}  {result.path}")
+
+    # Files still encrypted from an earlier run keep their entry, so their plaintext may come back
+    encryptor.cache.save(keep={relative_name(path) for path in secrets})
+
+    for result in failures:
+        print(f"\n=== {result.path} ===", file=sys.stderr)
+        print(result.output or "(no output)", file=sys.stderr)
+    print(
+        f"{len(secrets)} secrets: {counts['encrypted']} encrypted, {counts['unchanged']} unchanged, "
+        f"{counts['skipped']} already encrypted, {counts['failed']} failed"
+    )
+    return 1 if failures else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Encrypt rendered SOPS files, reusing the ciphertext of unchanged secrets"
+    )
+    parser.add_argument(
+        "directories", type=Path, nargs="+", help="Directories to search for *.sops.* files"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        help="Concurrent encryptions, 0 uses one per CPU (default: 0)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+        help=f"Where the last ciphertext of each secret is kept (default: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Encrypt every plaintext file afresh, reusing no earlier ciphertext",
+    )
+    parser.add_argument(
+        "--age-key",
+        type=Path,
+        default=DEFAULT_AGE_KEY,
+        help=f"Age key that keys the plaintext hashes (default: {DEFAULT_AGE_KEY})",
+    )
+    args = parser.parse_args()
+
+    if not args.age_key.is_file():
+        print(f"Age key not found: {args.age_key}", file=sys.stderr)
+        return 1
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    try:
+        return run(args.directories, jobs, None if args.no_cache else args.cache_dir, args.age_key)
+    except FileNotFoundError as e:
+        print(f"Required tool not found: {e.filename}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,471 +2,619 @@
 """
 Generate JSON Schema from CUE schema files for IDE validation.
 
-This script parses CUE schemas and produces JSON Schemas that provide
-autocomplete and validation in editors using yaml-language-server.
+This script parses the CUE schemas into an AST (see cue_schema.py) and
+produces JSON Schemas that provide autocomplete and validation in editors
+using yaml-language-server. Both schema files belong to the same CUE
+package, so `#Definition` references such as `#Node` resolve across them.
+
+The same AST produces templates/scripts/config_model.py: slot dataclasses
+(Cluster, Node, ProxmoxVmDefaults, ...) for #Config unified across both
+files, with the CUE `*default` values baked in. The template plugin builds
+its data from these classes.
+
+Generated outputs are cached under .cache/jsonschema keyed by the hash of
+the CUE sources and this generator, so unchanged schemas are not re-parsed.
 
 Usage:
     python generate_jsonschema.py              # Generate all schemas
     python generate_jsonschema.py --cluster    # Generate cluster schema only
     python generate_jsonschema.py --nodes      # Generate nodes schema only
+    python generate_jsonschema.py --model      # Generate the config model only
+    python generate_jsonschema.py --scale 10   # Time parsing a 10x synthetic schema
 """
 
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
+import keyword
 import re
 import sys
+import time
+from collections.abc import MutableMapping
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
-SCHEMA_BASE_URL = "https://github.com/MatherlyNet/talos-cluster"
-
+from cue_schema import (
+    Call,
+    Comprehension,
+    Conjunction,
+    CueSyntaxError,
+    Default,
+    Disjunction,
+    Expr,
+    ListLit,
+    ListType,
+    Literal,
+    Package,
+    Ref,
+    Struct,
+    Unary,
+    load_package,
+    parse,
+)
 
-def parse_cluster_schema(cue_content: str) -> dict[str, Any]:
-    """Parse cluster.schema.cue and extract field definitions."""
-    schema: dict[str, Any] = {
-        "$schema": "http://json-schema.org/draft-07/schema#",
-        "$id": f"{SCHEMA_BASE_URL}/cluster.schema.json",
-        "title": "Cluster Configuration",
-        "description": "Configuration schema for matherlynet-talos-cluster GitOps template",
-        "type": "object",
-        "additionalProperties": False,
-        "properties": {},
-        "required": [],
-    }
-
-    # Extract the #Config block
-    config_match = re.search(
-        r"#Config:\s*\{(.*?)\n\}\s*$", cue_content, re.DOTALL | re.MULTILINE
+SCHEMA_BASE_URL = "https://github.com/MatherlyNet/talos-cluster"
+RESOURCES_DIR = Path(__file__).resolve().parent
+ROOT_DIR = RESOURCES_DIR.parents[2]
+DEFAULT_CACHE_DIR = ROOT_DIR / ".cache" / "jsonschema"
+MODEL_OUTPUT = ROOT_DIR / "templates" / "scripts" / "config_model.py"
+
+# Every file of the `config` package, parsed together
+PACKAGE_FILES = ("cluster.schema.cue", "nodes.schema.cue")
+
+IPV4_PATTERN = r"^(\d{1,3}\.){3}\d{1,3}$"
+IPV4_CIDR_PATTERN = r"^(\d{1,3}\.){3}\d{1,3}/\d{1,2}$"
+
+# CUE builtin types and their JSON Schema equivalents
+BUILTIN_TYPES: dict[str, dict[str, Any]] = {
+    "string": {"type": "string"},
+    "int": {"type": "integer"},
+    "float": {"type": "number"},
+    "number": {"type": "number"},
+    "bool": {"type": "boolean"},
+    "null": {"type": "null"},
+    "net.IPv4": {"type": "string", "format": "ipv4", "pattern": IPV4_PATTERN},
+    "net.IPCIDR": {"type": "string", "format": "ipv4-cidr", "pattern": IPV4_CIDR_PATTERN},
+    "net.FQDN": {"type": "string", "format": "hostname"},
+}
+
+# Builtin validator calls and the keyword their argument becomes
+BUILTIN_CALLS = {
+    "strings.MinRunes": "minLength",
+    "strings.MaxRunes": "maxLength",
+    "list.MinItems": "minItems",
+    "list.MaxItems": "maxItems",
+}
+
+BOUND_KEYWORDS = {
+    ">=": "minimum",
+    "<=": "maximum",
+    ">": "exclusiveMinimum",
+    "<": "exclusiveMaximum",
+}
+
+# Extension keyword listing the sibling fields a value must differ from
+# (`!=cluster_api_addr`), which JSON Schema cannot express; schema_validator.py
+# enforces it and editors ignore it
+NOT_EQUAL_KEYWORD = "x-not-equal"
+
+# Output order of keywords within one schema object
+KEYWORD_ORDER = (
+    "default",
+    "type",
+    "enum",
+    "format",
+    "pattern",
+    "minLength",
+    "maxLength",
+    "minimum",
+    "exclusiveMinimum",
+    "maximum",
+    "exclusiveMaximum",
+    "not",
+    NOT_EQUAL_KEYWORD,
+    "allOf",
+    "anyOf",
+    "additionalProperties",
+    "properties",
+    "required",
+    "items",
+    "minItems",
+    "maxItems",
+    "uniqueItems",
+    "description",
+)
+_KEYWORD_RANK = {key: index for index, key in enumerate(KEYWORD_ORDER)}
+
+
+@dataclass(frozen=True)
+class SchemaTarget:
+    """A JSON Schema generated from the #Config definition of one CUE file."""
+
+    name: str
+    source: str
+    output: str
+    title: str
+    description: str
+
+
+TARGETS = {
+    target.name: target
+    for target in (
+        SchemaTarget(
+            "cluster",
+            "cluster.schema.cue",
+            "cluster.schema.json",
+            "Cluster Configuration",
+            "Configuration schema for matherlynet-talos-cluster GitOps template",
+        ),
+        SchemaTarget(
+            "nodes",
+            "nodes.schema.cue",
+            "nodes.schema.json",
+            "Nodes Configuration",
+            "Node definitions for matherlynet-talos-cluster",
+        ),
     )
-    if not config_match:
-        raise ValueError("Could not find #Config block in CUE schema")
-
-    config_block = config_match.group(1)
-    parse_fields_into_schema(config_block, schema)
-
-    return schema
-
-
-def parse_nodes_schema(cue_content: str) -> dict[str, Any]:
-    """Parse nodes.schema.cue and extract field definitions."""
-    schema: dict[str, Any] = {
-        "$schema": "http://json-schema.org/draft-07/schema#",
-        "$id": f"{SCHEMA_BASE_URL}/nodes.schema.json",
-        "title": "Nodes Configuration",
-        "description": "Node definitions for matherlynet-talos-cluster",
-        "type": "object",
-        "additionalProperties": False,
-        "properties": {
-            "nodes": {
-                "type": "array",
-                "description": "List of cluster nodes",
-                "items": {},
-                "minItems": 1,
-            }
-        },
-        "required": ["nodes"],
-    }
-
-    # Extract the #Node block
-    node_match = re.search(r"#Node:\s*\{(.*?)\n\}", cue_content, re.DOTALL)
-    if not node_match:
-        raise ValueError("Could not find #Node block in CUE schema")
-
-    node_block = node_match.group(1)
-
-    # Build the node item schema
-    node_schema: dict[str, Any] = {
-        "type": "object",
-        "additionalProperties": False,
-        "properties": {},
-        "required": [],
-    }
-
-    parse_fields_into_schema(node_block, node_schema)
-
-    schema["properties"]["nodes"]["items"] = node_schema
-
-    return schema
+}
 
 
-def parse_fields_into_schema(block: str, schema: dict[str, Any]) -> None:
-    """Parse field definitions from a CUE block into a JSON Schema."""
-    current_comment = ""
-    lines = block.split("\n")
-    i = 0
-
-    while i < len(lines):
-        line = lines[i].strip()
+def _ordered(schema: dict[str, Any]) -> dict[str, Any]:
+    return dict(
+        sorted(schema.items(), key=lambda item: _KEYWORD_RANK.get(item[0], len(_KEYWORD_RANK)))
+    )
 
-        # Skip empty lines
-        if not line:
-            current_comment = ""
-            i += 1
-            continue
 
-        # Skip internal fields (starting with _)
-        if line.startswith("_"):
-            i += 1
-            continue
-
-        # Collect comments for descriptions
-        if line.startswith("//"):
-            comment = line[2:].strip()
-            if current_comment:
-                current_comment += " " + comment
+def _json_type(value: Any) -> str:
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if value is None:
+        return "null"
+    if isinstance(value, list):
+        return "array"
+    return "string"
+
+
+def _literal_value(expr: Expr) -> Any:
+    if isinstance(expr, Literal):
+        return expr.value
+    if isinstance(expr, ListLit):
+        return [_literal_value(item) for item in expr.items]
+    raise CueSyntaxError(f"unsupported default value {expr!r}")
+
+
+class SchemaEmitter:
+    """Convert CUE AST expressions to JSON Schema, resolving definitions from a package."""
+
+    def __init__(self, package: Package):
+        self.package = package
+        self._definitions: dict[str, dict[str, Any]] = {}
+        self._resolving: set[str] = set()
+
+    def emit(self, expr: Expr) -> dict[str, Any]:
+        """Return the JSON Schema for expr. Results may be shared, never mutate them."""
+        if isinstance(expr, Struct):
+            return self.emit_struct(expr)
+        if isinstance(expr, Disjunction):
+            return self.emit_disjunction(expr)
+        if isinstance(expr, ListType):
+            return {"type": "array", "items": self.emit(expr.element)}
+        if isinstance(expr, Default):
+            return self.emit_disjunction(Disjunction((expr,)))
+        return self.emit_conjunction((expr,))
+
+    def emit_ref(self, name: str) -> dict[str, Any]:
+        if name in BUILTIN_TYPES:
+            return BUILTIN_TYPES[name]
+        if not name.startswith("#"):
+            # Bare references to other fields only constrain through `!=`
+            return {}
+        if name not in self._definitions:
+            if name in self._resolving:
+                raise CueSyntaxError(f"recursive definition {name}")
+            self._resolving.add(name)
+            try:
+                self._definitions[name] = self.emit(self.package.definition(name))
+            finally:
+                self._resolving.discard(name)
+        return self._definitions[name]
+
+    def emit_struct(self, struct: Struct) -> dict[str, Any]:
+        schema: dict[str, Any] = {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {},
+        }
+        required = []
+        for decl in struct.fields:
+            if decl.hidden:
+                continue
+            prop = self.emit(decl.value)
+            if decl.doc:
+                prop = {**prop, "description": decl.doc}
+            schema["properties"][decl.name] = prop
+            if not decl.optional:
+                required.append(decl.name)
+
+        for _, value in struct.patterns:
+            schema["additionalProperties"] = self.emit(value)
+        if not schema["properties"] and struct.patterns:
+            del schema["properties"]
+        if required:
+            schema["required"] = required
+        if struct.comment:
+            schema["description"] = struct.comment
+
+        for embed in struct.embeds:
+            schema = self._merge(schema, self.emit(embed))
+        return schema
+
+    def emit_disjunction(self, expr: Disjunction) -> dict[str, Any]:
+        defaults = [option.value for option in expr.options if isinstance(option, Default)]
+        options = [option for option in expr.options if not isinstance(option, Default)]
+        if len(defaults) > 1:
+            raise CueSyntaxError("more than one default in disjunction")
+
+        literals = [option.value for option in options if isinstance(option, Literal)]
+        types = [option for option in options if not isinstance(option, Literal)]
+
+        schema: dict[str, Any] = {}
+        if defaults:
+            schema["default"] = _literal_value(defaults[0])
+            # A default that is only a value (`*"x"`) is one of the allowed values
+            if not options or isinstance(defaults[0], Literal):
+                if schema["default"] not in literals:
+                    literals.insert(0, schema["default"])
+
+        if not types:
+            kinds = {_json_type(value) for value in literals}
+            schema["type"] = kinds.pop() if len(kinds) == 1 else sorted(kinds)
+            schema["enum"] = literals
+        elif len(types) == 1:
+            # Literals next to a type (`*"oidc:" | "-" | string`) are covered by the type
+            schema.update(self.emit(types[0]))
+        else:
+            schema["anyOf"] = [self.emit(option) for option in types]
+        return _ordered(schema)
+
+    def emit_conjunction(self, terms: tuple[Expr, ...]) -> dict[str, Any]:
+        schema: dict[str, Any] = {}
+        excluded: list[Any] = []
+
+        for term in terms:
+            if isinstance(term, Conjunction):
+                schema = self._merge(schema, self.emit_conjunction(term.terms))
+            elif isinstance(term, Ref):
+                schema = self._merge(schema, self.emit_ref(term.name))
+            elif isinstance(term, Unary):
+                self._apply_constraint(schema, excluded, term)
+            elif isinstance(term, Call):
+                self._apply_call(schema, term)
+            elif isinstance(term, Literal):
+                schema = self._merge(
+                    schema, {"type": _json_type(term.value), "enum": [term.value]}
+                )
+            elif isinstance(term, Comprehension):
+                # Values computed from other fields only constrain through their context
+                continue
             else:
-                current_comment = comment
-            i += 1
-            continue
-
-        # Parse field definitions
-        field_match = re.match(r"^(\w+)(\?)?\s*:\s*(.+)$", line)
-        if field_match:
-            field_name = field_match.group(1)
-            is_optional = field_match.group(2) == "?"
-            field_type = field_match.group(3).rstrip(",")
-
-            # Handle multi-line nested objects
-            open_braces = field_type.count("{")
-            close_braces = field_type.count("}")
-            if open_braces > close_braces:
-                # Collect all lines until we find the matching closing brace
-                brace_count = open_braces - close_braces
-                full_type = field_type
-                while brace_count > 0 and i + 1 < len(lines):
-                    i += 1
-                    next_line = lines[i]
-                    full_type += "\n" + next_line
-                    brace_count += next_line.count("{") - next_line.count("}")
-                field_type = full_type
-
-            prop = parse_field_type(field_name, field_type)
-            if current_comment:
-                prop["description"] = current_comment
-
-            schema["properties"][field_name] = prop
-
-            if not is_optional:
-                schema["required"].append(field_name)
-
-            current_comment = ""
-
-        i += 1
-
-
-def parse_field_type(field_name: str, type_def: str) -> dict[str, Any]:
-    """Convert CUE type definition to JSON Schema property."""
-    prop: dict[str, Any] = {}
-
-    # Handle nested object types (like proxmox_vm_defaults)
-    if type_def.startswith("{"):
-        return parse_nested_object(type_def)
-
-    # Handle array types [...Type] (use DOTALL for multi-line nested objects)
-    # Use greedy matching with end anchor to avoid stopping at ] inside regex patterns
-    # e.g., [...{name: string & =~"^[a-z0-9-]*$"}] - the [a-z0-9-] has a ] inside
-    array_match = re.match(r"\[\.\.\.(.*)\]$", type_def, re.DOTALL)
-    if array_match:
-        inner_type = array_match.group(1).strip()
-        prop["type"] = "array"
-        prop["items"] = get_simple_type(inner_type)
-        return prop
-
-    # Handle default values with alternation: *"value" | type OR *value | type
-    # Try quoted default first: *"value" | rest
-    # Use (?:[^"\\]|\\.)* to properly handle escaped quotes within the string
-    quoted_default = re.match(r'\*"((?:[^"\\]|\\.)*)"\s*\|\s*(.+)', type_def)
-    if quoted_default:
-        default_val = quoted_default.group(1)
-        # Unescape CUE string escape sequences: \" -> ", \\ -> \
-        default_val = default_val.replace('\\"', '"').replace("\\\\", "\\")
-        rest_type = quoted_default.group(2)
-        prop["default"] = default_val
-
-        # Check if rest_type contains type keywords (type union, not enum)
-        # Pattern: *"value" | string OR *"value" | "-" | string
-        # Type keywords: string, int, bool, net.IPv4, net.FQDN, net.IPCIDR
-        type_keywords = r"\b(string|int|bool|net\.IPv4|net\.FQDN|net\.IPCIDR)\b"
-        if re.search(type_keywords, rest_type):
-            # This is a type union (e.g., "oidc:" | "-" | string), not an enum
-            # Just parse the type and keep the default value
-            type_props = parse_type_constraints(rest_type)
-            prop.update(type_props)
-            return prop
-
-        # Check if rest_type contains enum values: "value1" | "value2"
-        # Use (?:[^"\\]|\\.)* to properly handle escaped quotes
-        enum_match = re.findall(r'"((?:[^"\\]|\\.)*)"', rest_type)
-        if enum_match and "|" in rest_type:
-            prop["type"] = "string"
-            # Build enum list from rest_type only (not from full type_def)
-            prop["enum"] = enum_match
-            # Add default value to enum if not already present
-            if default_val not in enum_match:
-                prop["enum"].insert(0, default_val)
-            return prop
-
-        # Parse remaining type constraints
-        type_props = parse_type_constraints(rest_type)
-        prop.update(type_props)
-        return prop
-
-    # Try unquoted default: *value | rest
-    unquoted_default = re.match(r"\*([^\s|]+)\s*\|\s*(.+)", type_def)
-    if unquoted_default:
-        default_val = unquoted_default.group(1).strip()
-        rest_type = unquoted_default.group(2)
-
-        # Try to parse the default value
-        if default_val.lower() == "true":
-            prop["default"] = True
-        elif default_val.lower() == "false":
-            prop["default"] = False
-        elif default_val.isdigit():
-            prop["default"] = int(default_val)
-        elif default_val == "[]":
-            # Empty array default (e.g., *[] | [...string])
-            prop["default"] = []
+                schema = self._merge(schema, self.emit(term))
+
+        if excluded:
+            schema["not"] = {"enum": excluded}
+        if "type" not in schema:
+            if schema.keys() & {"pattern", "format", "minLength", "maxLength"}:
+                schema["type"] = "string"
+            elif schema.keys() & {"minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum"}:
+                schema["type"] = "integer"
+        return _ordered(schema)
+
+    def _apply_constraint(self, schema: dict[str, Any], excluded: list[Any], term: Unary) -> None:
+        operand = term.operand
+        if (
+            term.op == "!="
+            and isinstance(operand, Ref)
+            and operand.name not in BUILTIN_TYPES
+            and not operand.name.startswith("#")
+            and "." not in operand.name
+        ):
+            # Cross-field constraint (`!=node_cidr`) on a sibling field
+            schema.setdefault(NOT_EQUAL_KEYWORD, []).append(operand.name)
+            return
+        if not isinstance(operand, Literal):
+            return
+
+        if term.op == "=~":
+            if "pattern" in schema:
+                schema.setdefault("allOf", []).append({"pattern": operand.value})
+            else:
+                schema["pattern"] = operand.value
+        elif term.op == "!~":
+            schema.setdefault("allOf", []).append({"not": {"pattern": operand.value}})
+        elif term.op == "!=":
+            if operand.value == "":
+                schema["minLength"] = max(schema.get("minLength", 0), 1)
+            else:
+                excluded.append(operand.value)
+        elif term.op == "==":
+            schema["enum"] = [operand.value]
         else:
-            prop["default"] = default_val
-
-        # Handle array type in rest_type (e.g., [...string] or [...string] // comment)
-        # Use non-greedy match to stop at first ] and don't require end of string
-        array_match = re.match(r"\[\.\.\.(.+?)\]", rest_type.strip())
-        if array_match:
-            inner_type = array_match.group(1).strip()
-            prop["type"] = "array"
-            prop["items"] = get_simple_type(inner_type)
-            return prop
-
-        # Parse remaining type constraints
-        type_props = parse_type_constraints(rest_type)
-        prop.update(type_props)
-        return prop
-
-    # Handle enum types: "value1" | "value2"
-    # Use (?:[^"\\]|\\.)+ to properly handle escaped quotes
-    enum_match = re.findall(r'"((?:[^"\\]|\\.)+)"', type_def)
-    if enum_match and "|" in type_def and "=~" not in type_def:
-        prop["type"] = "string"
-        prop["enum"] = enum_match
-        return prop
-
-    # Parse type constraints
-    type_props = parse_type_constraints(type_def)
-    prop.update(type_props)
-
-    return prop
-
-
-def parse_nested_object(type_def: str) -> dict[str, Any]:
-    """Parse a nested object type definition."""
-    prop: dict[str, Any] = {
-        "type": "object",
-        "additionalProperties": False,
-        "properties": {},
+            schema[BOUND_KEYWORDS[term.op]] = operand.value
+
+    def _apply_call(self, schema: dict[str, Any], call: Call) -> None:
+        if call.name == "list.UniqueItems":
+            schema["uniqueItems"] = True
+        elif call.name in BUILTIN_CALLS and call.args and isinstance(call.args[0], Literal):
+            schema[BUILTIN_CALLS[call.name]] = call.args[0].value
+
+    def _merge(self, schema: dict[str, Any], other: dict[str, Any]) -> dict[str, Any]:
+        """Unify two schemas, keeping the properties and required fields of both."""
+        merged = {**schema, **other}
+        if "properties" in schema and "properties" in other:
+            merged["properties"] = {**schema["properties"], **other["properties"]}
+        if "required" in schema and "required" in other:
+            merged["required"] = schema["required"] + [
+                name for name in other["required"] if name not in schema["required"]
+            ]
+        return merged
+
+
+def build_schema(package: Package, target: SchemaTarget) -> dict[str, Any]:
+    """Build the JSON Schema for the #Config definition of target.source."""
+    config = package.file_definition(target.source, "#Config")
+    body = SchemaEmitter(package).emit(config)
+    return {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "$id": f"{SCHEMA_BASE_URL}/{target.output}",
+        "title": target.title,
+        "description": target.description,
+        **body,
     }
 
-    # Extract content between braces - handle multi-line
-    brace_count = 0
-    start_idx = type_def.find("{")
-    if start_idx == -1:
-        return prop
-
-    end_idx = start_idx
-    for i, char in enumerate(type_def[start_idx:], start_idx):
-        if char == "{":
-            brace_count += 1
-        elif char == "}":
-            brace_count -= 1
-            if brace_count == 0:
-                end_idx = i
-                break
-
-    content = type_def[start_idx + 1 : end_idx]
-    current_comment = ""
-
-    for line in content.split("\n"):
-        line = line.strip()
-        if not line:
-            current_comment = ""
-            continue
 
-        if line.startswith("//"):
-            comment = line[2:].strip()
-            if current_comment:
-                current_comment += " " + comment
-            else:
-                current_comment = comment
-            continue
+# JSON Schema types as Python annotations
+PYTHON_TYPES = {
+    "string": "str",
+    "integer": "int",
+    "number": "float",
+    "boolean": "bool",
+    "null": "None",
+}
+
+# Attributes of model.ConfigModel that a field would shadow
+RESERVED_FIELDS = {
+    *dir(MutableMapping),
+    "DEFAULTS",
+    "FIELDS",
+    "NESTED",
+    "from_dict",
+    "use_default",
+}
+
+
+@dataclass
+class ModelClass:
+    """One generated config class."""
+
+    name: str
+    path: str
+    annotations: dict[str, str] = field(default_factory=dict)
+    defaults: dict[str, Any] = field(default_factory=dict)
+    nested: dict[str, tuple[str, bool]] = field(default_factory=dict)
+
+
+def _class_name(parent: str, field_name: str, root: str, item: bool) -> str:
+    if item and field_name.endswith("s") and not field_name.endswith("ss"):
+        field_name = field_name[:-1]
+    name = "".join(part.capitalize() for part in field_name.split("_"))
+    return name if parent == root else parent + name
+
+
+def _py_literal(value: Any) -> str:
+    if isinstance(value, bool) or value is None:
+        return repr(value)
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, list):
+        return "[" + ", ".join(_py_literal(item) for item in value) + "]"
+    return repr(value)
+
+
+class ModelBuilder:
+    """Turn the emitted JSON Schema of #Config into slot dataclass definitions."""
+
+    def __init__(self, root: str):
+        self.root = root
+        # Insertion order puts nested classes before the classes that use them
+        self.classes: dict[str, ModelClass] = {}
+
+    def add_class(self, name: str, schema: dict[str, Any], path: str) -> str:
+        model = ModelClass(name, path)
+        for field_name, prop in schema.get("properties", {}).items():
+            if (
+                field_name in RESERVED_FIELDS
+                or not field_name.isidentifier()
+                or keyword.iskeyword(field_name)
+            ):
+                raise CueSyntaxError(f"{path}.{field_name}: field name cannot be a Python attribute")
+            model.annotations[field_name] = self.annotation(model, field_name, prop)
+            if "default" in prop:
+                model.defaults[field_name] = prop["default"]
+
+        if name in self.classes:
+            raise CueSyntaxError(f"{path}: class name {name} is already used")
+        self.classes[name] = model
+        return name
+
+    def annotation(self, model: ModelClass, field_name: str, prop: dict[str, Any]) -> str:
+        path = f"{model.path}.{field_name}"
+        if prop.get("type") == "object" and "properties" in prop:
+            name = self.add_class(
+                _class_name(model.name, field_name, self.root, False), prop, path
+            )
+            model.nested[field_name] = (name, False)
+            return name
+        if prop.get("type") == "array":
+            items = prop.get("items", {})
+            if items.get("type") == "object" and "properties" in items:
+                name = self.add_class(
+                    _class_name(model.name, field_name, self.root, True), items, f"{path}[]"
+                )
+                model.nested[field_name] = (name, True)
+                return f"list[{name}]"
+            return f"list[{self.scalar(items)}]"
+        if prop.get("type") == "object":
+            values = prop.get("additionalProperties")
+            value_type = self.scalar(values) if isinstance(values, dict) else "Any"
+            return f"dict[str, {value_type}]"
+        return self.scalar(prop)
+
+    def scalar(self, prop: dict[str, Any]) -> str:
+        if "anyOf" in prop:
+            return " | ".join(self.scalar(option) for option in prop["anyOf"])
+        types = prop.get("type")
+        if types is None:
+            return "Any"
+        if prop.get("type") == "array":
+            return f"list[{self.scalar(prop.get('items', {}))}]"
+        if isinstance(types, list):
+            return " | ".join(PYTHON_TYPES.get(name, "Any") for name in types)
+        return PYTHON_TYPES.get(types, "Any")
+
+    def render(self) -> str:
+        lines = [
+            '"""',
+            "Config classes generated from cluster.schema.cue and nodes.schema.cue.",
+            "",
+            "Generated by .taskfiles/template/resources/generate_jsonschema.py, do not edit.",
+            '"""',
+            "",
+            "from __future__ import annotations",
+            "",
+            "from typing import Any, ClassVar",
+            "",
+            "from model import ConfigModel, config_model",
+        ]
+        for model in self.classes.values():
+            lines += ["", "", "@config_model", f"class {model.name}(ConfigModel):"]
+            lines.append(f'    """#Config{model.path}"""')
+            lines.append("")
+            if model.defaults:
+                lines.append("    DEFAULTS: ClassVar[dict[str, Any]] = {")
+                lines += [f"        {json.dumps(k)}: {_py_literal(v)}," for k, v in model.defaults.items()]
+                lines.append("    }")
+            if model.nested:
+                lines.append("    NESTED: ClassVar[dict[str, tuple[type[ConfigModel], bool]]] = {")
+                lines += [
+                    f"        {json.dumps(k)}: ({name}, {is_list}),"
+                    for k, (name, is_list) in model.nested.items()
+                ]
+                lines.append("    }")
+            if model.defaults or model.nested:
+                lines.append("")
+            lines += [f"    {name}: {annotation}" for name, annotation in model.annotations.items()]
+        return "\n".join(lines) + "\n"
+
+
+def build_model(package: Package) -> str:
+    """Build config_model.py from #Config unified across every file of the package."""
+    schema = SchemaEmitter(package).emit(package.definition("#Config"))
+    builder = ModelBuilder("Cluster")
+    builder.add_class("Cluster", schema, "")
+    return builder.render()
+
+
+def cache_key(name: str, resources_dir: Path) -> str:
+    """Hash of the generator, the parser and every CUE file of the package."""
+    digest = hashlib.sha256(name.encode())
+    for path in (Path(__file__), RESOURCES_DIR / "cue_schema.py"):
+        digest.update(path.read_bytes())
+    for name in PACKAGE_FILES:
+        digest.update(name.encode() + b"\0" + (resources_dir / name).read_bytes())
+    return digest.hexdigest()
+
+
+def generate_schemas(
+    names: list[str], resources_dir: Path, cache_dir: Path | None
+) -> bool:
+    """Generate the named schemas, parsing the package at most once."""
+    package: Package | None = None
+    success = True
 
-        # Handle CUE map pattern: [string]: value_type
-        # This indicates any string key is allowed with values of the specified type
-        # Example: langfuse_role_mapping?: { [string]: "OWNER" | "ADMIN" | "MEMBER" }
-        map_match = re.match(r"^\[string\]\s*:\s*(.+)$", line)
-        if map_match:
-            value_type = map_match.group(1).rstrip(",")
-            # Parse enum values (e.g., "OWNER" | "ADMIN" | "MEMBER")
-            enum_values = re.findall(r'"([^"]+)"', value_type)
-            if enum_values and "|" in value_type:
-                prop["additionalProperties"] = {"type": "string", "enum": enum_values}
+    for name in names:
+        output_path = MODEL_OUTPUT if name == "model" else resources_dir / TARGETS[name].output
+        try:
+            key = cache_key(name, resources_dir)
+            cached = cache_dir / f"{name}-{key}{output_path.suffix}" if cache_dir else None
+            if cached is not None and cached.is_file():
+                content = cached.read_text()
+                origin = " (cached)"
             else:
-                # Default to string type for unknown value types
-                prop["additionalProperties"] = {"type": "string"}
-            # Remove empty properties since we're using additionalProperties
-            if not prop["properties"]:
-                del prop["properties"]
-            if current_comment:
-                prop["description"] = current_comment
+                if package is None:
+                    package = load_package([resources_dir / file for file in PACKAGE_FILES])
+                if name == "model":
+                    content = build_model(package)
+                else:
+                    content = json.dumps(build_schema(package, TARGETS[name]), indent=2) + "\n"
+                origin = ""
+                if cached is not None:
+                    cached.parent.mkdir(parents=True, exist_ok=True)
+                    for stale in cached.parent.glob(f"{name}-*"):
+                        stale.unlink()
+                    cached.write_text(content)
+        except (OSError, CueSyntaxError) as e:
+            print(f"Error generating {name} schema: {e}", file=sys.stderr)
+            success = False
             continue
 
-        field_match = re.match(r"^(\w+)(\?)?\s*:\s*(.+)$", line)
-        if field_match:
-            field_name = field_match.group(1)
-            field_type = field_match.group(3).rstrip(",")
-            field_prop = parse_field_type(field_name, field_type)
-            if current_comment:
-                field_prop["description"] = current_comment
-            prop["properties"][field_name] = field_prop
-            current_comment = ""
-
-    return prop
-
-
-def parse_type_constraints(type_def: str) -> dict[str, Any]:
-    """Parse CUE type constraints and convert to JSON Schema."""
-    prop: dict[str, Any] = {}
-
-    # Remove leading type markers
-    type_def = type_def.strip()
-
-    # Handle bool type
-    if "bool" in type_def:
-        prop["type"] = "boolean"
-        return prop
-
-    # Handle standalone range constraints (like >=1450 & <=9000)
-    range_only = re.match(r"^>=(\d+)\s*&\s*<=(\d+)$", type_def)
-    if range_only:
-        prop["type"] = "integer"
-        prop["minimum"] = int(range_only.group(1))
-        prop["maximum"] = int(range_only.group(2))
-        return prop
-
-    # Handle int type with range constraints
-    if "int" in type_def:
-        prop["type"] = "integer"
-
-        # Extract min constraint
-        min_match = re.search(r">=(\d+)", type_def)
-        if min_match:
-            prop["minimum"] = int(min_match.group(1))
-
-        # Extract max constraint
-        max_match = re.search(r"<=(\d+)", type_def)
-        if max_match:
-            prop["maximum"] = int(max_match.group(1))
-
-        return prop
-
-    # Handle string with regex pattern
-    pattern_match = re.search(r'=~"([^"]+)"', type_def)
-    if pattern_match:
-        prop["type"] = "string"
-        # Unescape CUE string escapes (e.g., \\ -> \) for JSON Schema
-        prop["pattern"] = pattern_match.group(1).replace("\\\\", "\\")
-        return prop
-
-    # Handle net types
-    if "net.IPCIDR" in type_def:
-        prop["type"] = "string"
-        prop["format"] = "ipv4-cidr"
-        prop["pattern"] = r"^(\d{1,3}\.){3}\d{1,3}/\d{1,2}$"
-        return prop
-
-    if "net.IPv4" in type_def:
-        prop["type"] = "string"
-        prop["format"] = "ipv4"
-        prop["pattern"] = r"^(\d{1,3}\.){3}\d{1,3}$"
-        return prop
-
-    if "net.FQDN" in type_def:
-        prop["type"] = "string"
-        prop["format"] = "hostname"
-        return prop
-
-    # Handle plain string
-    if "string" in type_def:
-        prop["type"] = "string"
-        if '!=""' in type_def:
-            prop["minLength"] = 1
-        return prop
-
-    # Default to string for unrecognized types
-    prop["type"] = "string"
-    return prop
-
-
-def get_simple_type(type_name: str) -> dict[str, Any]:
-    """Get JSON Schema type for simple CUE types."""
-    type_name = type_name.strip()
-
-    if type_name == "net.IPv4":
-        return {"type": "string", "format": "ipv4"}
-    if type_name == "net.FQDN":
-        return {"type": "string", "format": "hostname"}
-    if type_name == "net.IPCIDR":
-        return {"type": "string", "format": "ipv4-cidr"}
-    if type_name == "string":
-        return {"type": "string"}
-    if type_name == "int":
-        return {"type": "integer"}
-    if type_name == "bool":
-        return {"type": "boolean"}
-
-    # Handle nested object in array
-    if type_name.startswith("{"):
-        return parse_nested_object(type_name)
-
-    # Handle reference to another definition (like #Node)
-    if type_name.startswith("#"):
-        # This should be resolved by the caller
-        return {"type": "object"}
-
-    return {"type": "string"}
-
-
-def generate_schema(
-    input_path: Path,
-    output_path: Path,
-    schema_type: str,
-) -> bool:
-    """Generate a JSON Schema from a CUE schema file."""
-    if not input_path.exists():
-        print(f"Error: Input file not found: {input_path}", file=sys.stderr)
-        return False
-
-    try:
-        cue_content = input_path.read_text()
-
-        if schema_type == "cluster":
-            schema = parse_cluster_schema(cue_content)
-        elif schema_type == "nodes":
-            schema = parse_nodes_schema(cue_content)
-        else:
-            print(f"Error: Unknown schema type: {schema_type}", file=sys.stderr)
-            return False
-
-        # Write JSON Schema
-        output_path.write_text(json.dumps(schema, indent=2) + "\n")
-        print(f"Generated JSON Schema: {output_path}")
-        return True
+        if not output_path.is_file() or output_path.read_text() != content:
+            output_path.write_text(content)
+        kind = "config model" if name == "model" else "JSON Schema"
+        print(f"Generated {kind}: {output_path}{origin}")
+
+    return success
+
+
+def synthetic_schema(source: str, scale: int) -> str:
+    """Repeat the #Config fields of source scale times under distinct names."""
+    start = source.index("#Config: {")
+    end = source.rindex("\n}")
+    body = source[source.index("\n", start) : end]
+    label = re.compile(r"^(\t[a-z_][a-z0-9_]*)(\??:)", re.MULTILINE)
+    copies = [label.sub(rf"\g<1>_{index}\g<2>", body) for index in range(scale)]
+    return source[: start] + "#Config: {" + "".join(copies) + source[end:]
+
+
+def time_scaling(resources_dir: Path, scale: int) -> None:
+    """Parse and emit the cluster schema at 1x and scale-x size and compare the times."""
+    source = (resources_dir / "cluster.schema.cue").read_text()
+    target = TARGETS["cluster"]
+    timings = []
+
+    # Warm up regex compilation and imports before timing
+    parse(source, target.source)
+
+    for factor in (1, scale):
+        text = synthetic_schema(source, factor) if factor > 1 else source
+        start = time.perf_counter()
+        package = Package()
+        package.add(parse(text, target.source))
+        schema = build_schema(package, target)
+        elapsed = time.perf_counter() - start
+        timings.append(elapsed)
+        print(
+            f"{factor:>4}x: {text.count(chr(10)):>6} lines, "
+            f"{len(schema['properties']):>6} fields in {elapsed * 1000:.1f}ms"
+        )
 
-    except Exception as e:
-        print(f"Error generating {schema_type} schema: {e}", file=sys.stderr)
-        return False
+    print(f"{scale}x input took {timings[1] / timings[0]:.1f}x as long")
 
 
 def main() -> int:
@@ -484,29 +632,40 @@ def main() -> int:
         action="store_true",
         help="Generate nodes schema only",
     )
+    parser.add_argument(
+        "--model",
+        action="store_true",
+        help="Generate the config model (templates/scripts/config_model.py) only",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+        help="Generated schema cache (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always parse the CUE sources",
+    )
+    parser.add_argument(
+        "--scale",
+        type=int,
+        metavar="N",
+        help="Time parsing a synthetic schema N times the size of cluster.schema.cue",
+    )
     args = parser.parse_args()
 
-    resources_dir = Path(__file__).parent
-    success = True
-
-    # If no specific schema requested, generate all
-    generate_all = not args.cluster and not args.nodes
+    if args.scale:
+        time_scaling(RESOURCES_DIR, max(args.scale, 2))
+        return 0
 
-    if args.cluster or generate_all:
-        success &= generate_schema(
-            resources_dir / "cluster.schema.cue",
-            resources_dir / "cluster.schema.json",
-            "cluster",
-        )
-
-    if args.nodes or generate_all:
-        success &= generate_schema(
-            resources_dir / "nodes.schema.cue",
-            resources_dir / "nodes.schema.json",
-            "nodes",
-        )
+    # If no specific output requested, generate all
+    outputs = [*TARGETS, "model"]
+    names = [name for name in outputs if getattr(args, name)] or outputs
+    cache_dir = None if args.no_cache else args.cache_dir
 
-    return 0 if success else 1
+    return 0 if generate_schemas(names, RESOURCES_DIR, cache_dir) else 1
 
 
 if __name__ == "__main__":
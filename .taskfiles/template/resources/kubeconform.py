@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Validate the rendered Kubernetes manifests with kustomize and kubeconform.
+
+Every standalone manifest in kubernetes/flux and every kustomization under
+kubernetes/flux and kubernetes/apps is a validation target. Targets are built
+and validated concurrently by a bounded pool of workers. Each worker runs
+`kustomize build | kubeconform` (or kubeconform alone for a standalone file).
+
+A passing target is recorded in the cache under a hash of its content. The
+hash covers every file below the kustomization directory, the directories it
+references outside itself (such as ../../components/sops), the kubeconform
+arguments and the tool versions. An unchanged target is skipped on the next
+run. Failures are never cached. All of them are collected and reported
+together once every target has run.
+
+When the offline schema store (schema_store.py) exists, it is unpacked once
+per store version (with --no-cache, into a scratch directory removed on exit)
+and kubeconform reads schemas only from it. Gateway API
+kinds are then validated too. Without the store, schemas are fetched from
+kubernetes-schemas.pages.dev and Gateway and HTTPRoute are skipped.
+
+Usage:
+    python kubeconform.py kubernetes                  # Validate, skipping unchanged targets
+    python kubeconform.py kubernetes --jobs 4         # Limit the worker pool
+    python kubeconform.py kubernetes --no-cache       # Validate every target
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import yaml
+from schema_store import DEFAULT_STORE, SchemaStore
+
+ROOT_DIR = Path(__file__).resolve().parents[3]
+DEFAULT_CACHE_DIR = ROOT_DIR / ".cache" / "kubeconform"
+CACHE_FILE = "passed.json"
+# Bump to invalidate every cached pass when the hashing scheme changes
+CACHE_VERSION = 1
+
+KUSTOMIZATION_FILE = "kustomization.yaml"
+KUSTOMIZE_ARGS = ["--load-restrictor=LoadRestrictionsNone"]
+KUBECONFORM_ARGS = ["-strict", "-ignore-missing-schemas"]
+# Without a schema store, schemas are fetched per kind and Gateway API kinds are skipped
+REMOTE_SCHEMA_ARGS = [
+    "-skip",
+    "Gateway,HTTPRoute,Secret",
+    "-schema-location",
+    "default",
+    "-schema-location",
+    "https://kubernetes-schemas.pages.dev/{{.Group}}/{{.ResourceKind}}_{{.ResourceAPIVersion}}.json",
+]
+
+
+def store_schema_args(schema_dir: Path) -> list[str]:
+    """Validate offline against an exported schema store; Secrets carry SOPS metadata."""
+    return [
+        "-skip",
+        "Secret",
+        "-schema-location",
+        f"{schema_dir}/{{{{.Group}}}}/{{{{.ResourceKind}}}}_{{{{.ResourceAPIVersion}}}}.json",
+    ]
+
+
+def export_schema_store(store_path: Path, parent: Path) -> Path:
+    """Unpack the store into parent once per store version and return the directory."""
+    with SchemaStore(store_path) as store:
+        directory = parent / f"schemas-{store.version}"
+        if not directory.is_dir():
+            parent.mkdir(parents=True, exist_ok=True)
+            for stale in parent.glob("schemas-*"):
+                shutil.rmtree(stale, ignore_errors=True)
+            staging = Path(tempfile.mkdtemp(dir=parent))
+            store.export(staging)
+            staging.rename(directory)
+    return directory
+
+
+@dataclass(frozen=True)
+class Target:
+    """A standalone manifest or a kustomization directory to validate."""
+
+    path: Path
+    kustomization: bool
+
+    @property
+    def label(self) -> str:
+        return f"{self.path}{'/' if self.kustomization else ''}"
+
+
+@dataclass
+class Result:
+    target: Target
+    status: str  # "passed", "cached" or "failed"
+    output: str = ""
+
+
+def find_targets(kubernetes_dir: Path) -> list[Target]:
+    """Standalone flux manifests first, then flux and app kustomizations, in path order."""
+    flux_dir = kubernetes_dir / "flux"
+    targets = [
+        Target(path, kustomization=False)
+        for path in sorted(flux_dir.glob("*.yaml"))
+        if path.is_file()
+    ]
+    for directory in (flux_dir, kubernetes_dir / "apps"):
+        targets.extend(
+            Target(path.parent, kustomization=True)
+            for path in sorted(directory.rglob(KUSTOMIZATION_FILE))
+        )
+    return targets
+
+
+def _referenced_paths(document: Any) -> Iterator[str]:
+    """Every string in a kustomization that looks like a path leaving its directory."""
+    if isinstance(document, str):
+        if document.startswith(".."):
+            yield document
+    elif isinstance(document, dict):
+        for value in document.values():
+            yield from _referenced_paths(value)
+    elif isinstance(document, list):
+        for value in document:
+            yield from _referenced_paths(value)
+
+
+def content_paths(target: Target) -> list[Path]:
+    """The files a target's build can read: its tree plus referenced outside paths, transitively."""
+    if not target.kustomization:
+        return [target.path]
+
+    files: set[Path] = set()
+    pending = [target.path.resolve()]
+    seen: set[Path] = set()
+    while pending:
+        path = pending.pop()
+        if path in seen or not path.exists():
+            continue
+        seen.add(path)
+        candidates = sorted(path.rglob("*")) if path.is_dir() else [path]
+        for file in candidates:
+            if not file.is_file():
+                continue
+            files.add(file)
+            if file.name != KUSTOMIZATION_FILE:
+                continue
+            try:
+                document = yaml.safe_load(file.read_text())
+            except yaml.YAMLError:
+                # kustomize reports the syntax error; the file is hashed either way
+                continue
+            for reference in _referenced_paths(document):
+                pending.append((file.parent / reference).resolve())
+    return sorted(files)
+
+
+def tool_versions() -> str:
+    """kustomize and kubeconform versions, so an upgrade revalidates everything."""
+    versions = []
+    for command in (["kustomize", "version"], ["kubeconform", "-v"]):
+        result = subprocess.run(command, capture_output=True, text=True)
+        versions.append(result.stdout.strip() or result.stderr.strip())
+    return "\n".join(versions)
+
+
+def target_key(target: Target, base: Path, salt: str) -> str:
+    """Hash of a target's files, their paths relative to base and the salt."""
+    digest = hashlib.sha256(salt.encode())
+    for path in content_paths(target):
+        digest.update(str(path.relative_to(base) if path.is_relative_to(base) else path).encode())
+        digest.update(b"\0")
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    return digest.hexdigest()
+
+
+def validate(target: Target, kubeconform_args: list[str]) -> tuple[bool, str]:
+    """Run kustomize and kubeconform for one target. Returns (passed, output)."""
+    if target.kustomization:
+        build = subprocess.run(
+            ["kustomize", "build", str(target.path), *KUSTOMIZE_ARGS],
+            capture_output=True,
+            text=True,
+        )
+        if build.returncode != 0:
+            return False, f"kustomize build failed:\n{build.stderr.strip()}"
+        check = subprocess.run(
+            ["kubeconform", *kubeconform_args],
+            input=build.stdout,
+            capture_output=True,
+            text=True,
+        )
+    else:
+        check = subprocess.run(
+            ["kubeconform", *kubeconform_args, str(target.path)],
+            capture_output=True,
+            text=True,
+        )
+    output = "\n".join(part for part in (check.stdout.strip(), check.stderr.strip()) if part)
+    return check.returncode == 0, output
+
+
+class PassCache:
+    """Content keys of targets that passed, stored as one JSON file."""
+
+    def __init__(self, path: Path | None):
+        self.path = path
+        self.passed: set[str] = set()
+        if path is not None and path.is_file():
+            try:
+                stored = json.loads(path.read_text())
+            except (OSError, ValueError):
+                stored = {}
+            if stored.get("version") == CACHE_VERSION:
+                self.passed = set(stored.get("passed", []))
+
+    def save(self, passed: set[str]) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Only the current targets are kept, so removed apps do not linger
+        payload = {"version": CACHE_VERSION, "passed": sorted(passed)}
+        self.path.write_text(json.dumps(payload, indent=2) + "\n")
+
+
+def run(
+    kubernetes_dir: Path, jobs: int, cache_dir: Path | None, store_path: Path | None
+) -> int:
+    targets = find_targets(kubernetes_dir)
+    cache = PassCache(cache_dir / CACHE_FILE if cache_dir is not None else None)
+
+    # Without a cache the store is unpacked into a scratch directory removed on exit
+    with (
+        contextlib.nullcontext(cache_dir)
+        if cache_dir is not None
+        else tempfile.TemporaryDirectory()
+    ) as parent:
+        if store_path is not None and store_path.is_file():
+            schema_dir = export_schema_store(store_path, Path(parent))
+            kubeconform_args = [*KUBECONFORM_ARGS, *store_schema_args(schema_dir)]
+            print(f"Using schema store {store_path} (offline)")
+        else:
+            kubeconform_args = [*KUBECONFORM_ARGS, *REMOTE_SCHEMA_ARGS]
+        # The exported directory name carries the store version, so new schemas revalidate
+        salt = json.dumps([CACHE_VERSION, KUSTOMIZE_ARGS, kubeconform_args, tool_versions()])
+        base = kubernetes_dir.resolve()
+
+        def check(target: Target) -> tuple[Result, str]:
+            key = target_key(target, base, salt)
+            if key in cache.passed:
+                return Result(target, "cached"), key
+            passed, output = validate(target, kubeconform_args)
+            return Result(target, "passed" if passed else "failed", output), key
+
+        passed: set[str] = set()
+        failures: list[Result] = []
+        counts = {"passed": 0, "cached": 0, "failed": 0}
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            # map() yields in submission order, so the log is stable between runs
+            for result, key in pool.map(check, targets):
+                counts[result.status] += 1
+                print(f"{result.status:>6}  {result.target.label}")
+                if result.status == "failed":
+                    failures.append(result)
+                else:
+                    passed.add(key)
+
+    cache.save(passed)
+
+    for result in failures:
+        print(f"\n=== {result.target.label} ===", file=sys.stderr)
+        print(result.output or "(no output)", file=sys.stderr)
+    print(
+        f"\n{len(targets)} targets: {counts['passed']} passed, "
+        f"{counts['cached']} unchanged, {counts['failed']} failed"
+    )
+    return 1 if failures else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Validate rendered Kubernetes manifests with kustomize and kubeconform"
+    )
+    parser.add_argument("kubernetes_dir", type=Path, help="Rendered kubernetes directory")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        help="Concurrent validations, 0 uses one per CPU (default: 0)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+        help=f"Where passing targets are recorded (default: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Validate every target and skip the cache"
+    )
+    parser.add_argument(
+        "--schema-store",
+        type=Path,
+        default=DEFAULT_STORE,
+        help=f"Packed schema store for offline validation, used when present (default: {DEFAULT_STORE})",
+    )
+    args = parser.parse_args()
+
+    if not args.kubernetes_dir.is_dir():
+        print(f"Kubernetes directory not found: {args.kubernetes_dir}", file=sys.stderr)
+        return 1
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    try:
+        return run(
+            args.kubernetes_dir,
+            jobs,
+            None if args.no_cache else args.cache_dir,
+            args.schema_store,
+        )
+    except FileNotFoundError as e:
+        print(f"Required tool not found: {e.filename}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Validate the rendered Kubernetes manifests in-process, without kustomize or kubeconform.
+
+Every YAML file below the kubernetes directory is streamed through the
+libyaml-backed loader one document at a time. Each document is checked
+against the JSON Schema for its apiVersion and kind, taken from the offline
+schema store (schema_store.py). Schemas are compiled with the schema_validator
+compiler the first time a kind is seen and reused for every later document.
+As with kubeconform -strict, unknown fields are errors unless the schema
+preserves them.
+
+It also catches template problems the external tools let through:
+
+- empty documents, usually a `---` left behind by a disabled `#% if %#` guard;
+- two resources with the same kind and name in the same namespace;
+- `dependsOn` entries of Flux Kustomizations and HelmReleases naming an
+  object that is not rendered.
+
+A manifest without metadata.namespace takes the namespace of the closest
+kustomization.yaml that sets one. Every problem is reported as file:line.
+
+Usage:
+    python manifest_validator.py                     # Validate ./kubernetes
+    python manifest_validator.py path/to/kubernetes  # Validate another tree
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import yaml
+from schema_store import DEFAULT_STORE, IGNORED_GROUPS, SchemaStore, split_api_version
+from schema_validator import Check, compile_schema
+
+LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+KUSTOMIZATION_FILE = "kustomization.yaml"
+
+# Flux kinds whose spec.dependsOn names objects of the same kind
+DEPENDS_ON_KINDS = frozenset(
+    [
+        ("kustomize.toolkit.fluxcd.io", "Kustomization"),
+        ("helm.toolkit.fluxcd.io", "HelmRelease"),
+    ]
+)
+
+# "spec.rules[0].name" -> ("spec", "rules", 0, "name")
+_PATH_PART = re.compile(r"([^.\[\]]+)|\[(\d+)\]")
+
+
+def strict_schema(schema: Any) -> Any:
+    """Copy of schema rejecting unknown fields wherever properties are listed, like kubeconform -strict."""
+    if isinstance(schema, list):
+        return [strict_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    strict = {key: strict_schema(value) for key, value in schema.items()}
+    if (
+        "properties" in strict
+        and "additionalProperties" not in strict
+        and not strict.get("x-kubernetes-preserve-unknown-fields")
+    ):
+        strict["additionalProperties"] = False
+    return strict
+
+
+@dataclass(frozen=True)
+class Document:
+    """One YAML document with its composed node for locating errors."""
+
+    path: Path
+    line: int
+    node: yaml.Node
+    data: Any
+
+
+def iter_documents(path: Path) -> Iterator[Document]:
+    """Stream the documents of a file. Raises yaml.YAMLError on invalid YAML."""
+    with path.open("rb") as stream:
+        loader = LOADER(stream)
+        try:
+            previous_end = 0
+            while loader.check_node():
+                node = loader.get_node()
+                data = loader.construct_document(node)
+                # An empty document's node points past its `---`; the marker follows the previous document
+                line = node.start_mark.line + 1 if data is not None else previous_end + 1
+                yield Document(path, line, node, data)
+                previous_end = node.end_mark.line
+        finally:
+            loader.dispose()
+
+
+def locate(node: yaml.Node, path: str) -> int:
+    """The 1-based line of the deepest node reachable along a check error path."""
+    for name, index in _PATH_PART.findall(path):
+        child = None
+        if index and isinstance(node, yaml.SequenceNode):
+            position = int(index)
+            if position < len(node.value):
+                child = node.value[position]
+        elif name and isinstance(node, yaml.MappingNode):
+            child = next((value for key, value in node.value if key.value == name), None)
+        if child is None:
+            break
+        node = child
+    return node.start_mark.line + 1
+
+
+@lru_cache(maxsize=None)
+def kustomization_namespace(directory: Path, root: Path) -> str:
+    """Namespace set by the closest kustomization.yaml at or above directory, or ''."""
+    kustomization = directory / KUSTOMIZATION_FILE
+    if kustomization.is_file():
+        try:
+            document = yaml.load(kustomization.read_text(), Loader=LOADER)
+        except yaml.YAMLError:
+            document = None
+        if isinstance(document, dict) and isinstance(document.get("namespace"), str):
+            return document["namespace"]
+    if directory == root or directory.parent == directory:
+        return ""
+    return kustomization_namespace(directory.parent, root)
+
+
+@dataclass
+class Report:
+    errors: list[str] = field(default_factory=list)
+    unknown_kinds: set[str] = field(default_factory=set)
+    documents: int = 0
+    files: int = 0
+    validated: int = 0
+
+    def add(self, path: Path, line: int, message: str) -> None:
+        self.errors.append(f"{path}:{line}: {message}")
+
+
+class ManifestValidator:
+    """Validates a rendered tree, collecting every problem into a Report."""
+
+    def __init__(self, root: Path, store: SchemaStore | None):
+        self.root = root.resolve()
+        self.store = store
+        self.checks: dict[str, Check | None] = {}
+        self.report = Report()
+        # (group, kind, namespace, name) -> where it was first defined
+        self.resources: dict[tuple[str, str, str, str], str] = {}
+        # Flux dependsOn entries resolved once every resource is known
+        self.dependencies: list[tuple[Document, tuple[str, str, str, str], int]] = []
+
+    def check_for(self, api_version: str, kind: str) -> Check | None:
+        key = f"{api_version}/{kind}"
+        if key not in self.checks:
+            schema = self.store.lookup(api_version, kind) if self.store is not None else None
+            self.checks[key] = compile_schema(strict_schema(schema)) if schema is not None else None
+            if schema is None:
+                self.report.unknown_kinds.add(key)
+        return self.checks[key]
+
+    def validate_file(self, path: Path) -> None:
+        self.report.files += 1
+        try:
+            for document in iter_documents(path):
+                self.report.documents += 1
+                self.validate_document(document)
+        except yaml.YAMLError as e:
+            mark = getattr(e, "problem_mark", None)
+            line = mark.line + 1 if mark is not None else 1
+            self.report.add(path, line, f"invalid YAML: {getattr(e, 'problem', None) or e}")
+
+    def validate_document(self, document: Document) -> None:
+        data, path = document.data, document.path
+        if data is None:
+            self.report.add(path, document.line, "empty document (leftover `---` from a disabled guard?)")
+            return
+        if not isinstance(data, dict):
+            self.report.add(path, document.line, "document is not a mapping")
+            return
+
+        api_version, kind = data.get("apiVersion"), data.get("kind")
+        if not isinstance(api_version, str) or not isinstance(kind, str):
+            self.report.add(path, document.line, "missing apiVersion or kind")
+            return
+        group, _ = split_api_version(api_version)
+        if group in IGNORED_GROUPS:
+            return
+
+        check = self.check_for(api_version, kind)
+        if check is not None:
+            self.report.validated += 1
+            errors: list[str] = []
+            # SOPS adds its own top-level key to encrypted Secrets
+            check({key: value for key, value in data.items() if key != "sops"}, "", errors)
+            for error in errors:
+                error_path = error.split(": ", 1)[0]
+                self.report.add(path, locate(document.node, error_path), f"{kind} {error}")
+
+        metadata = data.get("metadata")
+        name = metadata.get("name") if isinstance(metadata, dict) else None
+        if not isinstance(name, str):
+            return
+        namespace = metadata.get("namespace") or kustomization_namespace(
+            path.parent.resolve(), self.root
+        )
+        identity = (group, kind, namespace, name)
+        location = f"{path}:{document.line}"
+        first = self.resources.setdefault(identity, location)
+        if first != location:
+            self.report.add(
+                path,
+                document.line,
+                f"duplicate {kind} {namespace + '/' if namespace else ''}{name}, first defined at {first}",
+            )
+
+        spec = data.get("spec")
+        if (group, kind) in DEPENDS_ON_KINDS and isinstance(spec, dict):
+            for index, dependency in enumerate(spec.get("dependsOn") or []):
+                if isinstance(dependency, dict) and isinstance(dependency.get("name"), str):
+                    target = (
+                        group,
+                        kind,
+                        dependency.get("namespace") or namespace,
+                        dependency["name"],
+                    )
+                    self.dependencies.append((document, target, index))
+
+    def check_dependencies(self) -> None:
+        for document, (group, kind, namespace, name), index in self.dependencies:
+            # An object rendered without any namespace lands wherever Flux applies it
+            candidates = ((group, kind, namespace, name), (group, kind, "", name))
+            if not any(candidate in self.resources for candidate in candidates):
+                line = locate(document.node, f"spec.dependsOn[{index}]")
+                self.report.add(
+                    document.path,
+                    line,
+                    f"dependsOn {kind} {namespace}/{name} is not rendered",
+                )
+
+    def run(self) -> Report:
+        cwd = Path.cwd()
+        for path in sorted(self.root.rglob("*.yaml")):
+            self.validate_file(path.relative_to(cwd) if path.is_relative_to(cwd) else path)
+        self.check_dependencies()
+        return self.report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Validate rendered Kubernetes manifests in-process")
+    parser.add_argument(
+        "kubernetes_dir",
+        type=Path,
+        nargs="?",
+        default=Path("kubernetes"),
+        help="Rendered kubernetes directory (default: ./kubernetes)",
+    )
+    parser.add_argument(
+        "--schema-store",
+        type=Path,
+        default=DEFAULT_STORE,
+        help=f"Packed schema store (default: {DEFAULT_STORE})",
+    )
+    args = parser.parse_args()
+
+    if not args.kubernetes_dir.is_dir():
+        print(f"Kubernetes directory not found: {args.kubernetes_dir}", file=sys.stderr)
+        return 1
+
+    store = None
+    if args.schema_store.is_file():
+        try:
+            store = SchemaStore(args.schema_store)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+    else:
+        print(f"Schema store not found at {args.schema_store}, skipping schema checks")
+
+    start = time.perf_counter()
+    try:
+        report = ManifestValidator(args.kubernetes_dir, store).run()
+    finally:
+        if store is not None:
+            store.close()
+    elapsed = (time.perf_counter() - start) * 1000
+
+    for error in report.errors:
+        print(error, file=sys.stderr)
+    if store is not None and report.unknown_kinds:
+        print(f"No schema in the store for: {', '.join(sorted(report.unknown_kinds))}")
+    print(
+        f"{report.documents} documents in {report.files} files, "
+        f"{report.validated} checked against schemas, "
+        f"{len(report.errors)} problem(s) ({elapsed:.0f}ms)"
+    )
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,7 +6,8 @@ import (
 )
 
 #Config: {
-	nodes: [...#Node]
+	// List of cluster nodes
+	nodes: [...#Node] & list.MinItems(1)
 	_nodes_check: {
 		name: list.UniqueItems() & [for item in nodes {item.name}]
 		address: list.UniqueItems() & [for item in nodes {item.address}]
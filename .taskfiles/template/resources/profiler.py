@@ -0,0 +1,173 @@
+"""
+Per-template render profiler used by render.py --profile.
+
+Records wall time, tracemalloc peak allocation and output size for every
+template, plus call counts and cumulative time for each plugin filter and
+function called from templates. Results are printed as tables sorted by
+time and written as a Chrome trace (open in chrome://tracing or Perfetto).
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import time
+import tracemalloc
+from collections import abc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from jinja2 import Environment
+
+# Rows shown in the printed template table, the trace has all of them
+TABLE_ROWS = 25
+
+
+@dataclass
+class TemplateRecord:
+    """Measurements for one rendered template."""
+
+    name: str
+    start: float
+    duration: float
+    peak_bytes: int
+    output_bytes: int
+
+
+@dataclass
+class HelperRecord:
+    """Accumulated calls to one plugin filter or function."""
+
+    name: str
+    calls: int = 0
+    total: float = 0.0
+
+
+@dataclass
+class RenderProfiler:
+    """Collects template and plugin helper timings for a single render."""
+
+    origin: float = field(default_factory=time.perf_counter)
+    templates: list[TemplateRecord] = field(default_factory=list)
+    helpers: dict[str, HelperRecord] = field(default_factory=dict)
+    events: list[dict[str, Any]] = field(default_factory=list)
+
+    def instrument(self, env: Environment, modules: abc.Iterable[str]) -> None:
+        """Wrap every filter and global function defined in the given plugin modules."""
+        modules = set(modules)
+        for kind, registry in (("filter", env.filters), ("function", env.globals)):
+            for name, value in list(registry.items()):
+                if callable(value) and getattr(value, "__module__", None) in modules:
+                    registry[name] = self._wrap(f"{name} ({kind})", value)
+
+    def _wrap(self, label: str, func: abc.Callable[..., Any]) -> abc.Callable[..., Any]:
+        record = self.helpers.setdefault(label, HelperRecord(label))
+
+        # functools.wraps keeps Jinja's pass_context markers and the qualified
+        # name the render manifest uses to digest callables
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                record.calls += 1
+                record.total += elapsed
+                self._event(label, "helper", start, elapsed)
+
+        return wrapper
+
+    def _event(
+        self, name: str, category: str, start: float, duration: float, **args: Any
+    ) -> None:
+        self.events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self.origin) * 1_000_000,
+                "dur": duration * 1_000_000,
+                "pid": os.getpid(),
+                "tid": 0,
+                "args": args,
+            }
+        )
+
+    def profile_jobs(
+        self,
+        render_job: abc.Callable[[Any, Any], tuple[str, set[str]]],
+        ctx: Any,
+        jobs: abc.Iterable[Any],
+    ) -> abc.Iterator[tuple[Any, str, set[str]]]:
+        """Render jobs one at a time with render_job, measuring each template."""
+        tracemalloc.start()
+        try:
+            for job in jobs:
+                baseline, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                start = time.perf_counter()
+
+                rendered, reads = render_job(ctx, job)
+
+                duration = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                record = TemplateRecord(
+                    name=job.template_name,
+                    start=start,
+                    duration=duration,
+                    peak_bytes=max(peak - baseline, 0),
+                    output_bytes=len(rendered.encode("utf-8")),
+                )
+                self.templates.append(record)
+                self._event(
+                    record.name,
+                    "template",
+                    start,
+                    duration,
+                    peak_kib=round(record.peak_bytes / 1024, 1),
+                    output_kib=round(record.output_bytes / 1024, 1),
+                )
+
+                yield job, rendered, reads
+        finally:
+            tracemalloc.stop()
+
+    def print_report(self) -> None:
+        """Print templates and helpers sorted by time spent."""
+        templates = sorted(self.templates, key=lambda r: r.duration, reverse=True)
+        total = sum(record.duration for record in templates)
+
+        width = max((len(r.name) for r in templates[:TABLE_ROWS]), default=8)
+        print(f"\n{'Template':<{width}} {'Time':>9} {'%':>6} {'Peak KiB':>10} {'Output KiB':>11}")
+        print("-" * (width + 40))
+        for record in templates[:TABLE_ROWS]:
+            share = record.duration / total * 100 if total else 0.0
+            print(
+                f"{record.name:<{width}} {record.duration * 1000:>7.1f}ms {share:>5.1f}%"
+                f" {record.peak_bytes / 1024:>10.1f} {record.output_bytes / 1024:>11.1f}"
+            )
+        if len(templates) > TABLE_ROWS:
+            print(f"... {len(templates) - TABLE_ROWS} more templates in the trace")
+        print(f"{len(templates)} templates rendered in {total:.2f}s")
+
+        helpers = sorted(self.helpers.values(), key=lambda r: r.total, reverse=True)
+        if not helpers:
+            return
+
+        width = max(len(record.name) for record in helpers)
+        print(f"\n{'Plugin helper':<{width}} {'Calls':>7} {'Total':>9} {'Per call':>10}")
+        print("-" * (width + 30))
+        for record in helpers:
+            per_call = record.total / record.calls * 1_000_000 if record.calls else 0.0
+            print(
+                f"{record.name:<{width}} {record.calls:>7} "
+                f"{record.total * 1000:>7.1f}ms {per_call:>8.1f}us"
+            )
+
+    def write_trace(self, path: Path) -> None:
+        """Write the collected events in Chrome trace event format."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"traceEvents": self.events, "displayTimeUnit": "ms"}))
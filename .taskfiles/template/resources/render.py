@@ -0,0 +1,1189 @@
+#!/usr/bin/env python3
+"""
+Render the template tree with makejinja, optionally re-rendering only what changed.
+
+This driver loads makejinja.toml and the template plugin exactly like the
+`makejinja` CLI does. In incremental mode it persists a dependency manifest
+that records, for every template, the hash of its source, the partials it
+references, the values of each data key it read while rendering and the bytes
+it wrote. An output that was edited or deleted since is rendered again. Templates
+that call a plugin function reading a credential file also record the digest
+of that file; the calls come from the template index (see template_index.py).
+On the next run only templates whose inputs changed are rendered again.
+
+Templates only depend on the shared data dict, so they can also be rendered
+by a pool of worker processes. The data is derived once in the parent, and
+every forked worker inherits the same Jinja environment (delimiters, plugin
+filters and functions) and a snapshot of that data. Output is byte-identical
+to a serial render.
+
+Compiled templates are cached on disk under the cache directory, keyed by the
+template source, the delimiter settings and the plugin sources, so warm runs
+skip Jinja compilation entirely. The cache is trimmed to a size limit after
+every run, dropping the least recently used entries first.
+
+Outputs are only written when their bytes change. Each rendered buffer is
+compared with the existing file (size first, then content). A differing file
+is replaced atomically through a temporary file and a rename. An identical
+file keeps its timestamps, so watchers, Taskfile `sources:` checks and the git
+stat cache do not see a change.
+
+With --plan nothing is written. Templates are rendered into memory, through
+the same worker pool and, with --incremental, only where the manifest says
+they are stale. Each output is compared with the file on disk, and added,
+changed and no longer rendered files are printed with unified diffs. Secrets
+are compared by content, using the ciphertext cache or an in-memory decrypt.
+For secrets only the changed keys are printed, never their values.
+
+With --validate the loaded cluster.yaml and nodes.yaml data is checked
+against the generated JSON Schemas before any plugin touches it, and every
+violation is reported before rendering starts.
+
+With --encrypt every rendered *.sops.* output is encrypted in memory with
+SOPS before it is written (see encrypt_secrets.py), so plaintext secrets
+never reach the working tree. Secrets are encrypted after every other file,
+once the rendered .sops.yaml with its creation rules is in place.
+
+With --profile templates are rendered serially under tracemalloc, and the
+time, peak allocation and output size of every template and the calls to
+each plugin helper are printed and written as a Chrome trace.
+
+Usage:
+    python render.py                  # Full render (same output as `makejinja`)
+    python render.py --incremental    # Re-render only templates whose inputs changed
+    python render.py --validate       # Validate the config against the schemas first
+    python render.py --encrypt        # Write *.sops.* outputs already encrypted
+    python render.py --plan --incremental  # Show what a render would change, write nothing
+    python render.py --jobs 0         # Render with one worker per CPU
+    python render.py --bytecode-report # Compare cold vs warm template compile times
+    python render.py --profile        # Profile templates and plugin helpers
+"""
+
+from __future__ import annotations
+
+import argparse
+import difflib
+import functools
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, abc
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import attrs
+import typed_settings as ts
+import yaml
+from jinja2 import Environment, meta
+from jinja2.bccache import Bucket, FileSystemBytecodeCache
+from jinja2.runtime import Context
+from makejinja.app import (
+    DATA_LOADERS,
+    collect_files,
+    dict_nested_set,
+    exec as exec_cmd,
+    generate_output_path,
+    init_jinja_env,
+    load_file_data,
+    load_plugin,
+    log,
+    postprocess_rendered_dirs,
+)
+from makejinja.config import Config
+from makejinja.plugin import PathFilter
+
+from encrypt_secrets import (
+    DEFAULT_AGE_KEY,
+    DEFAULT_CACHE_DIR as SOPS_CACHE_DIR,
+    Result,
+    decrypt,
+    is_encrypted,
+    load_documents,
+    open_encryptor,
+    relative_name,
+)
+from profiler import RenderProfiler
+from schema_validator import SchemaValidationError, validate_data
+from template_index import INDEX_FILE, TemplateIndex
+
+LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+MANIFEST_VERSION = 3
+DEFAULT_CONFIG_FILE = Path("makejinja.toml")
+DEFAULT_CACHE_DIR = Path(".cache/render")
+DEFAULT_BYTECODE_CACHE_MB = 64
+
+# Outcomes of writing one output file
+WRITTEN = "written"
+UNCHANGED = "unchanged"
+EMPTY = "empty"
+
+# Files read by plugin functions rather than through the data dict, and the
+# functions reading them. A change to one of them invalidates the templates that
+# call one of its functions, as recorded by the template index.
+CREDENTIAL_FILES = {
+    "age.key": ("age_key",),
+    "cloudflare-tunnel.json": ("cloudflare_tunnel_id", "cloudflare_tunnel_secret"),
+    "github-deploy.key": ("github_deploy_key",),
+    "github-push-token.txt": ("github_push_token",),
+}
+# talos_patches() lists templates on disk, so adding or removing one invalidates its callers
+TEMPLATE_LISTING = "<templates>"
+EXTERNAL_INPUTS = {**CREDENTIAL_FILES, TEMPLATE_LISTING: ("talos_patches",)}
+
+# Names resolved by the template currently being rendered (None when not tracking)
+_active_reads: set[str] | None = None
+
+# Render context inherited by forked worker processes
+_worker_ctx: RenderContext | None = None
+
+
+class TrackingContext(Context):
+    """Jinja context that records every top-level name a template resolves."""
+
+    def resolve_or_missing(self, key: str) -> Any:
+        if _active_reads is not None:
+            _active_reads.add(key)
+        return super().resolve_or_missing(key)
+
+
+@dataclass(frozen=True)
+class RenderJob:
+    """A single template and the output file it renders to."""
+
+    input_path: Path
+    template_name: str
+    output_path: Path
+
+
+@dataclass
+class RenderPlan:
+    """Everything discovered by walking the configured inputs."""
+
+    jobs: list[RenderJob] = field(default_factory=list)
+    copies: list[tuple[Path, Path]] = field(default_factory=list)
+    dirs: dict[Path, Path] = field(default_factory=dict)
+
+
+@dataclass
+class RenderOptions:
+    """Command line options that change how the tree is rendered."""
+
+    incremental: bool = False
+    jobs: int = 1
+    cache_dir: Path = DEFAULT_CACHE_DIR
+    bytecode_cache_mb: int = DEFAULT_BYTECODE_CACHE_MB
+    profile: bool = False
+    validate: bool = False
+    encrypt: bool = False
+
+
+class EncryptionError(Exception):
+    """Raised when rendered secrets could not be encrypted; none of them were written."""
+
+    def __init__(self, failures: list[Result]):
+        super().__init__(f"{len(failures)} secret(s) could not be encrypted")
+        self.failures = failures
+
+
+@dataclass
+class RenderContext:
+    """The loaded config, data, Jinja environment and plugins for one run."""
+
+    config: Config
+    data: dict[str, Any]
+    env: Environment
+    path_filters: list[PathFilter]
+    plugins: list[Any] = field(default_factory=list)
+
+
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+    """On-disk compiled template cache keyed by source, delimiters and plugin version."""
+
+    def __init__(self, directory: Path, salt: str, max_bytes: int):
+        directory.mkdir(parents=True, exist_ok=True)
+        super().__init__(str(directory), "%s.jinja")
+        self.salt = salt
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def get_bucket(
+        self, environment: Environment, name: str, filename: str | None, source: str
+    ) -> Bucket:
+        # Keying on the source checksum (instead of letting Jinja compare it
+        # after loading) means reverting a template hits its old entry again
+        checksum = self.get_source_checksum(source)
+        key = self.get_cache_key(f"{self.salt}\0{name}\0{checksum}", filename)
+        bucket = Bucket(environment, key, checksum)
+        self.load_bytecode(bucket)
+        return bucket
+
+    def load_bytecode(self, bucket: Bucket) -> None:
+        super().load_bytecode(bucket)
+        if bucket.code is None:
+            self.misses += 1
+            return
+
+        self.hits += 1
+        # Eviction is least recently used, so bump the entry on every hit
+        try:
+            os.utime(self._get_cache_filename(bucket))
+        except OSError:
+            pass
+
+    def evict(self) -> int:
+        """Delete the oldest entries until the cache fits max_bytes. Returns entries removed."""
+        entries = []
+        for path in Path(self.directory).glob(self.pattern % "*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+
+        return removed
+
+
+def bytecode_salt(config: Config) -> str:
+    """Digest of everything besides the template source that changes compiled code."""
+    hasher = hashlib.sha256()
+    for settings in (config.delimiter, config.prefix, config.whitespace):
+        hasher.update(repr(settings).encode())
+    hasher.update(repr((config.extensions, config.internal)).encode())
+
+    # Plugin filters and tests are resolved while compiling
+    for import_path in config.import_paths:
+        for source in sorted(import_path.glob("*.py")):
+            hasher.update(source.read_bytes())
+
+    return hasher.hexdigest()
+
+
+def load_config(config_file: Path) -> Config:
+    """Load makejinja settings the same way the makejinja CLI does."""
+    return ts.load(Config, appname="makejinja", config_files=(config_file,))
+
+
+def _from_yaml(path: Path) -> dict[str, Any]:
+    data: dict[str, Any] = {}
+    with path.open("rb") as stream:
+        for document in yaml.load_all(stream, Loader=LOADER):
+            data |= document
+    return data
+
+
+def load_data(config: Config) -> dict[str, Any]:
+    """makejinja's load_data, with YAML parsed by libyaml when it is available."""
+    data: dict[str, Any] = {}
+    for path in collect_files(config.data):
+        loader = _from_yaml if path.suffix in (".yaml", ".yml") else DATA_LOADERS.get(path.suffix)
+        if loader is not None:
+            log(f"Load data '{path}'", config)
+            data |= loader(path)
+        else:
+            log(f"Skip unsupported data '{path}'", config)
+
+    for key, value in config.data_vars.items():
+        dict_nested_set(data, key, value)
+
+    return data
+
+
+def build_context(config: Config, validate: bool = False) -> RenderContext:
+    """Load data, create the Jinja environment and register the plugins.
+
+    With validate the raw data is checked against the JSON Schemas before the
+    plugins derive anything from it. Raises SchemaValidationError on violations.
+    """
+    for path in config.import_paths:
+        sys.path.append(str(path.resolve()))
+
+    data = load_data(config)
+    if validate:
+        errors = validate_data(data)
+        if errors:
+            raise SchemaValidationError(errors)
+    config.output.mkdir(exist_ok=True, parents=True)
+
+    env = init_jinja_env(config, data)
+    env.context_class = TrackingContext
+
+    plugins: list[Any] = []
+    path_filters: list[PathFilter] = []
+    for plugin_name in itertools.chain(config.plugins, config.loaders):
+        plugin = load_plugin(plugin_name, env, data, config)
+        plugins.append(plugin)
+        if hasattr(plugin, "path_filters"):
+            path_filters.extend(plugin.path_filters())
+
+    return RenderContext(
+        config=config, data=data, env=env, path_filters=path_filters, plugins=plugins
+    )
+
+
+def collect_plan(ctx: RenderContext) -> RenderPlan:
+    """Walk the inputs in makejinja order and collect templates, copies and dirs."""
+    config = ctx.config
+    plan = RenderPlan()
+    seen: set[Path] = set()
+    enforce_jinja_suffix = bool(config.jinja_suffix)
+
+    for user_input_path in config.inputs:
+        if user_input_path.is_file():
+            relative_path = Path(user_input_path.name)
+            output_path = generate_output_path(config, relative_path)
+            if output_path not in seen:
+                plan.jobs.append(
+                    RenderJob(user_input_path, str(relative_path), output_path)
+                )
+                seen.add(output_path)
+            continue
+
+        input_paths = (
+            input_path
+            for include_pattern in config.include_patterns
+            for input_path in sorted(user_input_path.glob(include_pattern))
+        )
+        for input_path in input_paths:
+            relative_path = input_path.relative_to(user_input_path)
+            output_path = generate_output_path(config, relative_path)
+
+            if any(input_path.match(x) for x in config.exclude_patterns):
+                continue
+            if any(not path_filter(input_path) for path_filter in ctx.path_filters):
+                continue
+
+            if input_path.is_file() and output_path not in seen:
+                if input_path.suffix == config.jinja_suffix or not enforce_jinja_suffix:
+                    plan.jobs.append(
+                        RenderJob(input_path, str(relative_path), output_path)
+                    )
+                else:
+                    plan.copies.append((input_path, output_path))
+                seen.add(output_path)
+            elif input_path.is_dir() and output_path not in plan.dirs:
+                plan.dirs[output_path] = input_path
+
+    return plan
+
+
+def _jsonable(value: Any) -> Any:
+    """Fallback serializer for values json.dumps cannot handle natively."""
+    if isinstance(value, abc.Mapping):
+        return dict(value)
+    if callable(value):
+        return f"{getattr(value, '__module__', '')}.{getattr(value, '__qualname__', '')}"
+    return repr(value)
+
+
+def digest_value(value: Any) -> str:
+    """Return a stable digest for a data value."""
+    try:
+        encoded = json.dumps(value, sort_keys=True, default=_jsonable)
+    except TypeError:
+        encoded = repr(value)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def digest_bytes(content: bytes) -> str:
+    """Return the sha256 hex digest of raw bytes."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def global_fingerprint(ctx: RenderContext) -> str:
+    """Digest of everything outside the data dict that can change any output."""
+    hasher = hashlib.sha256()
+    hasher.update(f"manifest-v{MANIFEST_VERSION}\n".encode())
+    # Log verbosity does not affect output, so it is excluded from the digest
+    hasher.update(repr(attrs.evolve(ctx.config, quiet=False)).encode())
+    hasher.update(Path(__file__).read_bytes())
+
+    for import_path in ctx.config.import_paths:
+        for source in sorted(import_path.glob("*.py")):
+            hasher.update(source.read_bytes())
+
+    return hasher.hexdigest()
+
+
+def external_digests(plan: RenderPlan) -> dict[str, str]:
+    """Digest of every input in EXTERNAL_INPUTS, as of now."""
+    digests = {
+        name: digest_bytes(Path(name).read_bytes()) if Path(name).is_file() else "<missing>"
+        for name in CREDENTIAL_FILES
+    }
+    listing = "\n".join(str(job.input_path) for job in plan.jobs)
+    digests[TEMPLATE_LISTING] = digest_bytes(listing.encode("utf-8"))
+    return digests
+
+
+@functools.lru_cache(maxsize=1024)
+def _referenced_templates(env: Environment, source: str) -> tuple[str | None, ...]:
+    # Parsing dominates recording a template, and watch.py records the same sources over and over
+    return tuple(meta.find_referenced_templates(env.parse(source)))
+
+
+def referenced_partials(env: Environment, template_name: str) -> dict[str, str]:
+    """Return {name: digest} for every template statically included by template_name."""
+    partials: dict[str, str] = {}
+    pending = [template_name]
+
+    while pending:
+        source, _, _ = env.loader.get_source(env, pending.pop())
+        for name in _referenced_templates(env, source):
+            if name is None or name in partials:
+                continue
+            partial_source, _, _ = env.loader.get_source(env, name)
+            partials[name] = digest_bytes(partial_source.encode("utf-8"))
+            pending.append(name)
+
+    return partials
+
+
+def render_job(ctx: RenderContext, job: RenderJob) -> tuple[str, set[str]]:
+    """Render a template and return its output and the names it read."""
+    global _active_reads
+
+    _active_reads = reads = set()
+    try:
+        template = ctx.env.get_template(job.template_name)
+        rendered = template.render(load_file_data(job.template_name, ctx.config))
+    finally:
+        _active_reads = None
+
+    return rendered, reads
+
+
+def _render_in_worker(job: RenderJob) -> tuple[RenderJob, str, set[str]]:
+    """Pool entry point: render job with the context inherited from the parent."""
+    assert _worker_ctx is not None
+    rendered, reads = render_job(_worker_ctx, job)
+    return job, rendered, reads
+
+
+def resolve_jobs(jobs: int) -> int:
+    """Translate the --jobs flag into a worker count (0 means one per CPU)."""
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def render_jobs(
+    ctx: RenderContext, jobs: list[RenderJob], workers: int
+) -> abc.Iterator[tuple[RenderJob, str, set[str]]]:
+    """Render jobs serially or across a process pool, yielding results as they finish."""
+    global _worker_ctx
+
+    # Workers must inherit the environment and data rather than rebuild them,
+    # which requires the fork start method
+    if workers <= 1 or len(jobs) <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        for job in jobs:
+            yield job, *render_job(ctx, job)
+        return
+
+    # Schedule the largest templates first so a single huge dashboard does
+    # not end up as the last task of a busy worker
+    ordered = sorted(jobs, key=lambda job: job.input_path.stat().st_size, reverse=True)
+
+    _worker_ctx = ctx
+    try:
+        with multiprocessing.get_context("fork").Pool(min(workers, len(jobs))) as pool:
+            yield from pool.imap_unordered(_render_in_worker, ordered)
+    finally:
+        _worker_ctx = None
+
+
+def is_secret(job: RenderJob) -> bool:
+    """True for outputs SOPS encrypts, such as cluster-secrets.sops.yaml, but not .sops.yaml itself."""
+    stem, marker, _ = job.output_path.name.partition(".sops.")
+    return bool(marker and stem)
+
+
+def _new_file_mode() -> int:
+    """Permissions open() would give a new file under the current umask."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def write_if_changed(path: Path, content: bytes, metadata_from: Path | None = None) -> bool:
+    """Atomically replace path with content unless it already holds exactly these bytes.
+
+    With metadata_from, a written file gets that file's permissions and timestamps
+    (like shutil.copystat). An unchanged file keeps its timestamps, and only its
+    permissions are brought in line. Returns True when the file was written.
+    """
+    try:
+        current = path.stat()
+    except FileNotFoundError:
+        current = None
+
+    # Size first, so only same-sized files are read back and compared
+    if current is not None and current.st_size == len(content) and path.read_bytes() == content:
+        if metadata_from is not None:
+            mode = metadata_from.stat().st_mode & 0o7777
+            if current.st_mode & 0o7777 != mode:
+                path.chmod(mode)
+        return False
+
+    fd, temp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(content)
+        if metadata_from is not None:
+            shutil.copystat(metadata_from, temp)
+        else:
+            os.chmod(temp, current.st_mode & 0o7777 if current is not None else _new_file_mode())
+        os.replace(temp, path)
+    except BaseException:
+        Path(temp).unlink(missing_ok=True)
+        raise
+    return True
+
+
+def write_output(ctx: RenderContext, job: RenderJob, rendered: str) -> str:
+    """Write a rendered template like makejinja does, skipping files whose bytes are unchanged.
+
+    Returns WRITTEN, UNCHANGED, or EMPTY when skipped as empty.
+    """
+    config = ctx.config
+
+    # Prevents empty macro definitions and disabled features from producing files
+    if rendered.strip() == "" and not config.keep_empty:
+        return EMPTY
+
+    metadata_from = job.input_path if config.copy_metadata else None
+    if write_if_changed(job.output_path, rendered.encode("utf-8"), metadata_from):
+        return WRITTEN
+    return UNCHANGED
+
+
+def copy_output(input_path: Path, output_path: Path) -> str:
+    """Copy a non-template file like shutil.copy2, skipping it when the bytes are unchanged."""
+    if write_if_changed(output_path, input_path.read_bytes(), input_path):
+        return WRITTEN
+    return UNCHANGED
+
+
+def recorded_outputs(path: Path) -> set[Path]:
+    """Every output listed in a manifest file, whatever its fingerprint."""
+    try:
+        stored = json.loads(path.read_text())
+    except (OSError, json.JSONDecodeError):
+        return set()
+    return {
+        Path(entry["output"])
+        for entry in stored.get("templates", {}).values()
+        if not entry.get("empty")
+    }
+
+
+class Manifest:
+    """Persisted per-template dependency record used by incremental renders."""
+
+    def __init__(
+        self,
+        path: Path,
+        fingerprint: str,
+        index: TemplateIndex | None = None,
+        external: dict[str, str] | None = None,
+    ):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.index = index if index is not None else TemplateIndex(None)
+        # Digests of the inputs in EXTERNAL_INPUTS, see external_digests()
+        self.external = external if external is not None else {}
+        self.entries: dict[str, dict[str, Any]] = {}
+        self._previous: dict[str, dict[str, Any]] = {}
+        self._value_digests: dict[str, str] = {}
+
+    def load(self) -> None:
+        """Load the previous manifest if it matches the current fingerprint."""
+        if not self.path.is_file():
+            return
+        try:
+            stored = json.loads(self.path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return
+        if (
+            stored.get("version") == MANIFEST_VERSION
+            and stored.get("fingerprint") == self.fingerprint
+        ):
+            self._previous = stored.get("templates", {})
+
+    def save(self) -> None:
+        """Persist the manifest for the next incremental run."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": MANIFEST_VERSION,
+            "fingerprint": self.fingerprint,
+            "templates": self.entries,
+        }
+        self.path.write_text(json.dumps(payload, indent=2, sort_keys=True) + "\n")
+        self.index.save(keep=(entry["template"] for entry in self.entries.values()))
+
+    def value_digest(self, data: abc.Mapping[str, Any], key: str) -> str:
+        """Digest of a data key, memoized because many templates share keys."""
+        if key not in self._value_digests:
+            value = data[key] if key in data else "<undefined>"
+            self._value_digests[key] = digest_value(value)
+        return self._value_digests[key]
+
+    def forget_values(self, keys: abc.Iterable[str]) -> None:
+        """Drop the memoized digests of keys whose values changed since they were taken."""
+        for key in keys:
+            self._value_digests.pop(key, None)
+
+    def is_current(self, ctx: RenderContext, job: RenderJob, source_digest: str) -> bool:
+        """Return True when the previous render of job is still valid."""
+        entry = self._previous.get(str(job.input_path))
+        if entry is None or entry.get("source") != source_digest:
+            return False
+        if entry.get("output") != str(job.output_path):
+            return False
+        if not entry.get("empty"):
+            # Restore outputs edited or reverted since, as a full render would
+            try:
+                written = job.output_path.read_bytes()
+            except OSError:
+                return False
+            if digest_bytes(written) != entry.get("written"):
+                return False
+
+        for name, digest in entry.get("partials", {}).items():
+            try:
+                source, _, _ = ctx.env.loader.get_source(ctx.env, name)
+            except Exception:
+                return False
+            if digest_bytes(source.encode("utf-8")) != digest:
+                return False
+
+        for name, digest in entry.get("external", {}).items():
+            if self.external.get(name) != digest:
+                return False
+
+        globals_ = ctx.env.globals
+        return all(
+            self.value_digest(globals_, key) == digest
+            for key, digest in entry.get("data", {}).items()
+        )
+
+    def external_inputs(self, ctx: RenderContext, job: RenderJob) -> list[str]:
+        """The inputs in EXTERNAL_INPUTS that job reads through a plugin function.
+
+        Taken from the template index, so calls in branches that did not run count
+        too. A template with a dynamic include may call anything.
+        """
+        summary = self.index.closure(ctx.env, job.template_name)
+        return [
+            name
+            for name, functions in EXTERNAL_INPUTS.items()
+            if summary.dynamic or not summary.calls.isdisjoint(functions)
+        ]
+
+    def keep(self, job: RenderJob) -> None:
+        """Carry the previous entry for job into the new manifest."""
+        self.entries[str(job.input_path)] = self._previous[str(job.input_path)]
+
+    def record(
+        self,
+        ctx: RenderContext,
+        job: RenderJob,
+        source_digest: str,
+        reads: set[str],
+        written: str | None,
+    ) -> None:
+        """Record the dependencies of a freshly rendered template.
+
+        written is the text now in its output (the ciphertext for an encrypted
+        secret), None when the output was skipped as empty.
+        """
+        globals_ = ctx.env.globals
+        self.entries[str(job.input_path)] = {
+            "template": job.template_name,
+            "output": str(job.output_path),
+            "source": source_digest,
+            "partials": referenced_partials(ctx.env, job.template_name),
+            "external": {
+                name: self.external[name] for name in self.external_inputs(ctx, job)
+            },
+            "data": {key: self.value_digest(globals_, key) for key in sorted(reads)},
+            "empty": written is None,
+            "written": digest_bytes(written.encode("utf-8")) if written is not None else None,
+        }
+
+
+def open_manifest(ctx: RenderContext, plan: RenderPlan, cache_dir: Path) -> Manifest:
+    """The manifest of the last incremental render, loaded if it is still valid."""
+    manifest = Manifest(
+        cache_dir / "manifest.json",
+        global_fingerprint(ctx),
+        TemplateIndex(cache_dir / INDEX_FILE),
+        external_digests(plan),
+    )
+    manifest.load()
+    return manifest
+
+
+def attach_bytecode_cache(
+    ctx: RenderContext, directory: Path, max_mb: int
+) -> TemplateBytecodeCache:
+    """Install a persistent bytecode cache on the context's Jinja environment."""
+    cache = TemplateBytecodeCache(
+        directory, bytecode_salt(ctx.config), max_mb * 1024 * 1024
+    )
+    ctx.env.bytecode_cache = cache
+    return cache
+
+
+def render(config: Config, options: RenderOptions) -> int:
+    """Render the template tree. Returns the number of templates rendered."""
+    start = time.perf_counter()
+
+    for cmd in config.exec_pre:
+        exec_cmd(cmd)
+
+    if config.output.is_dir() and config.clean:
+        shutil.rmtree(config.output)
+
+    ctx = build_context(config, validate=options.validate)
+    plan = collect_plan(ctx)
+
+    bytecode_cache: TemplateBytecodeCache | None = None
+    if options.bytecode_cache_mb > 0:
+        bytecode_cache = attach_bytecode_cache(
+            ctx, options.cache_dir / "bytecode", options.bytecode_cache_mb
+        )
+
+    manifest: Manifest | None = None
+    if options.incremental:
+        manifest = open_manifest(ctx, plan, options.cache_dir)
+
+    for output_path in plan.dirs:
+        output_path.mkdir(exist_ok=True)
+
+    stale: dict[RenderJob, str] = {}
+    for job in plan.jobs:
+        if job.output_path.exists() and not config.force:
+            continue
+
+        source_digest = digest_bytes(job.input_path.read_bytes())
+        if manifest is not None and manifest.is_current(ctx, job, source_digest):
+            manifest.keep(job)
+            continue
+
+        stale[job] = source_digest
+
+    if options.profile:
+        profiler = RenderProfiler()
+        profiler.instrument(
+            ctx.env,
+            (name.split(":")[0] for name in itertools.chain(config.plugins, config.loaders)),
+        )
+        results = profiler.profile_jobs(render_job, ctx, list(stale))
+    else:
+        results = render_jobs(ctx, list(stale), resolve_jobs(options.jobs))
+
+    writes: Counter[str] = Counter()
+    secrets: list[tuple[RenderJob, str, set[str]]] = []
+    for job, rendered, reads in results:
+        if options.encrypt and is_secret(job) and rendered.strip():
+            secrets.append((job, rendered, reads))
+            continue
+
+        status = write_output(ctx, job, rendered)
+        writes[status] += 1
+
+        if manifest is not None:
+            manifest.record(ctx, job, stale[job], reads, None if status == EMPTY else rendered)
+
+    rendered_count = len(stale)
+
+    for input_path, output_path in plan.copies:
+        writes[copy_output(input_path, output_path)] += 1
+
+    failures = encrypt_outputs(ctx, secrets, manifest, stale, writes) if secrets else []
+
+    postprocess_rendered_dirs(config, plan.dirs)
+
+    if manifest is not None:
+        manifest.save()
+
+    if bytecode_cache is not None:
+        bytecode_cache.evict()
+
+    if failures:
+        raise EncryptionError(failures)
+
+    for cmd in config.exec_post:
+        exec_cmd(cmd)
+
+    if not config.quiet:
+        elapsed = time.perf_counter() - start
+        print(
+            f"Rendered {rendered_count} of {len(plan.jobs)} templates "
+            f"({len(plan.jobs) - rendered_count} up to date), wrote {writes[WRITTEN]} files "
+            f"({writes[UNCHANGED]} unchanged) in {elapsed:.2f}s"
+        )
+
+    if options.profile:
+        trace_path = options.cache_dir / "profile.json"
+        profiler.print_report()
+        profiler.write_trace(trace_path)
+        print(f"\nChrome trace written to {trace_path}")
+
+    return rendered_count
+
+
+def encrypt_outputs(
+    ctx: RenderContext,
+    secrets: list[tuple[RenderJob, str, set[str]]],
+    manifest: Manifest | None,
+    stale: dict[RenderJob, str],
+    writes: Counter[str],
+) -> list[Result]:
+    """Encrypt rendered secrets in memory and write only the ciphertext. Returns the failures.
+
+    A secret that fails is not written and not recorded, so the next run renders it again.
+    """
+    encryptor = open_encryptor(SOPS_CACHE_DIR)
+    failures: list[Result] = []
+    with ThreadPoolExecutor() as pool:
+        encrypted = pool.map(
+            lambda secret: encryptor.encrypt(secret[0].output_path, secret[1].encode()), secrets
+        )
+        for (job, _, reads), result in zip(secrets, encrypted):
+            if result.ciphertext is None:
+                failures.append(result)
+                continue
+            encryptor.record(result)
+            writes[write_output(ctx, job, result.ciphertext)] += 1
+            if manifest is not None:
+                manifest.record(ctx, job, stale[job], reads, result.ciphertext)
+    encryptor.cache.save()
+    return failures
+
+
+@dataclass
+class PlannedChange:
+    """One output that a render would add, change or no longer produce."""
+
+    action: str  # "add", "change" or "remove"
+    path: Path
+    diff: list[str] = field(default_factory=list)
+
+
+def _display_path(path: Path) -> Path:
+    """path relative to the working directory when inside it, as git would show it."""
+    absolute = path.absolute()
+    return absolute.relative_to(Path.cwd()) if absolute.is_relative_to(Path.cwd()) else path
+
+
+def _changed_paths(old: Any, new: Any, path: str = "") -> list[str]:
+    """Dotted paths of the leaves that differ between two parsed documents."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        return [
+            changed
+            for key in sorted(old.keys() | new.keys(), key=str)
+            for changed in _changed_paths(
+                old.get(key), new.get(key), f"{path}.{key}" if path else str(key)
+            )
+        ]
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        return [
+            changed
+            for index, (left, right) in enumerate(zip(old, new))
+            for changed in _changed_paths(left, right, f"{path}[{index}]")
+        ]
+    return [] if old == new else [path or "(document)"]
+
+
+def _unified_diff(path: Path, old: bytes, new: bytes) -> list[str]:
+    path = _display_path(path)
+    try:
+        old_lines = old.decode("utf-8").splitlines(keepends=True)
+        new_lines = new.decode("utf-8").splitlines(keepends=True)
+    except UnicodeDecodeError:
+        return [f"Binary files a/{path} and b/{path} differ\n"]
+    return list(difflib.unified_diff(old_lines, new_lines, f"a/{path}", f"b/{path}"))
+
+
+class SecretComparer:
+    """Compares rendered secrets with their encrypted outputs without printing any value.
+
+    The ciphertext cache answers most comparisons without sops. Otherwise the output
+    is decrypted in memory, if sops and the age key are available.
+    """
+
+    def __init__(self) -> None:
+        self.encryptor = open_encryptor(SOPS_CACHE_DIR) if DEFAULT_AGE_KEY.is_file() else None
+
+    def diff(self, path: Path, existing: bytes, rendered: bytes) -> list[str] | None:
+        """Lines describing the change, without values, or None when the content is the same."""
+        if is_encrypted(existing):
+            if self.encryptor is not None:
+                name = relative_name(path)
+                key = self.encryptor.plaintext_key(name, rendered)
+                if self.encryptor.cache.lookup(name, key) == existing.decode("utf-8"):
+                    return None
+            existing = decrypt(existing, path.suffix)
+            if existing is None:
+                return ["  (encrypted, cannot decrypt to compare)\n"]
+        elif existing == rendered:
+            return None
+
+        old, new = load_documents(existing), load_documents(rendered)
+        if old is None or new is None:
+            return ["  (secret content differs)\n"]
+        changed = _changed_paths(old, new)
+        if not changed:
+            return None
+        return [f"  changed: {key}\n" for key in changed]
+
+
+def plan_render(config: Config, options: RenderOptions) -> int:
+    """Render into memory and print how the output tree would change. Nothing is written.
+
+    With incremental, templates the manifest records as current are taken to be
+    unchanged and are not rendered. Returns 2 when the tree would change, else 0.
+    """
+    start = time.perf_counter()
+    ctx = build_context(config, validate=options.validate)
+    plan = collect_plan(ctx)
+
+    if options.bytecode_cache_mb > 0:
+        attach_bytecode_cache(ctx, options.cache_dir / "bytecode", options.bytecode_cache_mb)
+
+    manifest_path = options.cache_dir / "manifest.json"
+    stale: list[RenderJob] = []
+    if options.incremental:
+        manifest = open_manifest(ctx, plan, options.cache_dir)
+        for job in plan.jobs:
+            if not manifest.is_current(ctx, job, digest_bytes(job.input_path.read_bytes())):
+                stale.append(job)
+    else:
+        stale = list(plan.jobs)
+
+    secrets = SecretComparer()
+    changes: list[PlannedChange] = []
+    produced = {job.output_path for job in plan.jobs}
+
+    def compare(output_path: Path, content: bytes | None, secret: bool) -> None:
+        exists = output_path.is_file()
+        if content is None:
+            if exists:
+                changes.append(PlannedChange("remove", output_path))
+            return
+        if not exists:
+            diff = [] if secret else _unified_diff(output_path, b"", content)
+            changes.append(PlannedChange("add", output_path, diff))
+            return
+        existing = output_path.read_bytes()
+        if secret:
+            diff = secrets.diff(output_path, existing, content)
+            if diff is not None:
+                changes.append(PlannedChange("change", output_path, diff))
+        elif existing != content:
+            changes.append(
+                PlannedChange("change", output_path, _unified_diff(output_path, existing, content))
+            )
+
+    for job, rendered, _ in render_jobs(ctx, stale, resolve_jobs(options.jobs)):
+        empty = rendered.strip() == "" and not config.keep_empty
+        compare(job.output_path, None if empty else rendered.encode("utf-8"), is_secret(job))
+
+    for input_path, output_path in plan.copies:
+        compare(output_path, input_path.read_bytes(), secret=False)
+    produced.update(output_path for _, output_path in plan.copies)
+
+    # Outputs of templates that no longer exist, as recorded by the last incremental render
+    for output in recorded_outputs(manifest_path):
+        if output not in produced and output.is_file():
+            changes.append(PlannedChange("remove", output))
+
+    symbols = {"add": "+", "change": "~", "remove": "-"}
+    for change in sorted(changes, key=lambda change: str(change.path)):
+        print(f"{symbols[change.action]} {_display_path(change.path)}")
+        sys.stdout.writelines(change.diff)
+
+    counts = Counter(change.action for change in changes)
+    elapsed = time.perf_counter() - start
+    print(
+        f"Plan: {counts['add']} to add, {counts['change']} to change, {counts['remove']} no longer "
+        f"rendered ({len(stale)} of {len(plan.jobs)} templates rendered, {elapsed:.2f}s)"
+    )
+    return 2 if changes else 0
+
+
+def bytecode_report(config: Config, options: RenderOptions) -> int:
+    """Time compiling every template with an empty and then a populated bytecode cache."""
+    ctx = build_context(config)
+    plan = collect_plan(ctx)
+    names = [job.template_name for job in plan.jobs]
+
+    def compile_all() -> float:
+        # Drop templates held in memory so every load goes through the loader
+        if ctx.env.cache is not None:
+            ctx.env.cache.clear()
+        pass_start = time.perf_counter()
+        for name in names:
+            ctx.env.get_template(name)
+        return time.perf_counter() - pass_start
+
+    with tempfile.TemporaryDirectory(prefix="bytecode-") as directory:
+        cache = attach_bytecode_cache(ctx, Path(directory), options.bytecode_cache_mb)
+        cold = compile_all()
+        cold_misses = cache.misses
+        warm = compile_all()
+        warm_hits = cache.hits
+        size = sum(path.stat().st_size for path in Path(directory).iterdir())
+
+    print(f"Templates:   {len(names)}")
+    print(f"Cold:        {cold:.3f}s ({cold_misses} compiled)")
+    print(f"Warm:        {warm:.3f}s ({warm_hits} loaded from cache)")
+    print(f"Speedup:     {cold / warm if warm else float('inf'):.1f}x")
+    print(f"Cache size:  {size / 1024 / 1024:.1f} MiB")
+    return 0
+
+
+def main() -> int:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Render templates with makejinja, optionally incrementally"
+    )
+    parser.add_argument(
+        "--config",
+        type=Path,
+        default=DEFAULT_CONFIG_FILE,
+        help="Path to makejinja.toml (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-render only templates whose source, partials or data changed",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+        help="Directory for the render manifest and bytecode cache (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of render worker processes, 0 for one per CPU (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--bytecode-cache-mb",
+        type=int,
+        default=DEFAULT_BYTECODE_CACHE_MB,
+        help="Size limit of the compiled template cache in MiB, 0 disables it (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--bytecode-report",
+        action="store_true",
+        help="Report cold vs warm template compile times instead of rendering",
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Validate cluster.yaml and nodes.yaml against the JSON Schemas before rendering",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Render into memory and print the files that would be added, changed or no longer "
+        "rendered, with diffs; writes nothing and exits 2 when the tree would change",
+    )
+    parser.add_argument(
+        "--encrypt",
+        action="store_true",
+        help="Encrypt *.sops.* outputs with SOPS in memory and write only the ciphertext",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Render serially and report time, allocations and output size per template "
+        "and calls per plugin helper; writes a Chrome trace to the cache directory",
+    )
+    parser.add_argument(
+        "--quiet",
+        "-q",
+        action="store_true",
+        help="Suppress makejinja log output and the render summary",
+    )
+    args = parser.parse_args()
+
+    if not args.config.is_file():
+        print(f"Error: Config file not found: {args.config}", file=sys.stderr)
+        return 1
+
+    config = load_config(args.config)
+    if args.quiet:
+        config = attrs.evolve(config, quiet=True)
+
+    options = RenderOptions(
+        incremental=args.incremental,
+        jobs=args.jobs,
+        cache_dir=args.cache_dir,
+        bytecode_cache_mb=args.bytecode_cache_mb,
+        profile=args.profile,
+        validate=args.validate,
+        encrypt=args.encrypt,
+    )
+    if args.bytecode_report:
+        return bytecode_report(config, options)
+    if args.plan:
+        try:
+            return plan_render(config, options)
+        except SchemaValidationError as e:
+            for error in e.errors:
+                print(f"  - {error}", file=sys.stderr)
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+
+    if args.encrypt and not DEFAULT_AGE_KEY.is_file():
+        print(f"Error: --encrypt needs the age key at {DEFAULT_AGE_KEY}", file=sys.stderr)
+        return 1
+
+    try:
+        render(config, options)
+    except SchemaValidationError as e:
+        for error in e.errors:
+            print(f"  - {error}", file=sys.stderr)
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except EncryptionError as e:
+        for result in e.failures:
+            print(f"  - {result.path}: {result.output or 'sops failed'}", file=sys.stderr)
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except FileNotFoundError as e:
+        if e.filename != "sops":
+            raise
+        print("Error: --encrypt needs sops on the PATH", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
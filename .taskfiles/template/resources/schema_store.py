@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Offline store of the Kubernetes JSON Schemas used to validate rendered manifests.
+
+The store is a single packed file. A JSON index maps group/kind/version to
+the offset and length of each schema, and the schemas follow it back to back.
+SchemaStore memory-maps the file and only decodes the schemas it is asked
+for, so opening the store is cheap however many CRDs it holds.
+
+`build` collects the apiVersion/kind of every document in the rendered
+manifests. It adds any schema the store does not have yet, either from a
+local directory (--from) or by downloading it. Built-in kinds come from the
+kubeconform default location, and CRDs (Flux, Cilium, Envoy Gateway, Gateway
+API, CNPG, Keycloak, Dragonfly, cert-manager, ...) from
+kubernetes-schemas.pages.dev. Build the store where the network is
+reachable, then copy the file to air-gapped hosts. Render with all features
+enabled, or build once per configuration, since the store keeps what it has.
+
+`export` unpacks the store into the {group}/{kind}_{version}.json layout
+that kubeconform reads with -schema-location.
+
+Usage:
+    python schema_store.py build                      # Add schemas for kinds in ./kubernetes
+    python schema_store.py build --from schemas/      # Add schemas from a local directory
+    python schema_store.py export /tmp/schemas        # Unpack for kubeconform
+    python schema_store.py list                       # Show the indexed schemas
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import urllib.error
+import urllib.request
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+ROOT_DIR = Path(__file__).resolve().parents[3]
+DEFAULT_STORE = ROOT_DIR / ".cache" / "schema-store" / "schemas.pack"
+DEFAULT_MANIFESTS = ROOT_DIR / "kubernetes"
+
+MAGIC = b"K8SCHEMA"
+FORMAT_VERSION = 1
+# Magic, then the index length as an unsigned 64-bit little-endian integer
+HEADER = struct.Struct("<8sQ")
+
+# Groups served by the Kubernetes API server itself; everything else is a CRD
+BUILTIN_GROUPS = frozenset(
+    [
+        "",
+        "admissionregistration.k8s.io",
+        "apiextensions.k8s.io",
+        "apps",
+        "autoscaling",
+        "batch",
+        "coordination.k8s.io",
+        "networking.k8s.io",
+        "policy",
+        "rbac.authorization.k8s.io",
+        "scheduling.k8s.io",
+        "storage.k8s.io",
+    ]
+)
+# Consumed by kustomize, never sent to the cluster
+IGNORED_GROUPS = frozenset(["kustomize.config.k8s.io"])
+
+BUILTIN_URL = (
+    "https://raw.githubusercontent.com/yannh/kubernetes-json-schema/master/"
+    "master-standalone-strict/{kind}{suffix}.json"
+)
+CRD_URL = "https://kubernetes-schemas.pages.dev/{group}/{kind}_{version}.json"
+
+
+def split_api_version(api_version: str) -> tuple[str, str]:
+    """'apps/v1' -> ('apps', 'v1'); 'v1' -> ('', 'v1')."""
+    group, _, version = api_version.rpartition("/")
+    return group, version
+
+
+def schema_key(group: str, kind: str, version: str) -> str:
+    return f"{group}/{kind.lower()}/{version}"
+
+
+def export_path(group: str, kind: str, version: str) -> Path:
+    """Relative path in the kubeconform {{.Group}}/{{.ResourceKind}}_{{.ResourceAPIVersion}} layout."""
+    return Path(group) / f"{kind.lower()}_{version}.json"
+
+
+def source_url(group: str, kind: str, version: str) -> str:
+    if group in BUILTIN_GROUPS:
+        # kubeconform's KindSuffix: -<version> for core, -<first group label>-<version> otherwise
+        suffix = f"-{version}" if not group else f"-{group.split('.')[0]}-{version}"
+        return BUILTIN_URL.format(kind=kind.lower(), suffix=suffix)
+    return CRD_URL.format(group=group, kind=kind.lower(), version=version)
+
+
+class SchemaStore:
+    """Read-only view of a packed store, backed by a memory map."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with path.open("rb") as file:
+            # The map stays valid after the file is closed
+            try:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise ValueError(f"Cannot read schema store {path}: {e}") from e
+        try:
+            magic, index_length = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                raise ValueError("not a schema store")
+            start = HEADER.size
+            index = json.loads(self._map[start : start + index_length])
+            if index.get("format") != FORMAT_VERSION:
+                raise ValueError(f"format {index.get('format')}, expected {FORMAT_VERSION}")
+        except (ValueError, struct.error) as e:
+            self._map.close()
+            raise ValueError(f"Cannot read schema store {path}: {e}") from e
+        self.version: str = index["version"]
+        self.created: str = index["created"]
+        self._entries: dict[str, list[int]] = index["entries"]
+        self._data_start = start + index_length
+        self._decoded: dict[str, dict[str, Any]] = {}
+
+    def __enter__(self) -> SchemaStore:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def raw(self, key: str) -> bytes:
+        """The stored JSON bytes for a group/kind/version key. Raises KeyError if absent."""
+        offset, length = self._entries[key]
+        start = self._data_start + offset
+        return self._map[start : start + length]
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """The decoded schema for a key, or None. Decoded schemas are kept for reuse."""
+        schema = self._decoded.get(key)
+        if schema is None and key in self._entries:
+            schema = self._decoded[key] = json.loads(self.raw(key))
+        return schema
+
+    def lookup(self, api_version: str, kind: str) -> dict[str, Any] | None:
+        """The schema for a manifest's apiVersion and kind, or None."""
+        group, version = split_api_version(api_version)
+        return self.get(schema_key(group, kind, version))
+
+    def export(self, directory: Path) -> int:
+        """Write every schema in the kubeconform layout. Returns the number written."""
+        for key in self._entries:
+            group, kind, version = key.split("/")
+            target = directory / export_path(group, kind, version)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(self.raw(key))
+        return len(self._entries)
+
+
+def write_store(path: Path, schemas: dict[str, bytes]) -> str:
+    """Pack schemas into path atomically and return the store version."""
+    digest = hashlib.sha256()
+    entries: dict[str, list[int]] = {}
+    offset = 0
+    for key in sorted(schemas):
+        content = schemas[key]
+        entries[key] = [offset, len(content)]
+        offset += len(content)
+        digest.update(key.encode())
+        digest.update(hashlib.sha256(content).digest())
+    version = digest.hexdigest()[:16]
+
+    index = json.dumps(
+        {
+            "format": FORMAT_VERSION,
+            "version": version,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "entries": entries,
+        },
+        separators=(",", ":"),
+    ).encode()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    with os.fdopen(fd, "wb") as out:
+        out.write(HEADER.pack(MAGIC, len(index)))
+        out.write(index)
+        for key in sorted(schemas):
+            out.write(schemas[key])
+    os.replace(temp, path)
+    return version
+
+
+def manifest_kinds(directories: Iterable[Path]) -> set[tuple[str, str, str]]:
+    """(group, kind, version) of every document in the YAML files below directories."""
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    kinds: set[tuple[str, str, str]] = set()
+    for directory in directories:
+        for path in sorted(directory.rglob("*.yaml")):
+            try:
+                documents = list(yaml.load_all(path.read_text(), Loader=loader))
+            except yaml.YAMLError as e:
+                print(f"Skipping {path}: {e}", file=sys.stderr)
+                continue
+            for document in documents:
+                if not isinstance(document, dict):
+                    continue
+                api_version, kind = document.get("apiVersion"), document.get("kind")
+                if not isinstance(api_version, str) or not isinstance(kind, str):
+                    continue
+                group, version = split_api_version(api_version)
+                if group not in IGNORED_GROUPS:
+                    kinds.add((group, kind, version))
+    return kinds
+
+
+def fetch(group: str, kind: str, version: str, source: Path | None) -> bytes | None:
+    """Schema bytes from the local source directory or the network, None if unavailable."""
+    if source is not None:
+        path = source / export_path(group, kind, version)
+        return path.read_bytes() if path.is_file() else None
+    try:
+        with urllib.request.urlopen(source_url(group, kind, version), timeout=30) as response:
+            return response.read()
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return None
+        raise
+
+
+def build(
+    store_path: Path,
+    manifests: list[Path],
+    source: Path | None,
+    jobs: int,
+    clean: bool,
+) -> int:
+    schemas: dict[str, bytes] = {}
+    if store_path.is_file() and not clean:
+        with SchemaStore(store_path) as store:
+            schemas = {key: store.raw(key) for key in store}
+
+    wanted = sorted(
+        kind
+        for kind in manifest_kinds(manifests)
+        if schema_key(*kind) not in schemas
+    )
+
+    def load(kind: tuple[str, str, str]) -> tuple[tuple[str, str, str], bytes | None]:
+        return kind, fetch(*kind, source)
+
+    missing = []
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            for (group, kind, version), content in pool.map(load, wanted):
+                if content is None:
+                    missing.append(f"{group or 'core'}/{version} {kind}")
+                    continue
+                json.loads(content)  # refuse to pack anything that is not JSON
+                schemas[schema_key(group, kind, version)] = content
+    except (OSError, ValueError) as e:
+        print(f"Error fetching schemas: {e}", file=sys.stderr)
+        return 1
+
+    version = write_store(store_path, schemas)
+    added = len(wanted) - len(missing)
+    print(f"Schema store {store_path} (version {version}): {len(schemas)} schemas, {added} added")
+    for name in missing:
+        print(f"  no schema found for {name}", file=sys.stderr)
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build and inspect the offline schema store")
+    parser.add_argument(
+        "--store",
+        type=Path,
+        default=DEFAULT_STORE,
+        help=f"Packed store file (default: {DEFAULT_STORE})",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="Add schemas for the kinds in rendered manifests")
+    build_parser.add_argument(
+        "manifests",
+        type=Path,
+        nargs="*",
+        default=[DEFAULT_MANIFESTS],
+        help=f"Directories to scan for kinds (default: {DEFAULT_MANIFESTS})",
+    )
+    build_parser.add_argument(
+        "--from",
+        dest="source",
+        type=Path,
+        help="Read schemas from a local {group}/{kind}_{version}.json tree instead of downloading",
+    )
+    build_parser.add_argument("--jobs", type=int, default=8, help="Concurrent downloads (default: 8)")
+    build_parser.add_argument(
+        "--clean", action="store_true", help="Start from an empty store instead of adding to it"
+    )
+
+    export_parser = commands.add_parser("export", help="Unpack the store for kubeconform")
+    export_parser.add_argument("directory", type=Path, help="Output directory")
+
+    commands.add_parser("list", help="Show the store version and its schemas")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        return build(args.store, args.manifests, args.source, max(args.jobs, 1), args.clean)
+
+    if not args.store.is_file():
+        print(f"Schema store not found: {args.store} (run `schema_store.py build`)", file=sys.stderr)
+        return 1
+    try:
+        store = SchemaStore(args.store)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    with store:
+        if args.command == "export":
+            count = store.export(args.directory)
+            print(f"Exported {count} schemas to {args.directory}")
+        else:
+            print(f"{args.store}: version {store.version}, created {store.created}")
+            for key in store:
+                print(f"  {key}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
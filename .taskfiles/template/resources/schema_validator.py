@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Validate cluster.yaml and nodes.yaml against the generated JSON Schemas.
+
+The schemas generated from the CUE sources are compiled once into nested
+check functions specialised to the keywords each property uses, and cached
+by schema content hash. Validation walks the already-loaded data dict and
+collects every violation in a single pass instead of stopping at the first.
+
+The `_nodes_check` uniqueness of node names, addresses and MAC addresses in
+nodes.schema.cue has no JSON Schema form and is checked here as well. So
+are the cross-field constraints such as `!=cluster_api_addr`, which the
+generator records in the x-not-equal keyword. A field left unset is
+compared through its default, as `cue vet` does.
+
+Usage:
+    python schema_validator.py                                  # Validate ./cluster.yaml and ./nodes.yaml
+    python schema_validator.py --cluster c.yaml --nodes n.yaml  # Validate other files
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import ipaddress
+import json
+import re
+import sys
+import time
+from collections import abc
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+SCHEMA_DIR = Path(__file__).parent
+CLUSTER_SCHEMA = "cluster.schema.json"
+NODES_SCHEMA = "nodes.schema.json"
+
+# nodes.schema.cue `_nodes_check`: these node fields must be unique
+NODE_UNIQUE_FIELDS = ("name", "address", "mac_addr")
+
+# Sibling fields a property must differ from, see generate_jsonschema.py
+NOT_EQUAL_KEYWORD = "x-not-equal"
+
+# A check appends "path: message" strings to errors for value at path
+Check = abc.Callable[[Any, str, list[str]], None]
+
+_compiled: dict[str, Check] = {}
+
+
+class SchemaValidationError(Exception):
+    """Raised with every violation found in the configuration."""
+
+    def __init__(self, errors: list[str]):
+        super().__init__(f"{len(errors)} schema violation(s)")
+        self.errors = errors
+
+
+def _is_type(value: Any, type_name: str) -> bool:
+    if type_name == "string":
+        return isinstance(value, str)
+    if type_name == "boolean":
+        return isinstance(value, bool)
+    if type_name == "integer":
+        return isinstance(value, int) and not isinstance(value, bool)
+    if type_name == "number":
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if type_name == "object":
+        return isinstance(value, dict)
+    if type_name == "array":
+        return isinstance(value, list)
+    if type_name == "null":
+        return value is None
+    return True
+
+
+def _is_ipv4(value: str) -> bool:
+    try:
+        ipaddress.IPv4Address(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_ipv4_cidr(value: str) -> bool:
+    try:
+        ipaddress.IPv4Network(value, strict=False)
+    except ValueError:
+        return False
+    return "/" in value
+
+
+_HOSTNAME_LABEL = re.compile(r"^(?!-)[A-Za-z0-9-]{1,63}(?<!-)$")
+
+
+def _is_hostname(value: str) -> bool:
+    if len(value) > 253:
+        return False
+    return all(_HOSTNAME_LABEL.match(label) for label in value.rstrip(".").split("."))
+
+
+FORMATS: dict[str, abc.Callable[[str], bool]] = {
+    "ipv4": _is_ipv4,
+    "ipv4-cidr": _is_ipv4_cidr,
+    "hostname": _is_hostname,
+}
+
+
+def _join(path: str, key: str | int) -> str:
+    if isinstance(key, int):
+        return f"{path}[{key}]"
+    return f"{path}.{key}" if path else key
+
+
+def compile_schema(schema: dict[str, Any]) -> Check:
+    """Compile a JSON Schema node into a check function.
+
+    Only the keywords present in schema produce checks, so validating a value
+    runs exactly the comparisons its property needs.
+    """
+    checks: list[Check] = []
+
+    types = schema.get("type")
+    if types is not None:
+        type_names = [types] if isinstance(types, str) else list(types)
+        expected = " or ".join(type_names)
+
+        def check_type(value: Any, path: str, errors: list[str]) -> None:
+            if not any(_is_type(value, name) for name in type_names):
+                errors.append(f"{path}: expected {expected}, got {type(value).__name__}")
+
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = schema["enum"]
+
+        def check_enum(value: Any, path: str, errors: list[str]) -> None:
+            if value not in allowed:
+                errors.append(f"{path}: {value!r} is not one of {allowed}")
+
+        checks.append(check_enum)
+
+    if "not" in schema:
+        negated = compile_schema(schema["not"])
+
+        def check_not(value: Any, path: str, errors: list[str]) -> None:
+            nested: list[str] = []
+            negated(value, path, nested)
+            if not nested:
+                errors.append(f"{path}: {value!r} is not allowed")
+
+        checks.append(check_not)
+
+    for subschema in schema.get("allOf", []):
+        checks.append(compile_schema(subschema))
+
+    string_checks = _compile_string(schema)
+    number_checks = _compile_number(schema)
+    array_checks = _compile_array(schema)
+    object_checks = _compile_object(schema)
+
+    def check(value: Any, path: str, errors: list[str]) -> None:
+        for run in checks:
+            run(value, path, errors)
+        if isinstance(value, str):
+            for run in string_checks:
+                run(value, path, errors)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            for run in number_checks:
+                run(value, path, errors)
+        elif isinstance(value, list):
+            for run in array_checks:
+                run(value, path, errors)
+        elif isinstance(value, dict):
+            for run in object_checks:
+                run(value, path, errors)
+
+    return check
+
+
+def _compile_string(schema: dict[str, Any]) -> list[Check]:
+    checks: list[Check] = []
+
+    if "minLength" in schema:
+        min_length = schema["minLength"]
+
+        def check_min_length(value: str, path: str, errors: list[str]) -> None:
+            if len(value) < min_length:
+                if min_length == 1:
+                    errors.append(f"{path}: must not be empty")
+                else:
+                    errors.append(f"{path}: shorter than {min_length} characters")
+
+        checks.append(check_min_length)
+
+    if "maxLength" in schema:
+        max_length = schema["maxLength"]
+
+        def check_max_length(value: str, path: str, errors: list[str]) -> None:
+            if len(value) > max_length:
+                errors.append(f"{path}: longer than {max_length} characters")
+
+        checks.append(check_max_length)
+
+    try:
+        pattern = re.compile(schema["pattern"]) if "pattern" in schema else None
+    except re.error:
+        # Kubernetes schemas carry Go (RE2) patterns; skip the few Python cannot compile
+        pattern = None
+    if pattern is not None:
+
+        def check_pattern(value: str, path: str, errors: list[str]) -> None:
+            if not pattern.search(value):
+                errors.append(f"{path}: {value!r} does not match {pattern.pattern}")
+
+        checks.append(check_pattern)
+
+    if schema.get("format") in FORMATS:
+        format_name = schema["format"]
+        is_valid = FORMATS[format_name]
+
+        def check_format(value: str, path: str, errors: list[str]) -> None:
+            if not is_valid(value):
+                errors.append(f"{path}: {value!r} is not a valid {format_name}")
+
+        checks.append(check_format)
+
+    return checks
+
+
+def _compile_number(schema: dict[str, Any]) -> list[Check]:
+    checks: list[Check] = []
+
+    if "minimum" in schema:
+        minimum = schema["minimum"]
+
+        def check_minimum(value: float, path: str, errors: list[str]) -> None:
+            if value < minimum:
+                errors.append(f"{path}: {value} is less than {minimum}")
+
+        checks.append(check_minimum)
+
+    if "maximum" in schema:
+        maximum = schema["maximum"]
+
+        def check_maximum(value: float, path: str, errors: list[str]) -> None:
+            if value > maximum:
+                errors.append(f"{path}: {value} is greater than {maximum}")
+
+        checks.append(check_maximum)
+
+    if "exclusiveMinimum" in schema:
+        exclusive_minimum = schema["exclusiveMinimum"]
+
+        def check_exclusive_minimum(value: float, path: str, errors: list[str]) -> None:
+            if value <= exclusive_minimum:
+                errors.append(f"{path}: {value} is not greater than {exclusive_minimum}")
+
+        checks.append(check_exclusive_minimum)
+
+    if "exclusiveMaximum" in schema:
+        exclusive_maximum = schema["exclusiveMaximum"]
+
+        def check_exclusive_maximum(value: float, path: str, errors: list[str]) -> None:
+            if value >= exclusive_maximum:
+                errors.append(f"{path}: {value} is not less than {exclusive_maximum}")
+
+        checks.append(check_exclusive_maximum)
+
+    return checks
+
+
+def _compile_array(schema: dict[str, Any]) -> list[Check]:
+    checks: list[Check] = []
+
+    if "minItems" in schema:
+        min_items = schema["minItems"]
+
+        def check_min_items(value: list[Any], path: str, errors: list[str]) -> None:
+            if len(value) < min_items:
+                errors.append(f"{path}: needs at least {min_items} item(s)")
+
+        checks.append(check_min_items)
+
+    if schema.get("uniqueItems"):
+
+        def check_unique_items(value: list[Any], path: str, errors: list[str]) -> None:
+            seen: set[str] = set()
+            for index, item in enumerate(value):
+                key = json.dumps(item, sort_keys=True, default=str)
+                if key in seen:
+                    errors.append(f"{_join(path, index)}: duplicate item {item!r}")
+                seen.add(key)
+
+        checks.append(check_unique_items)
+
+    if isinstance(schema.get("items"), dict) and schema["items"]:
+        check_item = compile_schema(schema["items"])
+
+        def check_items(value: list[Any], path: str, errors: list[str]) -> None:
+            for index, item in enumerate(value):
+                check_item(item, _join(path, index), errors)
+
+        checks.append(check_items)
+
+    return checks
+
+
+def _compile_object(schema: dict[str, Any]) -> list[Check]:
+    checks: list[Check] = []
+    properties = {
+        name: compile_schema(subschema)
+        for name, subschema in schema.get("properties", {}).items()
+    }
+
+    # CUE fills fields that have a default, so they are not really required
+    required = [
+        name
+        for name in schema.get("required", [])
+        if "default" not in schema.get("properties", {}).get(name, {})
+    ]
+    if required:
+
+        def check_required(value: dict[str, Any], path: str, errors: list[str]) -> None:
+            for name in required:
+                if name not in value:
+                    errors.append(f"{_join(path, name)}: required field is missing")
+
+        checks.append(check_required)
+
+    additional = schema.get("additionalProperties", True)
+
+    def check_properties(value: dict[str, Any], path: str, errors: list[str]) -> None:
+        for name, item in value.items():
+            check_property = properties.get(name)
+            if check_property is not None:
+                check_property(item, _join(path, name), errors)
+            elif additional is False:
+                errors.append(f"{_join(path, name)}: unknown field")
+
+    checks.append(check_properties)
+
+    # Each constrained pair once: CUE states `a != b` on both a and b
+    subschemas = schema.get("properties", {})
+    pairs: list[tuple[str, str]] = []
+    for name, subschema in subschemas.items():
+        for other in subschema.get(NOT_EQUAL_KEYWORD, []):
+            if (other, name) not in pairs:
+                pairs.append((name, other))
+    if pairs:
+        defaults = {
+            name: subschema["default"]
+            for name, subschema in subschemas.items()
+            if "default" in subschema
+        }
+
+        def check_not_equal(value: dict[str, Any], path: str, errors: list[str]) -> None:
+            for name, other in pairs:
+                first = value.get(name, defaults.get(name))
+                second = value.get(other, defaults.get(other))
+                if first is not None and first == second:
+                    errors.append(f"{_join(path, name)}: {first!r} must differ from {other}")
+
+        checks.append(check_not_equal)
+    return checks
+
+
+def load_check(schema_path: Path) -> Check:
+    """Return the compiled check for schema_path, cached by its content hash."""
+    content = schema_path.read_bytes()
+    digest = hashlib.sha256(content).hexdigest()
+    if digest not in _compiled:
+        _compiled[digest] = compile_schema(json.loads(content))
+    return _compiled[digest]
+
+
+def check_nodes(nodes: Any, errors: list[str]) -> None:
+    """Check the `_nodes_check` uniqueness rules the JSON Schema cannot express."""
+    if not isinstance(nodes, list):
+        return
+
+    for field in NODE_UNIQUE_FIELDS:
+        first_seen: dict[Any, int] = {}
+        for index, node in enumerate(nodes):
+            if not isinstance(node, dict) or field not in node:
+                continue
+            value = node[field]
+            # Lists and mappings are reported by the type check and cannot be dict keys
+            if isinstance(value, (list, dict)):
+                continue
+            if value in first_seen:
+                errors.append(
+                    f"nodes[{index}].{field}: {value!r} is already used by nodes[{first_seen[value]}]"
+                )
+            else:
+                first_seen[value] = index
+
+
+def validate_data(data: abc.Mapping[str, Any], schema_dir: Path = SCHEMA_DIR) -> list[str]:
+    """Validate merged cluster.yaml and nodes.yaml data. Returns every violation found."""
+    errors: list[str] = []
+
+    cluster = {key: value for key, value in data.items() if key != "nodes"}
+    load_check(schema_dir / CLUSTER_SCHEMA)(cluster, "", errors)
+
+    nodes = {"nodes": data["nodes"]} if "nodes" in data else {}
+    load_check(schema_dir / NODES_SCHEMA)(nodes, "", errors)
+    check_nodes(data.get("nodes"), errors)
+
+    return errors
+
+
+def main() -> int:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Validate cluster.yaml and nodes.yaml against the generated JSON Schemas"
+    )
+    parser.add_argument("--cluster", type=Path, default=Path("cluster.yaml"))
+    parser.add_argument("--nodes", type=Path, default=Path("nodes.yaml"))
+    args = parser.parse_args()
+
+    data: dict[str, Any] = {}
+    for path in (args.cluster, args.nodes):
+        if not path.is_file():
+            print(f"Error: File not found: {path}", file=sys.stderr)
+            return 1
+        data.update(yaml.safe_load(path.read_text()) or {})
+
+    start = time.perf_counter()
+    errors = validate_data(data)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if errors:
+        for error in errors:
+            print(f"  - {error}", file=sys.stderr)
+        print(f"Error: {len(errors)} schema violation(s)", file=sys.stderr)
+        return 1
+
+    print(f"Configuration is valid ({elapsed:.1f}ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Index the names every template references, without rendering anything.
+
+Each *.j2 below the makejinja inputs is parsed once with the project's
+delimiters. The index records the top-level variables it reads, the
+templates it includes, the functions it calls and the filters it applies.
+Entries are keyed by the sha256 of the template source, so only templates
+whose source changed are parsed again, and a template moved to another path
+keeps its entry. The index is kept next to the render manifest
+(.cache/render/template-index.json).
+
+A template reads the variables of every template it includes, so lookups
+use the union over its includes. A template with an include whose name is
+only known at render time is marked dynamic.
+
+render.py uses the index to tell which templates call the plugin functions
+that read credential files or list templates on disk, so only those are
+rendered again when such a file changes.
+
+The affected command answers "which outputs change if I flip loki_enabled".
+The index is refreshed, the derivation rules of the plugin extend each key
+to the derived keys computed from it, and the answer is a lookup in the
+inverted map. Templates below a directory owned by a feature flag are
+included too, since the flag decides whether they are rendered at all.
+
+Usage:
+    python template_index.py build                    # Parse changed templates, save the index
+    python template_index.py affected loki_enabled    # Outputs that depend on a cluster.yaml key
+    python template_index.py show kubernetes/apps/monitoring/loki/app/helmrelease.yaml.j2
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import attrs
+from jinja2 import Environment, TemplateError, meta, nodes
+from jinja2.defaults import DEFAULT_NAMESPACE
+
+# Bump to drop every entry when the recorded fields change
+INDEX_VERSION = 1
+INDEX_FILE = "template-index.json"
+
+
+@dataclass(frozen=True)
+class Summary:
+    """Names a template references, from its own source or across its includes."""
+
+    variables: frozenset[str] = frozenset()
+    calls: frozenset[str] = frozenset()
+    filters: frozenset[str] = frozenset()
+    includes: frozenset[str] = frozenset()
+    # True when an include, import or extends names its template at render time
+    dynamic: bool = False
+
+    def union(self, other: Summary) -> Summary:
+        return Summary(
+            self.variables | other.variables,
+            self.calls | other.calls,
+            self.filters | other.filters,
+            self.includes | other.includes,
+            self.dynamic or other.dynamic,
+        )
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "variables": sorted(self.variables),
+            "calls": sorted(self.calls),
+            "filters": sorted(self.filters),
+            "includes": sorted(self.includes),
+            "dynamic": self.dynamic,
+        }
+
+    @classmethod
+    def from_json(cls, entry: dict[str, Any]) -> Summary:
+        return cls(
+            frozenset(entry["variables"]),
+            frozenset(entry["calls"]),
+            frozenset(entry["filters"]),
+            frozenset(entry["includes"]),
+            entry["dynamic"],
+        )
+
+
+def syntax_key(env: Environment) -> str:
+    """The environment settings that change how a source parses."""
+    return repr(
+        (
+            env.block_start_string,
+            env.block_end_string,
+            env.variable_start_string,
+            env.variable_end_string,
+            env.comment_start_string,
+            env.comment_end_string,
+            env.line_statement_prefix,
+            env.line_comment_prefix,
+            sorted(env.extensions),
+        )
+    )
+
+
+def parsing_environment(env: Environment) -> Environment:
+    """env without the data and plugin globals.
+
+    Jinja reports no name held in the globals as undeclared, and makejinja
+    puts the data there, so it would hide every variable a template reads.
+    """
+    parser = env.overlay()
+    parser.globals = dict(DEFAULT_NAMESPACE)
+    return parser
+
+
+def parse_summary(env: Environment, source: str) -> Summary:
+    """Summary of a single template source, not following its includes.
+
+    env must come from parsing_environment().
+    """
+    tree = env.parse(source)
+    includes = list(meta.find_referenced_templates(tree))
+    return Summary(
+        variables=frozenset(meta.find_undeclared_variables(tree)),
+        calls=frozenset(
+            call.node.name
+            for call in tree.find_all(nodes.Call)
+            if isinstance(call.node, nodes.Name)
+        ),
+        filters=frozenset(node.name for node in tree.find_all(nodes.Filter)),
+        includes=frozenset(name for name in includes if name is not None),
+        dynamic=None in includes,
+    )
+
+
+class TemplateIndex:
+    """Persisted static summary of every template, keyed by the hash of its source."""
+
+    def __init__(self, path: Path | None):
+        self.path = path
+        self.entries: dict[str, Summary] = {}
+        # Template name -> source hash, as of the last lookup of that name
+        self.templates: dict[str, str] = {}
+        self._syntax: str | None = None
+        self._parser: Environment | None = None
+        self._stored_syntax: str | None = None
+        # Sources parsed by this process, as opposed to found in the index
+        self.parsed = 0
+        if path is not None and path.is_file():
+            try:
+                stored = json.loads(path.read_text())
+            except (OSError, ValueError):
+                stored = {}
+            if stored.get("version") == INDEX_VERSION:
+                self._stored_syntax = stored.get("syntax")
+                self.entries = {
+                    digest: Summary.from_json(entry)
+                    for digest, entry in stored.get("entries", {}).items()
+                }
+                self.templates = stored.get("templates", {})
+
+    def _check_syntax(self, env: Environment) -> None:
+        # Entries parsed with other delimiters say nothing about this environment
+        if self._syntax is None:
+            self._parser = parsing_environment(env)
+            self._syntax = syntax_key(env)
+            if self._syntax != self._stored_syntax:
+                self.entries.clear()
+                self.templates.clear()
+
+    def summary(self, env: Environment, name: str) -> Summary:
+        """Summary of the current source of name, parsing it only when its hash is new."""
+        self._check_syntax(env)
+        source, _, _ = env.loader.get_source(env, name)
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        self.templates[name] = digest
+        entry = self.entries.get(digest)
+        if entry is None:
+            entry = self.entries[digest] = parse_summary(self._parser, source)
+            self.parsed += 1
+        return entry
+
+    def closure(self, env: Environment, name: str) -> Summary:
+        """Summary of name merged with that of every template it includes, transitively.
+
+        Sources are read again on every call, so edits are seen. A missing
+        include marks the result dynamic.
+        """
+        result = Summary()
+        seen: set[str] = set()
+        pending = [name]
+        while pending:
+            current = pending.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            try:
+                summary = self.summary(env, current)
+            except TemplateError:
+                result = result.union(Summary(dynamic=True))
+                continue
+            result = result.union(summary)
+            pending.extend(summary.includes)
+        return result
+
+    def refresh(self, env: Environment, names: Iterable[str]) -> None:
+        """Look up every template in names, parsing new sources."""
+        for name in names:
+            self.summary(env, name)
+
+    def save(self, keep: Iterable[str] | None = None) -> None:
+        """Persist the index, only the templates named in keep when given.
+
+        Entries no template points at any more are dropped.
+        """
+        if self.path is None:
+            return
+        if keep is not None:
+            names = set(keep)
+            self.templates = {
+                name: digest for name, digest in self.templates.items() if name in names
+            }
+        used = set(self.templates.values())
+        payload = {
+            "version": INDEX_VERSION,
+            "syntax": self._syntax if self._syntax is not None else self._stored_syntax,
+            "entries": {
+                digest: entry.to_json()
+                for digest, entry in self.entries.items()
+                if digest in used
+            },
+            "templates": self.templates,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(payload, indent=2, sort_keys=True) + "\n")
+
+
+@dataclass
+class KeyIndex:
+    """Inverted index: every variable and the templates that depend on it."""
+
+    # Variable -> templates that read it, directly or through an include
+    readers: dict[str, set[str]] = field(default_factory=dict)
+    # Variable -> derived variables computed from it, transitively
+    derived: dict[str, set[str]] = field(default_factory=dict)
+    # Feature flag -> templates below the directories it owns
+    owned: dict[str, set[str]] = field(default_factory=dict)
+
+    def affected(self, key: str) -> set[str]:
+        """Templates whose output may change when key changes."""
+        templates: set[str] = set()
+        for name in {key} | self.derived.get(key, set()):
+            templates |= self.readers.get(name, set())
+            templates |= self.owned.get(name, set())
+        return templates
+
+
+def build_key_index(
+    index: TemplateIndex,
+    env: Environment,
+    names: list[str],
+    rules: Iterable[Any],
+    feature_directories: dict[str, list[str]],
+) -> KeyIndex:
+    """Invert the index and expand each key through the derivation rules."""
+    keys = KeyIndex()
+    for name in names:
+        for variable in index.closure(env, name).variables:
+            keys.readers.setdefault(variable, set()).add(name)
+
+    # Rules come in evaluation order, so one pass per key reaches every derived key
+    rules = list(rules)
+    sources = {key for rule in rules for key in rule.inputs} | set(keys.readers)
+    for key in sources:
+        dirty = {key}
+        for rule in rules:
+            if dirty.intersection(rule.inputs):
+                dirty.update(rule.outputs)
+        dirty.discard(key)
+        if dirty:
+            keys.derived[key] = dirty
+
+    for feature, directories in feature_directories.items():
+        keys.owned[feature] = {
+            name
+            for name in names
+            if any(name.startswith(f"{directory}/") for directory in directories)
+        }
+    return keys
+
+
+def find_templates(config: Any) -> dict[str, Path]:
+    """{template name: path} of every template below the inputs; earlier inputs win."""
+    found: dict[str, Path] = {}
+    for root in config.inputs:
+        if root.is_file():
+            found.setdefault(root.name, root)
+            continue
+        for path in sorted(root.rglob(f"*{config.jinja_suffix}")):
+            if path.is_file():
+                found.setdefault(path.relative_to(root).as_posix(), path)
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Index the variables, includes and function calls of every template"
+    )
+    parser.add_argument(
+        "--config",
+        type=Path,
+        default=Path("makejinja.toml"),
+        help="Path to makejinja.toml (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=Path(".cache/render"),
+        help="Directory the index is kept in (default: %(default)s)",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("build", help="Parse new or changed templates and save the index")
+    affected = commands.add_parser("affected", help="List the outputs that depend on data keys")
+    affected.add_argument("keys", nargs="+", help="cluster.yaml or derived variable names")
+    affected.add_argument(
+        "--templates", action="store_true", help="Print template names instead of output paths"
+    )
+    show = commands.add_parser("show", help="Print the index entry of templates")
+    show.add_argument("templates", nargs="+", help="Template names relative to an input")
+    args = parser.parse_args()
+
+    if not args.config.is_file():
+        print(f"Error: Config file not found: {args.config}", file=sys.stderr)
+        return 1
+
+    # render.py imports this module, so it is only imported once both are loaded
+    from makejinja.app import generate_output_path
+    from render import build_context, load_config
+
+    # Parsing checks filter names, so the environment needs the plugin filters
+    config = attrs.evolve(load_config(args.config), quiet=True)
+    env = build_context(config).env
+    templates = find_templates(config)
+    index = TemplateIndex(args.cache_dir / INDEX_FILE)
+
+    try:
+        index.refresh(env, templates)
+    except TemplateError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    index.save(keep=templates)
+
+    if args.command == "build":
+        print(
+            f"Indexed {len(templates)} templates "
+            f"({index.parsed} parsed) into {index.path}"
+        )
+        return 0
+
+    if args.command == "show":
+        for name in args.templates:
+            if name not in templates:
+                print(f"Error: Unknown template: {name}", file=sys.stderr)
+                return 1
+            print(json.dumps({name: index.closure(env, name).to_json()}, indent=2))
+        return 0
+
+    from plugin import FEATURE_DIRECTORIES, build_rules
+
+    names = [
+        name
+        for name, path in templates.items()
+        if not any(path.match(pattern) for pattern in config.exclude_patterns)
+    ]
+    keys = build_key_index(
+        index, env, names, build_rules(lambda data: {}).order, FEATURE_DIRECTORIES
+    )
+    found = set().union(*(keys.affected(key) for key in args.keys))
+    for name in sorted(found):
+        output = generate_output_path(config, Path(name))
+        print(name if args.templates else os.path.relpath(output))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
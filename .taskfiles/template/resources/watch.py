@@ -0,0 +1,606 @@
+#!/usr/bin/env python3
+"""
+Keep the render environment resident and re-render outputs as their inputs change.
+
+Every `task configure` starts a new interpreter. It imports makejinja and
+jinja2, loads the YAML, derives the plugin data and compiles templates before
+the first output is written. Watch mode pays that once. It brings the tree up
+to date with an incremental render. It then keeps the Jinja environment, the
+compiled templates and the derived data in memory, and watches cluster.yaml,
+nodes.yaml, the template inputs and the credential files.
+
+Each change re-renders only the outputs that depend on it. The dependencies
+come from the manifest of incremental renders (see render.py):
+
+- cluster.yaml or nodes.yaml: the data is reloaded, and Plugin.update() re-runs
+  only the derivation rules downstream of the keys that changed. Templates that
+  read one of those keys are rendered again.
+- a template or partial: it is rendered again, with every template that
+  includes it.
+- a credential file: the templates calling a plugin function that reads it,
+  as found by the template index (see template_index.py).
+
+Some changes alter the set of templates that gets rendered: adding or removing
+a template, toggling a feature that prunes template directories, or editing
+the plugin sources or makejinja.toml. These restart the process. The manifest
+is saved after every change, so a later `render.py --incremental` starts where
+watch mode left off.
+
+Changes are picked up with inotify on Linux, and by polling file stats elsewhere.
+
+Usage:
+    python watch.py                  # Render, then re-render on every change
+    python watch.py --encrypt        # Write *.sops.* outputs already encrypted
+    python watch.py --validate       # Check the config against the schemas on every reload
+"""
+
+from __future__ import annotations
+
+import argparse
+import ctypes
+import ctypes.util
+import itertools
+import os
+import select
+import struct
+import sys
+import time
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import attrs
+from jinja2 import TemplateSyntaxError
+from makejinja.config import Config
+
+from encrypt_secrets import DEFAULT_AGE_KEY, relative_name
+from render import (
+    CREDENTIAL_FILES,
+    DEFAULT_BYTECODE_CACHE_MB,
+    DEFAULT_CACHE_DIR,
+    DEFAULT_CONFIG_FILE,
+    EMPTY,
+    UNCHANGED,
+    WRITTEN,
+    EncryptionError,
+    RenderContext,
+    RenderJob,
+    RenderOptions,
+    attach_bytecode_cache,
+    build_context,
+    collect_plan,
+    copy_output,
+    digest_bytes,
+    encrypt_outputs,
+    external_digests,
+    is_secret,
+    load_config,
+    load_data,
+    open_manifest,
+    referenced_partials,
+    render,
+    render_job,
+    write_output,
+)
+from schema_validator import SchemaValidationError, validate_data
+
+# Events arriving within this window are handled as one change, so an editor
+# that saves through a temporary file triggers a single render
+DEBOUNCE_SECONDS = 0.02
+POLL_INTERVAL_SECONDS = 0.25
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+# struct inotify_event without its variable-length name
+_EVENT = struct.Struct("iIII")
+
+
+class RestartRequired(Exception):
+    """Raised when a change alters what gets rendered, not just how."""
+
+
+class InotifyWatcher:
+    """Reports changed files below directory trees and changes to single files, through inotify."""
+
+    def __init__(self, trees: Iterable[Path], files: Iterable[Path]):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: dict[int, Path] = {}
+        self._trees = [tree for tree in trees if tree.is_dir()]
+        self._files = set(files)
+        for tree in self._trees:
+            self._watch_tree(tree)
+        # Single files are watched through their directory, so replacing them by rename is seen
+        for directory in {path.parent for path in self._files}:
+            self._watch(directory)
+
+    def _watch(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd >= 0:
+            self._directories[wd] = directory
+
+    def _watch_tree(self, root: Path) -> None:
+        for directory, _, _ in os.walk(root):
+            self._watch(Path(directory))
+
+    def _wanted(self, path: Path) -> bool:
+        return path in self._files or any(path.is_relative_to(tree) for tree in self._trees)
+
+    def _read(self) -> Iterator[Path | None]:
+        """Paths named by the pending events; None when the kernel queue overflowed."""
+        buffer = os.read(self._fd, 64 * 1024)
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = _EVENT.unpack_from(buffer, offset)
+            start = offset + _EVENT.size
+            name = buffer[start : start + length].rstrip(b"\0")
+            offset = start + length
+
+            if mask & IN_Q_OVERFLOW:
+                yield None
+                continue
+            directory = self._directories.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if not self._wanted(path):
+                continue
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_tree(path)
+            yield path
+
+    def wait(self) -> set[Path] | None:
+        """Block until something changes and return the paths changed within the debounce window.
+
+        Returns None when events were lost and the caller has to rescan.
+        """
+        changed: set[Path] = set()
+        timeout = None
+        while True:
+            ready, _, _ = select.select([self._fd], [], [], timeout)
+            if not ready:
+                return changed
+            for path in self._read():
+                if path is None:
+                    return None
+                changed.add(path)
+            if changed:
+                timeout = DEBOUNCE_SECONDS
+
+
+class PollingWatcher:
+    """Fallback without inotify: compares the mtime and size of every watched file."""
+
+    def __init__(self, trees: Iterable[Path], files: Iterable[Path]):
+        self._trees = [tree for tree in trees if tree.is_dir()]
+        self._files = list(files)
+        self._snapshot = self._scan()
+
+    def _scan(self) -> dict[Path, tuple[int, int]]:
+        stats: dict[Path, tuple[int, int]] = {}
+        paths = itertools.chain(self._files, *(tree.rglob("*") for tree in self._trees))
+        for path in paths:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            stats[path] = (stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    def wait(self) -> set[Path] | None:
+        while True:
+            time.sleep(POLL_INTERVAL_SECONDS)
+            snapshot = self._scan()
+            changed = {
+                path
+                for path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            if changed:
+                return changed
+
+
+def open_watcher(trees: list[Path], files: list[Path]) -> InotifyWatcher | PollingWatcher:
+    """An inotify watcher on Linux, otherwise one that polls."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(trees, files)
+        except (OSError, AttributeError, TypeError):
+            pass
+    return PollingWatcher(trees, files)
+
+
+def describe_error(error: Exception, template_name: str | None = None) -> str:
+    """One line for an error, prefixed with where it happened when that is known."""
+    if isinstance(error, TemplateSyntaxError) and error.lineno:
+        return f"{error.name or error.filename}:{error.lineno}: {error.message}"
+    message = f"{type(error).__name__}: {error}"
+    return f"{template_name}: {message}" if template_name else message
+
+
+class WatchSession:
+    """A resident render context that re-renders the outputs affected by each change."""
+
+    def __init__(self, config: Config, config_file: Path, options: RenderOptions):
+        # makejinja's "Load data" lines would repeat on every reload
+        self.config = attrs.evolve(config, quiet=True)
+        self.options = options
+        self.ctx = self.load_context()
+        self.plan = collect_plan(self.ctx)
+        self.jobs = {job.input_path.resolve(): job for job in self.plan.jobs}
+        self.copies = {source.resolve(): (source, output) for source, output in self.plan.copies}
+
+        self.roots = [Path(path).resolve() for path in config.inputs]
+        self.import_paths = [Path(path).resolve() for path in config.import_paths]
+        self.data_files = {Path(path).resolve() for path in config.data}
+        self.credential_files = {Path(name).resolve(): name for name in CREDENTIAL_FILES}
+        self.config_file = config_file.resolve()
+        # Every file the path filters may prune; new or removed files restart the session
+        self.candidates = [
+            path
+            for root in config.inputs
+            if root.is_dir()
+            for pattern in config.include_patterns
+            for path in root.glob(pattern)
+        ]
+        self.verdicts = self.filter_verdicts()
+        # Set when a reload failed half way; the next one derives everything afresh
+        self.data_failed = False
+
+        self.manifest = open_manifest(self.ctx, self.plan, options.cache_dir)
+        # Templates the initial render could not record, such as a secret sops failed on
+        pending = []
+        for job in self.plan.jobs:
+            if self.manifest.is_current(self.ctx, job, digest_bytes(job.input_path.read_bytes())):
+                self.manifest.keep(job)
+            else:
+                pending.append(job)
+        if pending:
+            self.report("startup", len(pending), *self.rebuild(pending, []))
+        # Compile and parse everything now so the first change does not pay for it
+        for job in self.plan.jobs:
+            self.ctx.env.get_template(job.template_name)
+            referenced_partials(self.ctx.env, job.template_name)
+
+    def load_context(self) -> RenderContext:
+        ctx = build_context(self.config, validate=self.options.validate)
+        # makejinja renders each template once and keeps none; a resident session keeps them
+        # all (a negative cache_size in Jinja terms) and recompiles those whose file changed
+        ctx.env.cache = {}
+        ctx.env.auto_reload = True
+        if self.options.bytecode_cache_mb > 0:
+            attach_bytecode_cache(
+                ctx, self.options.cache_dir / "bytecode", self.options.bytecode_cache_mb
+            )
+        return ctx
+
+    @property
+    def trees(self) -> list[Path]:
+        return [*self.roots, *self.import_paths]
+
+    @property
+    def files(self) -> list[Path]:
+        return sorted({*self.data_files, *self.credential_files, self.config_file})
+
+    def handle(self, changed: set[Path]) -> None:
+        """Re-render everything affected by the changed paths. Raises RestartRequired."""
+        start = time.perf_counter()
+        if self.config_file in changed:
+            raise RestartRequired(f"{_display(self.config_file)} changed")
+        for path in changed:
+            if path.suffix == ".py" and any(path.is_relative_to(p) for p in self.import_paths):
+                raise RestartRequired(f"{_display(path)} changed")
+        # Anything else below the import paths, such as __pycache__, is irrelevant
+        templates = sorted(
+            path for path in changed if any(path.is_relative_to(root) for root in self.roots)
+        )
+        if not templates and not changed & (self.data_files | self.credential_files.keys()):
+            return
+
+        jobs: dict[RenderJob, None] = {}
+        copies: list[tuple[Path, Path]] = []
+        credentials = {
+            name for path, name in self.credential_files.items() if path in changed
+        }
+        if credentials:
+            jobs.update(dict.fromkeys(self.credentials_changed(credentials)))
+        if changed & self.data_files:
+            jobs.update(dict.fromkeys(self.reload_data()))
+        if templates:
+            affected, copies = self.templates_changed(templates)
+            jobs.update(dict.fromkeys(affected))
+
+        writes, errors = self.rebuild(list(jobs), copies)
+        names = ", ".join(_display(path).as_posix() for path in sorted(changed))
+        self.report(names, len(jobs), writes, errors, time.perf_counter() - start)
+
+    def credentials_changed(self, names: set[str]) -> list[RenderJob]:
+        """Take new digests of the credential files and return the templates reading one."""
+        self.manifest.external = external_digests(self.plan)
+        jobs = []
+        for job in self.plan.jobs:
+            entry = self.manifest.entries.get(str(job.input_path))
+            if entry is None or not names.isdisjoint(entry.get("external", {})):
+                jobs.append(job)
+        return jobs
+
+    def reload_data(self) -> list[RenderJob]:
+        """Apply the reloaded data files and return the templates that read a changed key."""
+        data = load_data(self.config)
+        if self.options.validate:
+            errors = validate_data(data)
+            if errors:
+                raise SchemaValidationError(errors)
+
+        if self.data_failed or not all(hasattr(p, "update") for p in self.ctx.plugins):
+            # Start from a fresh context rather than a derivation left half updated
+            self.ctx = self.load_context()
+            self.data_failed = False
+            self.manifest.forget_values(self.ctx.env.globals)
+            self.check_plan()
+            return list(self.plan.jobs)
+
+        self.data_failed = True
+        changed: set[str] = set()
+        globals_ = self.ctx.env.globals
+        for plugin in self.ctx.plugins:
+            keys = plugin.update(data)
+            values = plugin.data() if hasattr(plugin, "data") else {}
+            for key in keys:
+                if key in values:
+                    globals_[key] = values[key]
+                else:
+                    globals_.pop(key, None)
+            changed |= keys
+        self.data_failed = False
+        self.ctx.data = data
+        self.manifest.forget_values(changed)
+
+        # Feature flags decide which template directories are rendered at all
+        self.ctx.path_filters = [
+            path_filter
+            for plugin in self.ctx.plugins
+            if hasattr(plugin, "path_filters")
+            for path_filter in plugin.path_filters()
+        ]
+        if self.filter_verdicts() != self.verdicts:
+            raise RestartRequired("the set of rendered templates changed")
+
+        affected = []
+        for job in self.plan.jobs:
+            entry = self.manifest.entries.get(str(job.input_path))
+            if entry is None or not changed.isdisjoint(entry.get("data", {})):
+                affected.append(job)
+        return affected
+
+    def filter_verdicts(self) -> list[bool]:
+        filters = self.ctx.path_filters
+        return [all(path_filter(path) for path_filter in filters) for path in self.candidates]
+
+    def check_plan(self) -> None:
+        """Raise RestartRequired when the inputs now yield different templates or copies."""
+        plan = collect_plan(self.ctx)
+        if plan.jobs != self.plan.jobs or plan.copies != self.plan.copies:
+            raise RestartRequired("the set of rendered templates changed")
+
+    def templates_changed(
+        self, paths: list[Path]
+    ) -> tuple[list[RenderJob], list[tuple[Path, Path]]]:
+        """The templates to render and files to copy after paths below the inputs changed."""
+        known = self.jobs.keys() | self.copies.keys()
+        if any(path not in known or not path.is_file() for path in paths):
+            # A new or removed file, a partial or an editor's temporary file
+            self.check_plan()
+
+        names = {
+            path.relative_to(root).as_posix()
+            for path in paths
+            for root in self.roots
+            if path.is_relative_to(root)
+        }
+        jobs = [self.jobs[path] for path in paths if path in self.jobs]
+        for job in self.plan.jobs:
+            entry = self.manifest.entries.get(str(job.input_path))
+            if entry is not None and not names.isdisjoint(entry.get("partials", {})):
+                jobs.append(job)
+        copies = [self.copies[path] for path in paths if path in self.copies]
+        return list(dict.fromkeys(jobs)), copies
+
+    def rebuild(
+        self, jobs: list[RenderJob], copies: list[tuple[Path, Path]]
+    ) -> tuple[Counter[str], list[str]]:
+        """Render jobs with the resident context and write what changed. Returns writes and errors.
+
+        A template that fails loses its manifest entry, so the next incremental render retries it.
+        """
+        writes: Counter[str] = Counter()
+        errors: list[str] = []
+        secrets: list[tuple[RenderJob, str, set[str]]] = []
+        stale: dict[RenderJob, str] = {}
+        for job in jobs:
+            source_digest = digest_bytes(job.input_path.read_bytes())
+            try:
+                rendered, reads = render_job(self.ctx, job)
+            except Exception as e:
+                self.manifest.entries.pop(str(job.input_path), None)
+                errors.append(describe_error(e, job.template_name))
+                continue
+
+            if self.options.encrypt and is_secret(job) and rendered.strip():
+                secrets.append((job, rendered, reads))
+                stale[job] = source_digest
+                continue
+            status = write_output(self.ctx, job, rendered)
+            writes[status] += 1
+            self.manifest.record(
+                self.ctx, job, source_digest, reads, None if status == EMPTY else rendered
+            )
+
+        for source, output in copies:
+            writes[copy_output(source, output)] += 1
+
+        if secrets:
+            for result in encrypt_outputs(self.ctx, secrets, self.manifest, stale, writes):
+                self.manifest.entries.pop(
+                    next(str(job.input_path) for job in stale if job.output_path == result.path),
+                    None,
+                )
+                errors.append(f"{relative_name(result.path)}: {result.output or 'sops failed'}")
+
+        self.manifest.save()
+        return writes, errors
+
+    def report(
+        self,
+        cause: str,
+        rendered: int,
+        writes: Counter[str],
+        errors: list[str],
+        elapsed: float | None = None,
+    ) -> None:
+        summary = (
+            f"[{time.strftime('%H:%M:%S')}] {cause}: rendered {rendered} templates, "
+            f"wrote {writes[WRITTEN]} files ({writes[UNCHANGED]} unchanged)"
+        )
+        if elapsed is not None:
+            summary += f" in {elapsed * 1000:.0f}ms"
+        print(summary, flush=True)
+        for error in errors:
+            print(f"  - {error}", file=sys.stderr, flush=True)
+
+
+def _display(path: Path) -> Path:
+    cwd = Path.cwd()
+    return path.relative_to(cwd) if path.is_relative_to(cwd) else path
+
+
+def restart(reason: str) -> None:
+    """Replace this process with a fresh one that starts over with the full render."""
+    print(f"Restarting: {reason}", flush=True)
+    os.execv(sys.executable, [sys.executable, *sys.argv])
+
+
+def print_failure(error: Exception) -> None:
+    message = describe_error(error)
+    if isinstance(error, SchemaValidationError):
+        for violation in error.errors:
+            print(f"  - {violation}", file=sys.stderr)
+        message = str(error)
+    elif isinstance(error, EncryptionError):
+        for result in error.failures:
+            print(f"  - {result.path}: {result.output or 'sops failed'}", file=sys.stderr)
+        message = str(error)
+    print(f"Error: {message}", file=sys.stderr, flush=True)
+
+
+def watch(config: Config, config_file: Path, options: RenderOptions) -> int:
+    """Render once, then re-render on every change until interrupted."""
+    try:
+        render(config, options)
+        session = WatchSession(config, config_file, options)
+    except (SchemaValidationError, EncryptionError) as e:
+        print_failure(e)
+        return 1
+
+    watcher = open_watcher(session.trees, session.files)
+    print(
+        f"Watching {len(session.plan.jobs)} templates with {type(watcher).__name__} "
+        "(Ctrl-C to stop)",
+        flush=True,
+    )
+    while True:
+        changed = watcher.wait()
+        if changed is None:
+            restart("file events were lost")
+        try:
+            session.handle(changed)
+        except RestartRequired as e:
+            restart(str(e))
+        except Exception as e:
+            # Keep watching; the next save usually fixes it
+            print_failure(e)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Render templates, then re-render the affected outputs on every change"
+    )
+    parser.add_argument(
+        "--config",
+        type=Path,
+        default=DEFAULT_CONFIG_FILE,
+        help="Path to makejinja.toml (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+        help="Directory for the render manifest and bytecode cache (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=0,
+        help="Worker processes for the initial render, 0 for one per CPU (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--bytecode-cache-mb",
+        type=int,
+        default=DEFAULT_BYTECODE_CACHE_MB,
+        help="Size limit of the compiled template cache in MiB, 0 disables it (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Validate cluster.yaml and nodes.yaml against the JSON Schemas on every reload",
+    )
+    parser.add_argument(
+        "--encrypt",
+        action="store_true",
+        help="Encrypt *.sops.* outputs with SOPS in memory and write only the ciphertext",
+    )
+    parser.add_argument(
+        "--quiet",
+        "-q",
+        action="store_true",
+        help="Suppress makejinja log output of the initial render",
+    )
+    args = parser.parse_args()
+
+    if not args.config.is_file():
+        print(f"Error: Config file not found: {args.config}", file=sys.stderr)
+        return 1
+    if args.encrypt and not DEFAULT_AGE_KEY.is_file():
+        print(f"Error: --encrypt needs the age key at {DEFAULT_AGE_KEY}", file=sys.stderr)
+        return 1
+
+    options = RenderOptions(
+        incremental=True,
+        jobs=args.jobs,
+        cache_dir=args.cache_dir,
+        bytecode_cache_mb=args.bytecode_cache_mb,
+        validate=args.validate,
+        encrypt=args.encrypt,
+    )
+    config = load_config(args.config)
+    if args.quiet:
+        config = attrs.evolve(config, quiet=True)
+    try:
+        return watch(config, args.config, options)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
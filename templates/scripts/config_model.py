@@ -0,0 +1,904 @@
+"""
+Config classes generated from cluster.schema.cue and nodes.schema.cue.
+
+Generated by .taskfiles/template/resources/generate_jsonschema.py, do not edit.
+"""
+
+from __future__ import annotations
+
+from typing import Any, ClassVar
+
+from model import ConfigModel, config_model
+
+
+@config_model
+class ProxmoxHost(ConfigModel):
+    """#Config.proxmox_hosts[]"""
+
+    name: str
+    cores: int
+    memory: int
+    disk: int
+
+
+@config_model
+class ProxmoxVmDefaults(ConfigModel):
+    """#Config.proxmox_vm_defaults"""
+
+    DEFAULTS: ClassVar[dict[str, Any]] = {
+        "cores": 4,
+        "sockets": 1,
+        "memory": 8192,
+        "disk_size": 128,
+    }
+
+    cores: int
+    sockets: int
+    memory: int
+    disk_size: int
+
+
+@config_model
+class ProxmoxVmControllerDefaults(ConfigModel):
+    """#Config.proxmox_vm_controller_defaults"""
+
+    DEFAULTS: ClassVar[dict[str, Any]] = {
+        "cores": 4,
+        "sockets": 1,
+        "memory": 8192,
+        "disk_size": 64,
+    }
+
+    cores: int
+    sockets: int
+    memory: int
+    disk_size: int
+
+
+@config_model
+class ProxmoxVmWorkerDefaults(ConfigModel):
+    """#Config.proxmox_vm_worker_defaults"""
+
+    DEFAULTS: ClassVar[dict[str, Any]] = {
+        "cores": 8,
+        "sockets": 1,
+        "memory": 16384,
+        "disk_size": 256,
+    }
+
+    cores: int
+    sockets: int
+    memory: int
+    disk_size: int
+
+
+@config_model
+class ProxmoxVmAdvanced(ConfigModel):
+    """#Config.proxmox_vm_advanced"""
+
+    DEFAULTS: ClassVar[dict[str, Any]] = {
+        "bios": "ovmf",
+        "machine": "q35",
+        "cpu_type": "host",
+        "scsi_hw": "virtio-scsi-pci",
+        "balloon": 0,
+        "numa": True,
+        "qemu_agent": True,
+        "net_queues": 4,
+        "disk_discard": True,
+        "disk_ssd": True,
+        "tags": ["kubernetes", "linux", "talos"],
+        "network_bridge": "vmbr0",
+        "ostype": "l26",
+        "disk_backup": False,
+        "disk_replicate": False,
+    }
+
+    bios: str
+    machine: str
+    cpu_type: str
+    scsi_hw: str
+    balloon: int
+    numa: bool
+    qemu_agent: bool
+    net_queues: int
+    disk_discard: bool
+    disk_ssd: bool
+    tags: list[str]
+    network_bridge: str
+    ostype: str
+    disk_backup: bool
+    disk_replicate: bool
+
+
+@config_model
+class OidcAdditionalClaim(ConfigModel):
+    """#Config.oidc_additional_claims[]"""
+
+    name: str
+    header: str
+
+
+@config_model
+class KeycloakRealmRole(ConfigModel):
+    """#Config.keycloak_realm_roles[]"""
+
+    name: str
+    description: str
+
+
+@config_model
+class KeycloakRealmGroupSubgroup(ConfigModel):
+    """#Config.keycloak_realm_groups[].subgroups[]"""
+
+    name: str
+    realm_roles: list[str]
+
+
+@config_model
+class KeycloakRealmGroup(ConfigModel):
+    """#Config.keycloak_realm_groups[]"""
+
+    NESTED: ClassVar[dict[str, tuple[type[ConfigModel], bool]]] = {
+        "subgroups": (KeycloakRealmGroupSubgroup, True),
+    }
+
+    name: str
+    description: str
+    realm_roles: list[str]
+    subgroups: list[KeycloakRealmGroupSubgroup]
+
+
+@config_model
+class GoogleDomainRoleMapping(ConfigModel):
+    """#Config.google_domain_role_mapping"""
+
+    domain: str
+    role: str
+
+
+@config_model
+class GithubOrgRoleMapping(ConfigModel):
+    """#Config.github_org_role_mapping"""
+
+    org: str
+    role: str
+
+
+@config_model
+class MicrosoftGroupRoleMapping(ConfigModel):
+    """#Config.microsoft_group_role_mappings[]"""
+
+    group_id: str
+    role: str
+
+
+@config_model
+class Node(ConfigModel):
+    """#Config.nodes[]"""
+
+    name: str
+    address: str
+    controller: bool
+    disk: str
+    mac_addr: str
+    schematic_id: str
+    mtu: int
+    secureboot: bool
+    encrypt_disk: bool
+    kernel_modules: list[str]
+    vm_id: int
+    vm_cores: int
+    vm_sockets: int
+    vm_memory: int
+    vm_disk_size: int
+    vm_startup_order: int
+    vm_startup_delay: int
+    vm_shutdown_delay: int
+
+
+@config_model
+class Cluster(ConfigModel):
+    """#Config"""
+
+    DEFAULTS: ClassVar[dict[str, Any]] = {
+        "proxmox_vlan_mode": False,
+        "cluster_pod_cidr": "10.42.0.0/16",
+        "cluster_svc_cidr": "10.43.0.0/16",
+        "repository_visibility": "public",
+        "cilium_loadbalancer_mode": "dsr",
+        "cilium_bgp_hold_time": 30,
+        "cilium_bgp_keepalive_time": 10,
+        "cilium_bgp_graceful_restart": False,
+        "cilium_bgp_graceful_restart_time": 120,
+        "cilium_bgp_ecmp_max_paths": 3,
+        "unifi_site": "default",
+        "unifi_external_controller": False,
+        "talos_version": "1.12.0",
+        "kubernetes_version": "1.35.0",
+        "backup_s3_region": "us-east-1",
+        "proxmox_csi_enabled": False,
+        "proxmox_region": "pve",
+        "proxmox_ccm_enabled": False,
+        "proxmox_iso_storage": "local",
+        "proxmox_disk_storage": "local-lvm",
+        "tfstate_username": "terraform",
+        "monitoring_enabled": False,
+        "monitoring_stack": "prometheus",
+        "hubble_enabled": False,
+        "hubble_ui_enabled": False,
+        "grafana_subdomain": "grafana",
+        "grafana_admin_user": "admin",
+        "metrics_retention": "7d",
+        "metrics_storage_size": "50Gi",
+        "storage_class": "local-path",
+        "monitoring_alerts_enabled": True,
+        "node_memory_threshold": 90,
+        "node_cpu_threshold": 90,
+        "loki_enabled": False,
+        "logs_retention": "7d",
+        "logs_storage_size": "50Gi",
+        "tracing_enabled": False,
+        "tracing_sample_rate": 10,
+        "trace_retention": "72h",
+        "trace_storage_size": "10Gi",
+        "cluster_name": "matherlynet",
+        "observability_namespace": "monitoring",
+        "environment": "production",
+        "oidc_provider_name": "keycloak",
+        "oidc_sso_enabled": False,
+        "oidc_cookie_samesite": "Lax",
+        "oidc_refresh_token": True,
+        "oidc_logout_path": "/logout",
+        "volsync_enabled": False,
+        "volsync_schedule": "0 */6 * * *",
+        "volsync_copy_method": "Clone",
+        "volsync_retain_daily": 7,
+        "volsync_retain_weekly": 4,
+        "volsync_retain_monthly": 3,
+        "external_secrets_enabled": False,
+        "external_secrets_provider": "1password",
+        "network_policies_enabled": False,
+        "network_policies_mode": "audit",
+        "rustfs_enabled": False,
+        "rustfs_subdomain": "rustfs",
+        "rustfs_replicas": 1,
+        "rustfs_data_volume_size": "20Gi",
+        "rustfs_log_volume_size": "1Gi",
+        "rustfs_access_key": "rustfsadmin",
+        "rustfs_buffer_profile": "DataAnalytics",
+        "cnpg_enabled": False,
+        "cnpg_postgres_image": "ghcr.io/cloudnative-pg/postgresql:18.1-standard-trixie",
+        "cnpg_priority_class": "system-cluster-critical",
+        "cnpg_control_plane_only": True,
+        "cnpg_backup_enabled": False,
+        "cnpg_pgvector_enabled": False,
+        "cnpg_pgvector_image": "ghcr.io/cloudnative-pg/pgvector:0.8.1-18-trixie",
+        "cnpg_pgvector_version": "0.8.1",
+        "cnpg_barman_plugin_enabled": False,
+        "cnpg_barman_plugin_version": "0.10.0",
+        "cnpg_barman_plugin_log_level": "info",
+        "keycloak_enabled": False,
+        "keycloak_subdomain": "auth",
+        "keycloak_realm": "matherlynet",
+        "keycloak_db_mode": "embedded",
+        "keycloak_db_user": "keycloak",
+        "keycloak_db_name": "keycloak",
+        "keycloak_storage_size": "5Gi",
+        "keycloak_replicas": 1,
+        "keycloak_db_instances": 1,
+        "keycloak_operator_version": "26.5.0",
+        "keycloak_backup_schedule": "0 2 * * *",
+        "keycloak_backup_retention_days": 7,
+        "keycloak_tracing_enabled": False,
+        "keycloak_tracing_sample_rate": "0.1",
+        "keycloak_smtp_port": "587",
+        "keycloak_smtp_starttls": True,
+        "keycloak_smtp_ssl": False,
+        "keycloak_smtp_auth": False,
+        "keycloak_config_cli_version": "6.4.0-26.1.0",
+        "headlamp_pkce_method": "",
+        "keycloak_config_version": 1,
+        "keycloak_monitoring_enabled": False,
+        "rustfs_monitoring_enabled": False,
+        "loki_monitoring_enabled": False,
+        "grafana_oidc_enabled": False,
+        "google_idp_enabled": False,
+        "github_idp_enabled": False,
+        "microsoft_idp_enabled": False,
+        "microsoft_tenant_id": "common",
+        "litellm_enabled": False,
+        "litellm_subdomain": "litellm",
+        "litellm_replicas": 1,
+        "litellm_db_user": "litellm",
+        "litellm_db_name": "litellm",
+        "litellm_db_instances": 1,
+        "litellm_storage_size": "10Gi",
+        "litellm_oidc_enabled": False,
+        "litellm_backup_enabled": False,
+        "litellm_monitoring_enabled": False,
+        "litellm_tracing_enabled": False,
+        "litellm_langfuse_enabled": False,
+        "litellm_alerting_enabled": False,
+        "litellm_alerting_threshold": 300,
+        "litellm_guardrails_enabled": False,
+        "litellm_presidio_enabled": False,
+        "litellm_prompt_injection_check": False,
+        "azure_openai_us_east_api_version": "2025-01-01-preview",
+        "azure_openai_us_east2_api_version": "2025-04-01-preview",
+        "dragonfly_enabled": False,
+        "dragonfly_version": "v1.36.0",
+        "dragonfly_operator_version": "1.3.1",
+        "dragonfly_replicas": 1,
+        "dragonfly_maxmemory": "512mb",
+        "dragonfly_threads": 2,
+        "dragonfly_control_plane_only": False,
+        "dragonfly_cpu_request": "100m",
+        "dragonfly_memory_request": "256Mi",
+        "dragonfly_memory_limit": "1Gi",
+        "dragonfly_cache_mode": False,
+        "dragonfly_slowlog_threshold": 10000,
+        "dragonfly_slowlog_max_len": 128,
+        "dragonfly_backup_enabled": False,
+        "dragonfly_s3_endpoint": "rustfs-svc.storage.svc.cluster.local:9000",
+        "dragonfly_snapshot_cron": "0 */6 * * *",
+        "dragonfly_monitoring_enabled": False,
+        "dragonfly_acl_enabled": False,
+        "langfuse_enabled": False,
+        "langfuse_subdomain": "langfuse",
+        "langfuse_postgres_instances": 1,
+        "langfuse_postgres_storage": "10Gi",
+        "langfuse_clickhouse_storage": "20Gi",
+        "langfuse_clickhouse_replicas": 1,
+        "langfuse_clickhouse_cluster_enabled": False,
+        "langfuse_media_bucket": "langfuse-media",
+        "langfuse_export_bucket": "langfuse-exports",
+        "langfuse_batch_export_enabled": True,
+        "langfuse_backup_enabled": False,
+        "langfuse_sso_enabled": False,
+        "langfuse_monitoring_enabled": False,
+        "langfuse_tracing_enabled": False,
+        "langfuse_log_level": "info",
+        "langfuse_log_format": "text",
+        "langfuse_trace_sampling_ratio": "0.1",
+        "langfuse_web_replicas": 1,
+        "langfuse_worker_replicas": 1,
+        "langfuse_chart_version": "*",
+        "langfuse_disable_password_auth": False,
+        "langfuse_session_max_age": 2592000,
+        "langfuse_init_user_name": "Admin",
+        "langfuse_disable_signup": False,
+        "langfuse_default_org_role": "VIEWER",
+        "langfuse_scim_sync_enabled": False,
+        "langfuse_scim_sync_schedule": "*/5 * * * *",
+        "langfuse_sync_keycloak_client_id": "langfuse-sync",
+        "obot_enabled": False,
+        "obot_subdomain": "obot",
+        "obot_version": "0.2.33",
+        "obot_replicas": 1,
+        "obot_cpu_request": "500m",
+        "obot_cpu_limit": "2000m",
+        "obot_memory_request": "1Gi",
+        "obot_memory_limit": "4Gi",
+        "obot_postgres_user": "obot",
+        "obot_postgres_db": "obot",
+        "obot_postgresql_replicas": 1,
+        "obot_postgresql_storage_size": "10Gi",
+        "obot_storage_size": "20Gi",
+        "obot_workspace_provider": "directory",
+        "obot_s3_bucket": "obot-workspaces",
+        "obot_s3_endpoint": "http://rustfs-svc.storage.svc.cluster.local:9000",
+        "obot_s3_region": "us-east-1",
+        "obot_encryption_provider": "custom",
+        "obot_allowed_email_domains": "*",
+        "obot_keycloak_enabled": False,
+        "obot_keycloak_client_id": "obot",
+        "obot_mcp_namespace": "obot-mcp",
+        "obot_mcp_cpu_requests_quota": "4",
+        "obot_mcp_cpu_limits_quota": "8",
+        "obot_mcp_memory_requests_quota": "8Gi",
+        "obot_mcp_memory_limits_quota": "16Gi",
+        "obot_mcp_max_pods": "20",
+        "obot_mcp_default_cpu_request": "100m",
+        "obot_mcp_default_cpu_limit": "500m",
+        "obot_mcp_default_memory_request": "256Mi",
+        "obot_mcp_default_memory_limit": "512Mi",
+        "obot_mcp_max_cpu": "1000m",
+        "obot_mcp_max_memory": "1Gi",
+        "obot_monitoring_enabled": False,
+        "obot_tracing_enabled": False,
+        "obot_otel_sample_prob": "0.1",
+        "obot_litellm_enabled": False,
+        "mcp_context_forge_enabled": False,
+        "mcp_context_forge_subdomain": "mcp",
+        "mcp_context_forge_version": "1.0.0-BETA-1",
+        "mcp_context_forge_replicas": 1,
+        "mcp_context_forge_cpu_request": "100m",
+        "mcp_context_forge_cpu_limit": "1000m",
+        "mcp_context_forge_memory_request": "512Mi",
+        "mcp_context_forge_memory_limit": "1Gi",
+        "mcp_context_forge_db_user": "mcpgateway",
+        "mcp_context_forge_db_name": "mcpgateway",
+        "mcp_context_forge_db_instances": 1,
+        "mcp_context_forge_storage_size": "10Gi",
+        "mcp_context_forge_keycloak_enabled": False,
+        "mcp_context_forge_keycloak_client_id": "mcp-context-forge",
+        "mcp_context_forge_dcr_enabled": True,
+        "mcp_context_forge_dcr_allowed_issuers": [],
+        "mcp_context_forge_dcr_default_scopes": "mcp:read",
+        "mcp_context_forge_backup_enabled": False,
+        "mcp_context_forge_monitoring_enabled": False,
+        "mcp_context_forge_tracing_enabled": False,
+        "mcp_context_forge_tracing_sample_rate": "0.1",
+        "mcp_context_forge_internal_observability_enabled": True,
+        "mcp_context_forge_internal_observability_sample_rate": "0.1",
+        "mcp_context_forge_plugins_enabled": True,
+        "mcp_context_forge_passthrough_enabled": False,
+        "mcp_context_forge_passthrough_headers": "[\"X-Trace-Id\", \"X-Span-Id\", \"X-Request-Id\"]",
+        "mcp_context_forge_passthrough_source": "env",
+        "mcp_context_forge_hyprmcp_enabled": False,
+        "headlamp_enabled": False,
+        "headlamp_hostname": "headlamp",
+        "headlamp_version": "0.39.0",
+        "headlamp_chart_version": "0.39.0",
+        "headlamp_replicas": 2,
+        "headlamp_oidc_client_id": "headlamp",
+        "kubernetes_oidc_enabled": False,
+        "kubernetes_oidc_client_id": "kubernetes",
+        "kubernetes_oidc_username_claim": "email",
+        "kubernetes_oidc_username_prefix": "oidc:",
+        "kubernetes_oidc_groups_claim": "groups",
+        "kubernetes_oidc_groups_prefix": "oidc:",
+        "kubernetes_oidc_signing_algs": "RS256",
+    }
+    NESTED: ClassVar[dict[str, tuple[type[ConfigModel], bool]]] = {
+        "proxmox_hosts": (ProxmoxHost, True),
+        "proxmox_vm_defaults": (ProxmoxVmDefaults, False),
+        "proxmox_vm_controller_defaults": (ProxmoxVmControllerDefaults, False),
+        "proxmox_vm_worker_defaults": (ProxmoxVmWorkerDefaults, False),
+        "proxmox_vm_advanced": (ProxmoxVmAdvanced, False),
+        "oidc_additional_claims": (OidcAdditionalClaim, True),
+        "keycloak_realm_roles": (KeycloakRealmRole, True),
+        "keycloak_realm_groups": (KeycloakRealmGroup, True),
+        "google_domain_role_mapping": (GoogleDomainRoleMapping, False),
+        "github_org_role_mapping": (GithubOrgRoleMapping, False),
+        "microsoft_group_role_mappings": (MicrosoftGroupRoleMapping, True),
+        "nodes": (Node, True),
+    }
+
+    node_cidr: str
+    node_dns_servers: list[str]
+    node_ntp_servers: list[str]
+    node_default_gateway: str
+    node_vlan_tag: str
+    proxmox_vlan_mode: bool
+    cluster_pod_cidr: str
+    cluster_svc_cidr: str
+    cluster_api_addr: str
+    cluster_api_tls_sans: list[str]
+    cluster_gateway_addr: str
+    cluster_dns_gateway_addr: str
+    repository_name: str
+    repository_branch: str
+    repository_visibility: str
+    cloudflare_domain: str
+    cloudflare_token: str
+    cloudflare_gateway_addr: str
+    cilium_loadbalancer_mode: str
+    cilium_bgp_router_addr: str
+    cilium_bgp_router_asn: str
+    cilium_bgp_node_asn: str
+    cilium_lb_pool_cidr: str
+    cilium_bgp_hold_time: int
+    cilium_bgp_keepalive_time: int
+    cilium_bgp_graceful_restart: bool
+    cilium_bgp_graceful_restart_time: int
+    cilium_bgp_ecmp_max_paths: int
+    cilium_bgp_password: str
+    unifi_host: str
+    unifi_api_key: str
+    unifi_site: str
+    unifi_external_controller: bool
+    talos_version: str
+    kubernetes_version: str
+    backup_s3_endpoint: str
+    backup_s3_bucket: str
+    backup_s3_access_key: str
+    backup_s3_secret_key: str
+    backup_s3_region: str
+    backup_age_public_key: str
+    proxmox_csi_enabled: bool
+    proxmox_endpoint: str
+    proxmox_csi_token_id: str
+    proxmox_csi_token_secret: str
+    proxmox_csi_storage: str
+    proxmox_region: str
+    proxmox_ccm_enabled: bool
+    proxmox_ccm_token_id: str
+    proxmox_ccm_token_secret: str
+    proxmox_api_url: str
+    proxmox_node: str
+    proxmox_hosts: list[ProxmoxHost]
+    proxmox_iso_storage: str
+    proxmox_disk_storage: str
+    proxmox_vm_defaults: ProxmoxVmDefaults
+    proxmox_vm_controller_defaults: ProxmoxVmControllerDefaults
+    proxmox_vm_worker_defaults: ProxmoxVmWorkerDefaults
+    proxmox_vm_advanced: ProxmoxVmAdvanced
+    proxmox_api_token_id: str
+    proxmox_api_token_secret: str
+    cf_account_id: str
+    tfstate_username: str
+    tfstate_password: str
+    monitoring_enabled: bool
+    monitoring_stack: str
+    hubble_enabled: bool
+    hubble_ui_enabled: bool
+    grafana_subdomain: str
+    grafana_admin_user: str
+    grafana_admin_password: str
+    metrics_retention: str
+    metrics_storage_size: str
+    storage_class: str
+    monitoring_alerts_enabled: bool
+    node_memory_threshold: int
+    node_cpu_threshold: int
+    loki_enabled: bool
+    logs_retention: str
+    logs_storage_size: str
+    tracing_enabled: bool
+    tracing_sample_rate: int
+    trace_retention: str
+    trace_storage_size: str
+    cluster_name: str
+    observability_namespace: str
+    environment: str
+    oidc_provider_name: str
+    oidc_issuer_url: str
+    oidc_jwks_uri: str
+    oidc_additional_claims: list[OidcAdditionalClaim]
+    oidc_sso_enabled: bool
+    oidc_client_id: str
+    oidc_client_secret: str
+    oidc_redirect_url: str
+    oidc_cookie_domain: str
+    oidc_cookie_samesite: str
+    oidc_refresh_token: bool
+    oidc_logout_path: str
+    oidc_scopes: list[str]
+    volsync_enabled: bool
+    volsync_s3_endpoint: str
+    volsync_s3_bucket: str
+    volsync_restic_password: str
+    volsync_schedule: str
+    volsync_copy_method: str
+    volsync_retain_daily: int
+    volsync_retain_weekly: int
+    volsync_retain_monthly: int
+    external_secrets_enabled: bool
+    external_secrets_provider: str
+    onepassword_connect_host: str
+    network_policies_enabled: bool
+    network_policies_mode: str
+    rustfs_enabled: bool
+    rustfs_subdomain: str
+    rustfs_replicas: int
+    rustfs_data_volume_size: str
+    rustfs_log_volume_size: str
+    rustfs_storage_class: str
+    rustfs_access_key: str
+    rustfs_secret_key: str
+    rustfs_buffer_profile: str
+    loki_s3_access_key: str
+    loki_s3_secret_key: str
+    cnpg_enabled: bool
+    cnpg_postgres_image: str
+    cnpg_storage_class: str
+    cnpg_priority_class: str
+    cnpg_control_plane_only: bool
+    cnpg_backup_enabled: bool
+    cnpg_s3_access_key: str
+    cnpg_s3_secret_key: str
+    cnpg_pgvector_enabled: bool
+    cnpg_pgvector_image: str
+    cnpg_pgvector_version: str
+    cnpg_barman_plugin_enabled: bool
+    cnpg_barman_plugin_version: str
+    cnpg_barman_plugin_log_level: str
+    keycloak_enabled: bool
+    keycloak_subdomain: str
+    keycloak_realm: str
+    keycloak_admin_password: str
+    keycloak_db_mode: str
+    keycloak_db_user: str
+    keycloak_db_password: str
+    keycloak_db_name: str
+    keycloak_storage_size: str
+    keycloak_replicas: int
+    keycloak_db_instances: int
+    keycloak_operator_version: str
+    keycloak_s3_access_key: str
+    keycloak_s3_secret_key: str
+    keycloak_backup_schedule: str
+    keycloak_backup_retention_days: int
+    keycloak_tracing_enabled: bool
+    keycloak_tracing_sample_rate: str
+    keycloak_smtp_host: str
+    keycloak_smtp_port: str
+    keycloak_smtp_from: str
+    keycloak_smtp_from_display_name: str
+    keycloak_smtp_reply_to: str
+    keycloak_smtp_reply_to_display_name: str
+    keycloak_smtp_envelope_from: str
+    keycloak_smtp_starttls: bool
+    keycloak_smtp_ssl: bool
+    keycloak_smtp_auth: bool
+    keycloak_smtp_user: str
+    keycloak_smtp_password: str
+    keycloak_config_cli_version: str
+    headlamp_pkce_method: str
+    keycloak_config_version: int
+    keycloak_realm_roles: list[KeycloakRealmRole]
+    keycloak_realm_groups: list[KeycloakRealmGroup]
+    keycloak_events_retention_days: int
+    keycloak_monitoring_enabled: bool
+    rustfs_monitoring_enabled: bool
+    loki_monitoring_enabled: bool
+    grafana_oidc_enabled: bool
+    grafana_oidc_client_secret: str
+    google_idp_enabled: bool
+    google_client_id: str
+    google_client_secret: str
+    github_idp_enabled: bool
+    github_client_id: str
+    github_client_secret: str
+    microsoft_idp_enabled: bool
+    microsoft_client_id: str
+    microsoft_client_secret: str
+    microsoft_tenant_id: str
+    google_default_role: str
+    google_domain_role_mapping: GoogleDomainRoleMapping
+    github_default_role: str
+    github_org_role_mapping: GithubOrgRoleMapping
+    microsoft_default_role: str
+    microsoft_group_role_mappings: list[MicrosoftGroupRoleMapping]
+    litellm_enabled: bool
+    litellm_subdomain: str
+    litellm_replicas: int
+    litellm_master_key: str
+    litellm_salt_key: str
+    litellm_db_user: str
+    litellm_db_password: str
+    litellm_db_name: str
+    litellm_db_instances: int
+    litellm_storage_size: str
+    litellm_oidc_enabled: bool
+    litellm_oidc_client_secret: str
+    litellm_backup_enabled: bool
+    litellm_s3_access_key: str
+    litellm_s3_secret_key: str
+    litellm_monitoring_enabled: bool
+    litellm_tracing_enabled: bool
+    litellm_langfuse_enabled: bool
+    litellm_langfuse_host: str
+    litellm_langfuse_public_key: str
+    litellm_langfuse_secret_key: str
+    litellm_alerting_enabled: bool
+    litellm_slack_webhook_url: str
+    litellm_discord_webhook_url: str
+    litellm_alerting_threshold: int
+    litellm_guardrails_enabled: bool
+    litellm_presidio_enabled: bool
+    litellm_prompt_injection_check: bool
+    azure_openai_us_east_api_key: str
+    azure_openai_us_east_resource_name: str
+    azure_openai_us_east_api_version: str
+    azure_openai_us_east2_api_key: str
+    azure_openai_us_east2_resource_name: str
+    azure_openai_us_east2_api_version: str
+    azure_anthropic_api_key: str
+    azure_anthropic_api_base: str
+    azure_cohere_embed_api_key: str
+    azure_cohere_embed_api_base: str
+    azure_cohere_rerank_api_key: str
+    azure_cohere_rerank_api_base: str
+    azure_openai_realtime_api_base: str
+    dragonfly_enabled: bool
+    dragonfly_version: str
+    dragonfly_operator_version: str
+    dragonfly_replicas: int
+    dragonfly_maxmemory: str
+    dragonfly_threads: int
+    dragonfly_password: str
+    dragonfly_control_plane_only: bool
+    dragonfly_cpu_request: str
+    dragonfly_memory_request: str
+    dragonfly_memory_limit: str
+    dragonfly_cache_mode: bool
+    dragonfly_slowlog_threshold: int
+    dragonfly_slowlog_max_len: int
+    dragonfly_backup_enabled: bool
+    dragonfly_s3_endpoint: str
+    dragonfly_s3_access_key: str
+    dragonfly_s3_secret_key: str
+    dragonfly_snapshot_cron: str
+    dragonfly_monitoring_enabled: bool
+    dragonfly_acl_enabled: bool
+    dragonfly_keycloak_password: str
+    dragonfly_appcache_password: str
+    dragonfly_litellm_password: str
+    dragonfly_langfuse_password: str
+    langfuse_enabled: bool
+    langfuse_subdomain: str
+    langfuse_nextauth_secret: str
+    langfuse_salt: str
+    langfuse_encryption_key: str
+    langfuse_postgres_password: str
+    langfuse_postgres_instances: int
+    langfuse_postgres_storage: str
+    langfuse_clickhouse_password: str
+    langfuse_clickhouse_storage: str
+    langfuse_clickhouse_replicas: int
+    langfuse_clickhouse_cluster_enabled: bool
+    langfuse_s3_access_key: str
+    langfuse_s3_secret_key: str
+    langfuse_s3_concurrent_writes: int
+    langfuse_s3_concurrent_reads: int
+    langfuse_media_bucket: str
+    langfuse_export_bucket: str
+    langfuse_media_max_size: int
+    langfuse_media_download_url_expiry: int
+    langfuse_batch_export_enabled: bool
+    langfuse_backup_enabled: bool
+    langfuse_backup_s3_access_key: str
+    langfuse_backup_s3_secret_key: str
+    langfuse_sso_enabled: bool
+    langfuse_keycloak_client_secret: str
+    langfuse_monitoring_enabled: bool
+    langfuse_tracing_enabled: bool
+    langfuse_log_level: str
+    langfuse_log_format: str
+    langfuse_trace_sampling_ratio: str
+    langfuse_web_replicas: int
+    langfuse_worker_replicas: int
+    langfuse_chart_version: str
+    langfuse_cache_api_key_enabled: bool
+    langfuse_cache_api_key_ttl: int
+    langfuse_cache_prompt_enabled: bool
+    langfuse_cache_prompt_ttl: int
+    langfuse_disable_password_auth: bool
+    langfuse_sso_domain_enforcement: str
+    langfuse_smtp_url: str
+    langfuse_email_from: str
+    langfuse_session_max_age: int
+    langfuse_init_org_id: str
+    langfuse_init_org_name: str
+    langfuse_init_user_email: str
+    langfuse_init_user_password: str
+    langfuse_init_user_name: str
+    langfuse_disable_signup: bool
+    langfuse_init_project_id: str
+    langfuse_init_project_name: str
+    langfuse_init_project_retention: int
+    langfuse_init_project_public_key: str
+    langfuse_init_project_secret_key: str
+    langfuse_default_org_id: str
+    langfuse_default_org_role: str
+    langfuse_default_project_id: str
+    langfuse_default_project_role: str
+    langfuse_scim_sync_enabled: bool
+    langfuse_scim_sync_schedule: str
+    langfuse_scim_public_key: str
+    langfuse_scim_secret_key: str
+    langfuse_sync_keycloak_client_id: str
+    langfuse_sync_keycloak_client_secret: str
+    langfuse_role_mapping: dict[str, str]
+    obot_enabled: bool
+    obot_subdomain: str
+    obot_version: str
+    obot_replicas: int
+    obot_cpu_request: str
+    obot_cpu_limit: str
+    obot_memory_request: str
+    obot_memory_limit: str
+    obot_db_password: str
+    obot_postgres_user: str
+    obot_postgres_db: str
+    obot_postgresql_replicas: int
+    obot_postgresql_storage_size: str
+    obot_storage_size: str
+    obot_storage_class: str
+    obot_workspace_provider: str
+    obot_s3_bucket: str
+    obot_s3_endpoint: str
+    obot_s3_region: str
+    obot_workspace_s3_access_key: str
+    obot_workspace_s3_secret_key: str
+    obot_encryption_provider: str
+    obot_encryption_key: str
+    obot_bootstrap_token: str
+    obot_admin_emails: str
+    obot_owner_emails: str
+    obot_allowed_email_domains: str
+    obot_keycloak_enabled: bool
+    obot_keycloak_client_id: str
+    obot_keycloak_client_secret: str
+    obot_keycloak_cookie_secret: str
+    obot_keycloak_allowed_groups: str
+    obot_keycloak_allowed_roles: str
+    obot_entra_tenant_id: str
+    obot_entra_client_id: str
+    obot_entra_client_secret: str
+    obot_mcp_namespace: str
+    obot_mcp_cpu_requests_quota: str
+    obot_mcp_cpu_limits_quota: str
+    obot_mcp_memory_requests_quota: str
+    obot_mcp_memory_limits_quota: str
+    obot_mcp_max_pods: str
+    obot_mcp_default_cpu_request: str
+    obot_mcp_default_cpu_limit: str
+    obot_mcp_default_memory_request: str
+    obot_mcp_default_memory_limit: str
+    obot_mcp_max_cpu: str
+    obot_mcp_max_memory: str
+    obot_s3_access_key: str
+    obot_s3_secret_key: str
+    obot_audit_s3_access_key: str
+    obot_audit_s3_secret_key: str
+    obot_monitoring_enabled: bool
+    obot_tracing_enabled: bool
+    obot_otel_sample_prob: str
+    obot_litellm_enabled: bool
+    mcp_context_forge_enabled: bool
+    mcp_context_forge_subdomain: str
+    mcp_context_forge_version: str
+    mcp_context_forge_replicas: int
+    mcp_context_forge_cpu_request: str
+    mcp_context_forge_cpu_limit: str
+    mcp_context_forge_memory_request: str
+    mcp_context_forge_memory_limit: str
+    mcp_context_forge_db_user: str
+    mcp_context_forge_db_password: str
+    mcp_context_forge_db_name: str
+    mcp_context_forge_db_instances: int
+    mcp_context_forge_storage_size: str
+    mcp_context_forge_admin_password: str
+    mcp_context_forge_admin_email: str
+    mcp_context_forge_jwt_secret: str
+    mcp_context_forge_auth_encryption_secret: str
+    mcp_context_forge_keycloak_enabled: bool
+    mcp_context_forge_keycloak_client_id: str
+    mcp_context_forge_keycloak_client_secret: str
+    mcp_context_forge_dcr_enabled: bool
+    mcp_context_forge_dcr_allowed_issuers: list[str]
+    mcp_context_forge_dcr_default_scopes: str
+    mcp_context_forge_backup_enabled: bool
+    mcp_context_forge_s3_access_key: str
+    mcp_context_forge_s3_secret_key: str
+    dragonfly_mcpgateway_password: str
+    mcp_context_forge_monitoring_enabled: bool
+    mcp_context_forge_tracing_enabled: bool
+    mcp_context_forge_tracing_sample_rate: str
+    mcp_context_forge_internal_observability_enabled: bool
+    mcp_context_forge_internal_observability_sample_rate: str
+    mcp_context_forge_plugins_enabled: bool
+    mcp_context_forge_passthrough_enabled: bool
+    mcp_context_forge_passthrough_headers: str
+    mcp_context_forge_passthrough_source: str
+    mcp_context_forge_hyprmcp_enabled: bool
+    headlamp_enabled: bool
+    headlamp_hostname: str
+    headlamp_version: str
+    headlamp_chart_version: str
+    headlamp_replicas: int
+    headlamp_oidc_client_id: str
+    headlamp_oidc_client_secret: str
+    kubernetes_oidc_enabled: bool
+    kubernetes_oidc_client_id: str
+    kubernetes_oidc_client_secret: str
+    kubernetes_oidc_username_claim: str
+    kubernetes_oidc_username_prefix: str
+    kubernetes_oidc_groups_claim: str
+    kubernetes_oidc_groups_prefix: str
+    kubernetes_oidc_signing_algs: str
+    nodes: list[Node]
@@ -0,0 +1,223 @@
+"""
+Dependency-ordered derivation of the computed template variables.
+
+Every derived value comes from a rule that declares the keys it reads and the
+keys it writes. A RuleSet orders its rules once, so a rule always runs after
+the rules producing its inputs. Registration order only breaks ties.
+
+A rule reads the data through a view limited to its declared keys and returns
+the outputs to store. A rule may read its own outputs. Before the rule runs,
+those outputs hold the values from cluster.yaml, which is how user overrides
+and setdefault-style defaults are written. Each key has exactly one producing
+rule.
+
+Derivation keeps a copy of the source values. update() can then re-run only
+the rules downstream of the keys that changed.
+"""
+
+from __future__ import annotations
+
+import heapq
+from collections.abc import Callable, Iterable, Iterator, Mapping, MutableMapping
+from dataclasses import dataclass
+from typing import Any
+
+Compute = Callable[[Mapping[str, Any]], Mapping[str, Any]]
+
+_MISSING = object()
+
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    """A derivation step: compute(view of inputs and outputs) -> new output values."""
+
+    name: str
+    inputs: frozenset[str]
+    outputs: tuple[str, ...]
+    compute: Compute
+
+    @property
+    def readable(self) -> frozenset[str]:
+        return self.inputs.union(self.outputs)
+
+
+class RuleView(Mapping[str, Any]):
+    """Read-only access to the keys a rule declared, failing loudly on any other."""
+
+    __slots__ = ("_data", "_rule", "_readable")
+
+    def __init__(self, data: Mapping[str, Any], rule: Rule):
+        self._data = data
+        self._rule = rule
+        self._readable = rule.readable
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._readable:
+            # Not a KeyError, so Mapping.get() cannot swallow it
+            raise ValueError(f"Rule {self._rule.name} reads undeclared key {key!r}")
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key in self._readable if key in self._data)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+def defaults_rule(name: str, values: Mapping[str, Any], when: str | None = None) -> Rule:
+    """A rule that fills in each unset key with its default, optionally only while a flag is set."""
+    defaults = dict(values)
+
+    def compute(data: Mapping[str, Any]) -> dict[str, Any]:
+        if when is not None and not data.get(when):
+            return {}
+        return {key: value for key, value in defaults.items() if key not in data}
+
+    inputs = frozenset() if when is None else frozenset([when])
+    return Rule(name, inputs, tuple(defaults), compute)
+
+
+class RuleSet:
+    """Rules with a dependency order computed once, on first use."""
+
+    def __init__(self, rules: Iterable[Rule] = ()):
+        self._rules: list[Rule] = []
+        self._producers: dict[str, Rule] = {}
+        self._order: list[Rule] | None = None
+        for rule in rules:
+            self.add(rule)
+
+    def __iter__(self) -> Iterator[Rule]:
+        return iter(self._rules)
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def add(self, rule: Rule) -> Rule:
+        """Register a rule. Raises ValueError if another rule already produces one of its outputs."""
+        for key in rule.outputs:
+            producer = self._producers.get(key)
+            if producer is not None:
+                raise ValueError(
+                    f"Rules {producer.name} and {rule.name} both produce {key!r}"
+                )
+        for key in rule.outputs:
+            self._producers[key] = rule
+        self._rules.append(rule)
+        self._order = None
+        return rule
+
+    def rule(
+        self, inputs: Iterable[str] = (), outputs: Iterable[str] = ()
+    ) -> Callable[[Compute], Compute]:
+        """Decorator registering a function as a rule named after it."""
+
+        def register(compute: Compute) -> Compute:
+            self.add(Rule(compute.__name__, frozenset(inputs), tuple(outputs), compute))
+            return compute
+
+        return register
+
+    @property
+    def order(self) -> list[Rule]:
+        """All rules, each after the producers of its inputs (Kahn's algorithm).
+
+        Raises ValueError naming the rules involved in a dependency cycle.
+        """
+        if self._order is None:
+            self._order = self._sort()
+        return self._order
+
+    def _sort(self) -> list[Rule]:
+        index = {rule.name: position for position, rule in enumerate(self._rules)}
+        dependents: dict[str, list[Rule]] = {rule.name: [] for rule in self._rules}
+        waiting: dict[str, int] = {}
+        for rule in self._rules:
+            producers = {
+                self._producers[key].name
+                for key in rule.inputs
+                if key in self._producers and self._producers[key] is not rule
+            }
+            waiting[rule.name] = len(producers)
+            for producer in producers:
+                dependents[producer].append(rule)
+
+        # A heap keyed by registration order keeps independent rules in the order written
+        ready = [(index[name], name) for name, count in waiting.items() if count == 0]
+        heapq.heapify(ready)
+        order: list[Rule] = []
+        while ready:
+            _, name = heapq.heappop(ready)
+            rule = self._rules[index[name]]
+            order.append(rule)
+            for dependent in dependents[name]:
+                waiting[dependent.name] -= 1
+                if waiting[dependent.name] == 0:
+                    heapq.heappush(ready, (index[dependent.name], dependent.name))
+
+        if len(order) != len(self._rules):
+            cycle = sorted(name for name, count in waiting.items() if count > 0)
+            raise ValueError(f"Dependency cycle between rules: {', '.join(cycle)}")
+        return order
+
+    def downstream(self, keys: Iterable[str]) -> list[Rule]:
+        """Rules to re-run when keys change: their producers and every rule reading them, transitively."""
+        dirty = set(keys)
+        affected: list[Rule] = []
+        # One pass suffices: a rule's producers always come earlier in the order
+        for rule in self.order:
+            if dirty.intersection(rule.inputs) or dirty.intersection(rule.outputs):
+                affected.append(rule)
+                dirty.update(rule.outputs)
+        return affected
+
+
+class Derivation:
+    """Evaluates a RuleSet over one data mapping and remembers its source values."""
+
+    def __init__(self, rules: RuleSet, data: MutableMapping[str, Any]):
+        self.rules = rules
+        self.data = data
+        self._source = dict(data)
+
+    def run(self) -> None:
+        """Evaluate every rule, starting from the source values."""
+        self._evaluate(self.rules.order)
+
+    def update(self, source: Mapping[str, Any]) -> set[str]:
+        """Apply new source values and re-run only the rules downstream of the changes.
+
+        Returns the keys whose values may have changed.
+        """
+        changed = {
+            key
+            for key in self._source.keys() | source.keys()
+            if self._source.get(key, _MISSING) != source.get(key, _MISSING)
+        }
+        self._source = dict(source)
+        for key in changed:
+            self._restore(key)
+        affected = self.rules.downstream(changed)
+        self._evaluate(affected)
+        return changed.union(*(rule.outputs for rule in affected))
+
+    def _restore(self, key: str) -> None:
+        value = self._source.get(key, _MISSING)
+        if value is not _MISSING:
+            self.data[key] = value
+        elif key in self.data:
+            del self.data[key]
+
+    def _evaluate(self, rules: list[Rule]) -> None:
+        # Outputs start from the source values, so re-running a rule gives the same result
+        for rule in rules:
+            for key in rule.outputs:
+                self._restore(key)
+        for rule in rules:
+            results = rule.compute(RuleView(self.data, rule))
+            undeclared = results.keys() - set(rule.outputs)
+            if undeclared:
+                raise ValueError(
+                    f"Rule {rule.name} returned undeclared keys: {', '.join(sorted(undeclared))}"
+                )
+            self.data.update(results)
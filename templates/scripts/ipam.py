@@ -0,0 +1,223 @@
+"""
+IP address management for the template plugin.
+
+Parses node_cidr, the cluster CIDRs, the node addresses and the LoadBalancer
+VIPs once into integer intervals, detects collisions and overlaps with a
+single sorted sweep and allocates unset LoadBalancer IPs.
+
+LoadBalancer IPs come from the Cilium pool: cilium_lb_pool_cidr when set,
+node_cidr otherwise. The other addresses always belong in node_cidr.
+"""
+
+from __future__ import annotations
+
+import ipaddress
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
+
+IPNetwork = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+# Cluster networks that must not overlap each other
+NETWORK_KEYS = ("node_cidr", "cluster_pod_cidr", "cluster_svc_cidr", "cilium_lb_pool_cidr")
+
+# LoadBalancer IPs allocated from the top of the LoadBalancer pool when left unset
+LOADBALANCER_KEYS = ("cluster_gateway_addr", "cluster_dns_gateway_addr", "cloudflare_gateway_addr")
+
+# Single addresses that must be unique; the LoadBalancer IPs inside the pool,
+# the others inside node_cidr
+ADDRESS_KEYS = ("node_default_gateway", "cluster_api_addr", *LOADBALANCER_KEYS)
+
+
+@lru_cache(maxsize=64)
+def parse_network(value: str) -> IPNetwork:
+    """Parse a CIDR once, host bits allowed. Raises ValueError if invalid."""
+    return ipaddress.ip_network(value, strict=False)
+
+
+@dataclass(frozen=True, order=True)
+class Interval:
+    """An inclusive range of addresses as integers, ordered by version and start."""
+
+    version: int
+    start: int
+    end: int
+    label: str = field(compare=False)
+    value: str = field(compare=False)
+
+    @classmethod
+    def from_network(cls, label: str, network: IPNetwork) -> Interval:
+        return cls(
+            network.version,
+            int(network.network_address),
+            int(network.broadcast_address),
+            label,
+            str(network),
+        )
+
+    @classmethod
+    def from_address(
+        cls, label: str, address: ipaddress.IPv4Address | ipaddress.IPv6Address
+    ) -> Interval:
+        return cls(address.version, int(address), int(address), label, str(address))
+
+
+def find_overlaps(intervals: list[Interval]) -> list[tuple[Interval, Interval]]:
+    """Return (earlier, later) pairs for every interval overlapping one before it.
+
+    After sorting, an interval overlaps something earlier exactly when it starts
+    before the furthest end seen so far, so one pass finds every conflict.
+    """
+    overlaps: list[tuple[Interval, Interval]] = []
+    furthest: Interval | None = None
+
+    for interval in sorted(intervals):
+        if (
+            furthest is not None
+            and furthest.version == interval.version
+            and interval.start <= furthest.end
+        ):
+            overlaps.append((furthest, interval))
+            if interval.end > furthest.end:
+                furthest = interval
+        else:
+            furthest = interval
+
+    return overlaps
+
+
+@dataclass
+class AddressPlan:
+    """Validated cluster addressing, exposed to templates as the `ipam` variable."""
+
+    node_network: IPNetwork | None = None
+    # LoadBalancer IPs come from cilium_lb_pool_cidr when it is set, node_cidr otherwise
+    pool_network: IPNetwork | None = None
+    pool_configured: bool = False
+    networks: list[Interval] = field(default_factory=list)
+    addresses: list[Interval] = field(default_factory=list)
+    allocated: dict[str, str] = field(default_factory=dict)
+    errors: list[str] = field(default_factory=list)
+
+    def _parse(self, label: str, value: Any, parser: Any) -> Any:
+        try:
+            return parser(str(value))
+        except ValueError:
+            self.errors.append(f"{label} {value!r} is not a valid address")
+            return None
+
+    def add_network(self, key: str, value: Any) -> None:
+        if key == "cilium_lb_pool_cidr":
+            # An invalid pool is reported once, not again for every LoadBalancer IP
+            self.pool_configured = True
+        network = self._parse(key, value, parse_network)
+        if network is None:
+            return
+        self.networks.append(Interval.from_network(key, network))
+        if key == "node_cidr":
+            self.node_network = network
+        elif key == "cilium_lb_pool_cidr":
+            self.pool_network = network
+
+    def add_address(self, label: str, value: Any) -> None:
+        address = self._parse(label, value, ipaddress.ip_address)
+        if address is None:
+            return
+        self.addresses.append(Interval.from_address(label, address))
+
+    def network_of(self, label: str) -> tuple[str, IPNetwork | None]:
+        """The key and network the address labelled label must be a host of."""
+        if label in LOADBALANCER_KEYS and self.pool_configured:
+            return "cilium_lb_pool_cidr", self.pool_network
+        return "node_cidr", self.node_network
+
+    def allocate(self, key: str) -> str | None:
+        """Reserve the highest free host address in the LoadBalancer pool for key."""
+        pool_key, network = self.network_of(key)
+        if network is None or network.num_addresses < 4:
+            return None
+
+        reserved = {interval.start for interval in self.addresses}
+        # Skip the broadcast address and never hand out the network address
+        candidate = int(network.broadcast_address) - 1
+        while candidate > int(network.network_address) and candidate in reserved:
+            candidate -= 1
+        if candidate <= int(network.network_address):
+            self.errors.append(f"{key}: no free address left in {pool_key} {network}")
+            return None
+
+        address = ipaddress.ip_address(candidate)
+        self.addresses.append(Interval.from_address(key, address))
+        self.allocated[key] = str(address)
+        return str(address)
+
+    def validate(self) -> None:
+        """Collect overlapping networks, duplicate addresses and addresses outside their network."""
+        for earlier, later in find_overlaps(self.networks):
+            self.errors.append(
+                f"{later.label} {later.value} overlaps {earlier.label} {earlier.value}"
+            )
+
+        for earlier, later in find_overlaps(self.addresses):
+            self.errors.append(
+                f"{later.label} {later.value} is already used by {earlier.label}"
+            )
+
+        for interval in self.addresses:
+            key, network = self.network_of(interval.label)
+            if network is None:
+                continue
+            if interval.version != network.version or not (
+                int(network.network_address) < interval.start < int(network.broadcast_address)
+            ):
+                self.errors.append(
+                    f"{interval.label} {interval.value} is not a host address in {key} {network}"
+                )
+
+    def to_data(self) -> dict[str, Any]:
+        """Precomputed results for templates."""
+        return {
+            "node_prefix_length": self.node_network.prefixlen if self.node_network else None,
+            "addresses": {
+                interval.label: interval.value for interval in sorted(self.addresses)
+            },
+            "allocated": dict(self.allocated),
+        }
+
+
+def plan_addresses(data: Mapping[str, Any]) -> AddressPlan:
+    """Validate all cluster addressing and allocate unset LoadBalancer IPs.
+
+    Raises ValueError listing every conflict found.
+    """
+    plan = AddressPlan()
+
+    for key in NETWORK_KEYS:
+        if data.get(key):
+            plan.add_network(key, data[key])
+
+    for node in data.get("nodes", []):
+        if node.get("address"):
+            plan.add_address(f"node {node.get('name', '?')}", node["address"])
+
+    for key in ADDRESS_KEYS:
+        if data.get(key):
+            plan.add_address(key, data[key])
+
+    # cluster_dns_gateway_addr is only used by k8s-gateway
+    wanted = [
+        key
+        for key in LOADBALANCER_KEYS
+        if not data.get(key)
+        and (key != "cluster_dns_gateway_addr" or data.get("k8s_gateway_enabled"))
+    ]
+    for key in wanted:
+        plan.allocate(key)
+
+    plan.validate()
+    if plan.errors:
+        details = "\n".join(f"  - {error}" for error in plan.errors)
+        raise ValueError(f"Invalid cluster addressing:\n{details}")
+
+    return plan
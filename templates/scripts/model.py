@@ -0,0 +1,111 @@
+"""
+Base class for the config classes generated into config_model.py.
+
+Every CUE field is a slot. A field missing from cluster.yaml or nodes.yaml
+leaves its slot empty, so attribute access raises AttributeError and the
+mapping interface reports the key as missing, the same as the plain dict it
+replaces; templates that test `is defined` keep working. CUE defaults are
+kept in the DEFAULTS class variable rather than filled in for that reason.
+
+Keys that are not schema fields (values derived in Plugin.data()) go to a
+per-instance dict that is only created when first needed.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Mapping, MutableMapping
+from dataclasses import dataclass
+from typing import Any, ClassVar
+
+
+class ConfigModel(MutableMapping[str, Any]):
+    """A mutable mapping over slot fields, with a dict for keys outside the schema."""
+
+    __slots__ = ("_extra",)
+
+    FIELDS: ClassVar[frozenset[str]] = frozenset()
+    DEFAULTS: ClassVar[dict[str, Any]] = {}
+    # Model class for struct fields and whether the field is a list of them
+    NESTED: ClassVar[dict[str, tuple[type[ConfigModel], bool]]] = {}
+
+    def __init__(self, values: Mapping[str, Any] | None = None):
+        if values:
+            self.update(values)
+
+    @classmethod
+    def from_dict(cls, values: Mapping[str, Any]) -> ConfigModel:
+        """Build the model from loaded YAML, converting nested structs to their classes."""
+        model = cls()
+        for key, value in values.items():
+            nested = cls.NESTED.get(key)
+            if nested is not None:
+                value = _convert(nested, value)
+            model[key] = value
+        return model
+
+    def use_default(self, key: str) -> Any:
+        """Set key to its CUE default unless it is already set, and return the value."""
+        return self.setdefault(key, self.DEFAULTS[key])
+
+    def _extras(self) -> dict[str, Any]:
+        try:
+            return self._extra
+        except AttributeError:
+            self._extra = {}
+            return self._extra
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return self._extras()[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            self._extras()[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in self.FIELDS:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        else:
+            del self._extras()[key]
+
+    def __contains__(self, key: object) -> bool:
+        if key in self.FIELDS:
+            return hasattr(self, key)  # type: ignore[arg-type]
+        return key in self._extras()
+
+    def __iter__(self) -> Iterator[str]:
+        for name in type(self).__slots__:
+            if hasattr(self, name):
+                yield name
+        yield from self._extras()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+def _convert(nested: tuple[type[ConfigModel], bool], value: Any) -> Any:
+    model, is_list = nested
+    if is_list and isinstance(value, list):
+        return [model.from_dict(item) if isinstance(item, Mapping) else item for item in value]
+    if not is_list and isinstance(value, Mapping):
+        return model.from_dict(value)
+    return value
+
+
+def config_model(cls: type[ConfigModel]) -> type[ConfigModel]:
+    """Turn a generated class into a slot dataclass and record its field names."""
+    cls = dataclass(slots=True, init=False, repr=False, eq=False)(cls)
+    cls.FIELDS = frozenset(cls.__slots__)
+    return cls
@@ -0,0 +1,197 @@
+"""
+Proxmox VM placement for the template plugin.
+
+Assigns every node VM to one of the proxmox_hosts, within the cores, memory
+and disk each host offers. Controllers are placed first and spread across
+the hosts, so losing one host cannot take etcd quorum with it when there
+are enough hosts. Workers are then bin-packed, largest first, onto the host
+they leave the least room on.
+"""
+
+from __future__ import annotations
+
+import math
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+# VM resources, named as on the node entries and in the role defaults
+RESOURCES = ("cores", "memory", "disk")
+
+
+@dataclass(frozen=True)
+class Vm:
+    """Resources a node VM reserves: vCPUs (cores x sockets), MiB of memory, GB of disk."""
+
+    name: str
+    controller: bool
+    cores: int
+    memory: int
+    disk: int
+
+    @classmethod
+    def from_node(cls, node: Mapping[str, Any], defaults: Mapping[str, Any]) -> Vm:
+        """VM of a node entry, falling back to its role defaults like terraform.tfvars."""
+        return cls(
+            name=node["name"],
+            controller=bool(node.get("controller")),
+            cores=node.get("vm_cores", defaults["cores"])
+            * node.get("vm_sockets", defaults["sockets"]),
+            memory=node.get("vm_memory", defaults["memory"]),
+            disk=node.get("vm_disk_size", defaults["disk_size"]),
+        )
+
+    def describe(self) -> str:
+        role = "controller" if self.controller else "worker"
+        return f"{self.name} ({role}, {self.cores} cores, {self.memory} MiB, {self.disk} GB)"
+
+
+@dataclass
+class Host:
+    """A Proxmox host and what the VMs placed so far left of it. disk None means shared storage."""
+
+    name: str
+    cores: int
+    memory: int
+    disk: int | None
+    used: dict[str, int] = field(default_factory=lambda: dict.fromkeys(RESOURCES, 0))
+    controllers: int = 0
+
+    @classmethod
+    def from_config(cls, host: Mapping[str, Any]) -> Host:
+        return cls(host["name"], host["cores"], host["memory"], host.get("disk"))
+
+    def capacity(self, resource: str) -> int | None:
+        return getattr(self, resource)
+
+    def fits(self, vm: Vm) -> bool:
+        return all(
+            self.capacity(resource) is None
+            or self.used[resource] + getattr(vm, resource) <= self.capacity(resource)
+            for resource in RESOURCES
+        )
+
+    def free_share(self, vm: Vm | None = None) -> float:
+        """Mean over the bounded resources of the share left free, after placing vm if given.
+
+        A mean rather than a sum, so a host with bounded disk is not ranked
+        emptier than a shared-storage host just for having one more term.
+        """
+        shares = []
+        for resource in RESOURCES:
+            capacity = self.capacity(resource)
+            if capacity is None:
+                continue
+            used = self.used[resource] + (getattr(vm, resource) if vm else 0)
+            shares.append((capacity - used) / capacity)
+        return sum(shares) / len(shares)
+
+    def place(self, vm: Vm) -> None:
+        for resource in RESOURCES:
+            self.used[resource] += getattr(vm, resource)
+        if vm.controller:
+            self.controllers += 1
+
+    def describe_free(self) -> str:
+        free = [
+            f"{self.capacity(resource) - self.used[resource]} {unit}"
+            for resource, unit in zip(RESOURCES, ("cores", "MiB", "GB"))
+            if self.capacity(resource) is not None
+        ]
+        return f"{self.name} ({', '.join(free)} free)"
+
+
+@dataclass
+class Placement:
+    """Target host of every VM, and what is left of each host."""
+
+    hosts: list[Host]
+    assignments: dict[str, str] = field(default_factory=dict)
+    errors: list[str] = field(default_factory=list)
+
+    def assign(self, vm: Vm, host: Host) -> None:
+        host.place(vm)
+        self.assignments[vm.name] = host.name
+
+    def place_controllers(self, vms: list[Vm]) -> None:
+        """Spread controllers: no host gets more than its even share of them."""
+        limit = math.ceil(len(vms) / len(self.hosts)) if vms else 0
+        for vm in vms:
+            fitting = [host for host in self.hosts if host.fits(vm)]
+            candidates = [host for host in fitting if host.controllers < limit]
+            if not fitting:
+                self.errors.append(f"{vm.describe()} fits on no host; {self._free()}")
+                continue
+            if not candidates:
+                names = ", ".join(host.name for host in fitting)
+                share = "one controller" if limit == 1 else f"{limit} controllers"
+                self.errors.append(
+                    f"{vm.describe()} fits only on hosts already running {share} ({names});"
+                    f" spreading {len(vms)} controllers over {len(self.hosts)} hosts allows"
+                    f" at most {share} per host"
+                )
+                continue
+            # Fewest controllers first, then the emptiest host; ties go to the host listed first
+            host = min(candidates, key=lambda host: (host.controllers, -host.free_share()))
+            self.assign(vm, host)
+
+    def place_workers(self, vms: list[Vm]) -> None:
+        """Best fit: each worker goes where it leaves the least room unused."""
+        for vm in vms:
+            candidates = [host for host in self.hosts if host.fits(vm)]
+            if not candidates:
+                self.errors.append(f"{vm.describe()} fits on no host; {self._free()}")
+                continue
+            self.assign(vm, min(candidates, key=lambda host: host.free_share(vm)))
+
+    def _free(self) -> str:
+        return "left: " + ", ".join(host.describe_free() for host in self.hosts)
+
+
+def size(vm: Vm, hosts: list[Host]) -> float:
+    """Largest share of the biggest host's capacity vm needs, for first-fit-decreasing order."""
+    shares = []
+    for resource in RESOURCES:
+        capacities = [host.capacity(resource) for host in hosts]
+        if None not in capacities:
+            shares.append(getattr(vm, resource) / max(capacities))
+    return max(shares, default=0.0)
+
+
+def plan_placement(
+    data: Mapping[str, Any],
+    controller_defaults: Mapping[str, Any],
+    worker_defaults: Mapping[str, Any],
+) -> Placement:
+    """Place every node VM on one of data["proxmox_hosts"].
+
+    Raises ValueError listing every VM that does not fit and every invalid host.
+    """
+    hosts = [Host.from_config(host) for host in data["proxmox_hosts"]]
+    placement = Placement(hosts)
+
+    names = [host.name for host in hosts]
+    if not hosts:
+        placement.errors.append("proxmox_hosts is empty")
+    for name in sorted({name for name in names if names.count(name) > 1}):
+        placement.errors.append(f"proxmox_hosts lists {name} more than once")
+    if data.get("proxmox_node") and data["proxmox_node"] not in names:
+        placement.errors.append(
+            f"proxmox_node {data['proxmox_node']} is not one of the proxmox_hosts"
+        )
+
+    if not placement.errors:
+        vms = [
+            Vm.from_node(node, controller_defaults if node.get("controller") else worker_defaults)
+            for node in data.get("nodes", [])
+        ]
+        # The sort is stable, so equal VMs keep their nodes.yaml order
+        vms.sort(key=lambda vm: size(vm, hosts), reverse=True)
+        placement.place_controllers([vm for vm in vms if vm.controller])
+        placement.place_workers([vm for vm in vms if not vm.controller])
+
+    if placement.errors:
+        details = "\n".join(f"  - {error}" for error in placement.errors)
+        raise ValueError(f"The cluster does not fit on the Proxmox hosts:\n{details}")
+
+    return placement
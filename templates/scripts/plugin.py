@@ -1,28 +1,97 @@
 import base64
-import ipaddress
 import json
+import os
 import re
-from functools import lru_cache
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, TypeVar
 
 import makejinja
+from config_model import (
+    Cluster,
+    ProxmoxVmAdvanced,
+    ProxmoxVmControllerDefaults,
+    ProxmoxVmDefaults,
+    ProxmoxVmWorkerDefaults,
+)
+from derive import Compute, Derivation, Rule, RuleSet, defaults_rule
+from ipam import (
+    ADDRESS_KEYS,
+    LOADBALANCER_KEYS,
+    NETWORK_KEYS,
+    parse_network,
+    plan_addresses,
+)
+from placement import plan_placement
+
+T = TypeVar("T")
+
+
+# Age key pair parsed from age.key (None when the line is missing)
+@dataclass(frozen=True)
+class AgeKey:
+    public: str | None
+    private: str | None
+
+    @classmethod
+    def parse(cls, content: str) -> "AgeKey":
+        public = re.search(r"# public key: (age1[\w]+)", content)
+        private = re.search(r"(AGE-SECRET-KEY-[\w]+)", content)
+        return cls(
+            public=public.group(1) if public else None,
+            private=private.group(1) if private else None,
+        )
+
+
+# Cloudflare tunnel credentials parsed from cloudflare-tunnel.json
+@dataclass(frozen=True)
+class CloudflareTunnel:
+    tunnel_id: str | None
+    # TUNNEL_TOKEN encoding of the credentials, None when a key is missing
+    token: str | None
+    missing_key: str | None
+
+    @classmethod
+    def parse(cls, content: str) -> "CloudflareTunnel":
+        data = json.loads(content)
+        missing_key = next(
+            (key for key in ("AccountTag", "TunnelID", "TunnelSecret") if key not in data),
+            None,
+        )
+        token = None
+        if missing_key is None:
+            transformed_data = {
+                "a": data["AccountTag"],
+                "t": data["TunnelID"],
+                "s": data["TunnelSecret"],
+            }
+            json_string = json.dumps(transformed_data, separators=(",", ":"))
+            token = base64.b64encode(json_string.encode("utf-8")).decode("utf-8")
+        return cls(tunnel_id=data.get("TunnelID"), token=token, missing_key=missing_key)
+
+
+# Credential files parsed once and reloaded when their mtime or size changes,
+# so long running renders pick up rotated keys without a restart
+class CredentialStore:
+    def __init__(self) -> None:
+        self._entries: dict[tuple[str, Callable[[str], Any]], tuple[tuple[int, int], Any]] = {}
+
+    def get(self, file_path: str, parse: Callable[[str], T]) -> T:
+        """Return the parsed contents of file_path. Raises FileNotFoundError if missing."""
+        stat = os.stat(file_path)
+        version = (stat.st_mtime_ns, stat.st_size)
 
+        entry = self._entries.get((file_path, parse))
+        if entry is None or entry[0] != version:
+            with open(file_path, "r") as file:
+                entry = (version, parse(file.read()))
+            self._entries[(file_path, parse)] = entry
 
-# Cached file readers for 20-30% render improvement
-# See: docs/REVIEW-FOLLOWUP-JAN-2026.md item #10
-@lru_cache(maxsize=8)
-def _read_file_cached(file_path: str) -> str:
-    """Read and cache file contents. Cached for performance during template rendering."""
-    with open(file_path, "r") as file:
-        return file.read().strip()
+        return entry[1]
 
 
-@lru_cache(maxsize=4)
-def _read_json_cached(file_path: str) -> str:
-    """Read and cache JSON file contents as string. Parsed by caller."""
-    with open(file_path, "r") as file:
-        return file.read()
+_credentials = CredentialStore()
 
 
 # Return the filename of a path without the j2 extension
@@ -33,10 +102,10 @@ def basename(value: str) -> str:
 # Return the nth host in a CIDR range
 def nthhost(value: str, query: int) -> str:
     try:
-        network = ipaddress.ip_network(value, strict=False)
+        network = parse_network(value)
         if 0 <= query < network.num_addresses:
             return str(network[query])
-    except ValueError:
+    except (TypeError, ValueError):
         pass
     return False
 
@@ -44,17 +113,15 @@ def nthhost(value: str, query: int) -> str:
 # Return the age public or private key from age.key
 def age_key(key_type: str, file_path: str = "age.key") -> str:
     try:
-        file_content = _read_file_cached(file_path)
+        key = _credentials.get(file_path, AgeKey.parse)
         if key_type == "public":
-            key_match = re.search(r"# public key: (age1[\w]+)", file_content)
-            if not key_match:
+            if key.public is None:
                 raise ValueError("Could not find public key in the age key file.")
-            return key_match.group(1)
+            return key.public
         elif key_type == "private":
-            key_match = re.search(r"(AGE-SECRET-KEY-[\w]+)", file_content)
-            if not key_match:
+            if key.private is None:
                 raise ValueError("Could not find private key in the age key file.")
-            return key_match.group(1)
+            return key.private
         else:
             raise ValueError("Invalid key type. Use 'public' or 'private'.")
     except FileNotFoundError:
@@ -66,8 +133,7 @@ def age_key(key_type: str, file_path: str = "age.key") -> str:
 # Return cloudflare tunnel fields from cloudflare-tunnel.json
 def cloudflare_tunnel_id(file_path: str = "cloudflare-tunnel.json") -> str:
     try:
-        data = json.loads(_read_json_cached(file_path))
-        tunnel_id = data.get("TunnelID")
+        tunnel_id = _credentials.get(file_path, CloudflareTunnel.parse).tunnel_id
         if tunnel_id is None:
             raise KeyError(f"Missing 'TunnelID' key in {file_path}")
         return tunnel_id
@@ -85,14 +151,10 @@ def cloudflare_tunnel_id(file_path: str = "cloudflare-tunnel.json") -> str:
 # Return cloudflare tunnel fields from cloudflare-tunnel.json in TUNNEL_TOKEN format
 def cloudflare_tunnel_secret(file_path: str = "cloudflare-tunnel.json") -> str:
     try:
-        data = json.loads(_read_json_cached(file_path))
-        transformed_data = {
-            "a": data["AccountTag"],
-            "t": data["TunnelID"],
-            "s": data["TunnelSecret"],
-        }
-        json_string = json.dumps(transformed_data, separators=(",", ":"))
-        return base64.b64encode(json_string.encode("utf-8")).decode("utf-8")
+        tunnel = _credentials.get(file_path, CloudflareTunnel.parse)
+        if tunnel.token is None:
+            raise KeyError(tunnel.missing_key)
+        return tunnel.token
 
     except FileNotFoundError:
         raise FileNotFoundError(f"File not found: {file_path}")
@@ -107,7 +169,7 @@ def cloudflare_tunnel_secret(file_path: str = "cloudflare-tunnel.json") -> str:
 # Return the GitHub deploy key from github-deploy.key
 def github_deploy_key(file_path: str = "github-deploy.key") -> str:
     try:
-        return _read_file_cached(file_path)
+        return _credentials.get(file_path, str.strip)
     except FileNotFoundError:
         raise FileNotFoundError(f"File not found: {file_path}")
     except Exception as e:
@@ -117,826 +179,1238 @@ def github_deploy_key(file_path: str = "github-deploy.key") -> str:
 # Return the Flux / GitHub push token from github-push-token.txt
 def github_push_token(file_path: str = "github-push-token.txt") -> str:
     try:
-        return _read_file_cached(file_path)
+        return _credentials.get(file_path, str.strip)
     except FileNotFoundError:
         raise FileNotFoundError(f"File not found: {file_path}")
     except Exception as e:
         raise RuntimeError(f"Unexpected error while reading {file_path}: {e}")
 
 
-# Return a list of files in the talos patches directory
-def talos_patches(value: str) -> list[str]:
-    path = Path(f"templates/config/talos/patches/{value}")
-    if not path.is_dir():
-        return []
-    return [str(f) for f in sorted(path.glob("*.yaml.j2")) if f.is_file()]
+# Talos patch directories below each input root, named after a role or a node
+TALOS_PATCHES_DIR = Path("talos/patches")
+TALOS_PATCH_ROLES = ("global", "controller", "worker")
+
+
+# Return {directory name: [patch templates]} for every Talos patch directory
+# Earlier input roots win for same-named patches, matching makejinja's output
+def index_talos_patches(roots: list[Path]) -> dict[str, list[str]]:
+    found: dict[str, dict[str, Path]] = {}
+    for root in roots:
+        patches_dir = root / TALOS_PATCHES_DIR
+        if not patches_dir.is_dir():
+            continue
+        for directory in sorted(patches_dir.iterdir()):
+            if not directory.is_dir():
+                continue
+            files = found.setdefault(directory.name, {})
+            for patch in sorted(directory.glob("*.yaml.j2")):
+                if patch.is_file():
+                    files.setdefault(patch.name, patch)
+    return {
+        name: [str(files[patch]) for patch in sorted(files)]
+        for name, files in sorted(found.items())
+    }
 
 
 # Check if infrastructure provisioning is enabled (Proxmox)
-def infrastructure_enabled(data: dict[str, Any]) -> bool:
+def infrastructure_enabled(data: Mapping[str, Any]) -> bool:
     """Check if Proxmox infrastructure provisioning is configured."""
-    return bool(data.get("proxmox_api_url") and data.get("proxmox_node"))
+    return bool(
+        data.get("proxmox_api_url")
+        and (data.get("proxmox_node") or data.get("proxmox_hosts"))
+    )
 
 
-# Default VM settings for Proxmox (Talos-optimized)
+# Default VM settings for Proxmox (Talos-optimized), from the CUE defaults of
+# proxmox_vm_defaults in cluster.schema.cue
 # These are global defaults; role-based defaults below take precedence
-PROXMOX_VM_DEFAULTS = {
-    "cores": 4,
-    "sockets": 1,
-    "memory": 8192,
-    "disk_size": 128,
-}
+PROXMOX_VM_DEFAULTS = ProxmoxVmDefaults.DEFAULTS
 
 # Controller node VM defaults (optimized for etcd and control plane)
-# Controllers typically need fewer resources but fast disk for etcd
-PROXMOX_VM_CONTROLLER_DEFAULTS = {
-    "cores": 4,
-    "sockets": 1,
-    "memory": 8192,
-    "disk_size": 64,  # Smaller disk - etcd only, no workloads
-}
+# Controllers typically need fewer resources but a fast disk for etcd only
+PROXMOX_VM_CONTROLLER_DEFAULTS = ProxmoxVmControllerDefaults.DEFAULTS
 
 # Worker node VM defaults (optimized for running workloads)
-# Workers typically need more resources for application pods
-PROXMOX_VM_WORKER_DEFAULTS = {
-    "cores": 8,
-    "sockets": 1,
-    "memory": 16384,
-    "disk_size": 256,  # Larger disk for container images and workloads
-}
+# Workers typically need more resources and disk for container images
+PROXMOX_VM_WORKER_DEFAULTS = ProxmoxVmWorkerDefaults.DEFAULTS
 
 # Advanced VM settings for Proxmox (Talos-optimized)
-PROXMOX_VM_ADVANCED = {
-    "bios": "ovmf",
-    "machine": "q35",
-    "cpu_type": "host",
-    "scsi_hw": "virtio-scsi-pci",
-    "balloon": 0,
-    "numa": True,
-    "qemu_agent": True,
-    "net_queues": 4,
-    "disk_discard": True,
-    "disk_ssd": True,
-    "tags": ["kubernetes", "linux", "talos"],
-    # Network configuration
-    "network_bridge": "vmbr0",  # Proxmox bridge interface for VM networking
-    # Guest OS configuration
-    "ostype": "l26",  # Linux 2.6/3.x/4.x/5.x/6.x kernel
-    # Storage flags (Talos is immutable, skip backups/replication)
-    "disk_backup": False,  # Exclude from Proxmox backup jobs
-    "disk_replicate": False,  # Disable Proxmox replication (K8s handles HA)
+# Talos is immutable, so Proxmox backups and replication are disabled
+PROXMOX_VM_ADVANCED = ProxmoxVmAdvanced.DEFAULTS
+
+# Template directories owned by the feature flags computed in Plugin.data()
+# Every template below these directories is guarded by its feature flag, so when
+# all features owning a directory are disabled the whole subtree renders empty
+# and is skipped before Jinja opens any of its templates
+FEATURE_DIRECTORIES = {
+    "keycloak_enabled": ["kubernetes/apps/identity"],
+    "litellm_enabled": [
+        "kubernetes/apps/ai-system",
+        "kubernetes/apps/ai-system/litellm",
+    ],
+    "langfuse_enabled": [
+        "kubernetes/apps/ai-system",
+        "kubernetes/apps/ai-system/langfuse",
+    ],
+    "obot_enabled": [
+        "kubernetes/apps/ai-system",
+        "kubernetes/apps/ai-system/obot",
+    ],
+    "mcp_context_forge_enabled": [
+        "kubernetes/apps/ai-system",
+        "kubernetes/apps/ai-system/mcp-context-forge",
+    ],
+    "dragonfly_enabled": ["kubernetes/apps/cache"],
+    "cnpg_enabled": ["kubernetes/apps/cnpg-system"],
+    "rustfs_enabled": ["kubernetes/apps/storage"],
 }
 
 
-class Plugin(makejinja.plugin.Plugin):
-    def __init__(self, data: dict[str, Any]):
-        self._data = data
-
-    def data(self) -> makejinja.plugin.Data:
-        data = self._data
-
-        # Set default values for optional fields
-        data.setdefault("node_default_gateway", nthhost(data.get("node_cidr"), 1))
-        data.setdefault("node_dns_servers", ["1.1.1.1", "1.0.0.1"])
-        data.setdefault("node_ntp_servers", ["162.159.200.1", "162.159.200.123"])
-        data.setdefault("cluster_pod_cidr", "10.42.0.0/16")
-        data.setdefault("cluster_svc_cidr", "10.43.0.0/16")
-        data.setdefault("repository_branch", "main")
-        data.setdefault("repository_visibility", "public")
-        data.setdefault("cilium_loadbalancer_mode", "dsr")
-
-        # If all BGP keys are set, enable BGP
-        bgp_keys = [
-            "cilium_bgp_router_addr",
-            "cilium_bgp_router_asn",
-            "cilium_bgp_node_asn",
-        ]
-        bgp_enabled = all(data.get(key) for key in bgp_keys)
-        data.setdefault("cilium_bgp_enabled", bgp_enabled)
-
-        # UniFi DNS integration - when enabled, replaces k8s-gateway
-        # Both unifi_host and unifi_api_key must be set to enable
-        unifi_dns_enabled = bool(data.get("unifi_host") and data.get("unifi_api_key"))
-        data["unifi_dns_enabled"] = unifi_dns_enabled
-
-        # k8s-gateway is only enabled when UniFi DNS is NOT configured
-        # This is mutually exclusive with unifi_dns_enabled
-        k8s_gateway_enabled = not unifi_dns_enabled
-        data["k8s_gateway_enabled"] = k8s_gateway_enabled
-
-        # Talos Backup - enabled when S3 endpoint and bucket are configured
-        # Both backup_s3_endpoint and backup_s3_bucket must be set to enable
-        talos_backup_enabled = bool(
+# Return the template directories whose owning features are all disabled
+def disabled_feature_directories(data: Mapping[str, Any]) -> list[str]:
+    owners: dict[str, list[str]] = {}
+    for feature, directories in FEATURE_DIRECTORIES.items():
+        for directory in directories:
+            owners.setdefault(directory, []).append(feature)
+    return sorted(
+        directory
+        for directory, features in owners.items()
+        if not any(data.get(feature) for feature in features)
+    )
+
+
+# Derived variables, one rule per concept. Each rule lists the keys it reads
+# besides its own outputs; see derive.py for the evaluation order
+RULES = RuleSet()
+
+
+# CUE defaults for keys, for rules that fill in unset values
+def cue_defaults(*keys: str) -> dict[str, Any]:
+    return {key: Cluster.DEFAULTS[key] for key in keys}
+
+
+# Set default values for optional fields
+RULES.add(
+    defaults_rule(
+        "derive_base_defaults",
+        {
+            "node_dns_servers": ["1.1.1.1", "1.0.0.1"],
+            "node_ntp_servers": ["162.159.200.1", "162.159.200.123"],
+            "repository_branch": "main",
+            **cue_defaults(
+                "cluster_pod_cidr",
+                "cluster_svc_cidr",
+                "repository_visibility",
+                "cilium_loadbalancer_mode",
+            ),
+        },
+    )
+)
+
+
+@RULES.rule(inputs=["node_cidr"], outputs=["node_default_gateway"])
+def derive_node_default_gateway(data: Mapping[str, Any]) -> dict[str, Any]:
+    if "node_default_gateway" in data:
+        return {}
+    return {"node_default_gateway": nthhost(data.get("node_cidr"), 1)}
+
+
+# If all BGP keys are set, enable BGP
+@RULES.rule(
+    inputs=["cilium_bgp_router_addr", "cilium_bgp_router_asn", "cilium_bgp_node_asn"],
+    outputs=["cilium_bgp_enabled"],
+)
+def derive_cilium_bgp_enabled(data: Mapping[str, Any]) -> dict[str, Any]:
+    if "cilium_bgp_enabled" in data:
+        return {}
+    bgp_keys = [
+        "cilium_bgp_router_addr",
+        "cilium_bgp_router_asn",
+        "cilium_bgp_node_asn",
+    ]
+    return {"cilium_bgp_enabled": all(data.get(key) for key in bgp_keys)}
+
+
+# UniFi DNS integration - when enabled, replaces k8s-gateway
+# Both unifi_host and unifi_api_key must be set to enable
+@RULES.rule(inputs=["unifi_host", "unifi_api_key"], outputs=["unifi_dns_enabled"])
+def derive_unifi_dns_enabled(data: Mapping[str, Any]) -> dict[str, Any]:
+    return {
+        "unifi_dns_enabled": bool(data.get("unifi_host") and data.get("unifi_api_key"))
+    }
+
+
+# k8s-gateway is only enabled when UniFi DNS is NOT configured
+# This is mutually exclusive with unifi_dns_enabled
+@RULES.rule(inputs=["unifi_dns_enabled"], outputs=["k8s_gateway_enabled"])
+def derive_k8s_gateway_enabled(data: Mapping[str, Any]) -> dict[str, Any]:
+    return {"k8s_gateway_enabled": not data["unifi_dns_enabled"]}
+
+
+# Check node addresses, VIPs and cluster CIDRs against each other and allocate
+# unset LoadBalancer IPs from the top of the Cilium pool: cilium_lb_pool_cidr
+# when set, node_cidr otherwise
+@RULES.rule(
+    inputs=[*NETWORK_KEYS, *ADDRESS_KEYS, "nodes", "k8s_gateway_enabled"],
+    outputs=[*LOADBALANCER_KEYS, "ipam"],
+)
+def derive_ipam(data: Mapping[str, Any]) -> dict[str, Any]:
+    address_plan = plan_addresses(data)
+    return {**address_plan.allocated, "ipam": address_plan.to_data()}
+
+
+# Talos Backup - enabled when S3 endpoint and bucket are configured
+# Both backup_s3_endpoint and backup_s3_bucket must be set to enable
+# Internal RustFS uses .svc.cluster.local DNS, requires path-style URLs and no SSL
+@RULES.rule(
+    inputs=["backup_s3_endpoint", "backup_s3_bucket"],
+    outputs=["talos_backup_enabled", "backup_s3_internal"],
+)
+def derive_talos_backup(data: Mapping[str, Any]) -> dict[str, Any]:
+    backup_s3_endpoint = data.get("backup_s3_endpoint", "")
+    return {
+        "talos_backup_enabled": bool(
             data.get("backup_s3_endpoint") and data.get("backup_s3_bucket")
-        )
-        data["talos_backup_enabled"] = talos_backup_enabled
-
-        # Talos Backup - detect internal vs external S3 endpoint
-        # Internal RustFS uses .svc.cluster.local DNS, requires path-style URLs and no SSL
-        backup_s3_endpoint = data.get("backup_s3_endpoint", "")
-        backup_s3_internal = "svc.cluster.local" in backup_s3_endpoint
-        data["backup_s3_internal"] = backup_s3_internal
-
-        # OIDC/JWT authentication - enabled when issuer URL and JWKS URI are configured
-        # Both oidc_issuer_url and oidc_jwks_uri must be set to enable
-        oidc_enabled = bool(data.get("oidc_issuer_url") and data.get("oidc_jwks_uri"))
-        data["oidc_enabled"] = oidc_enabled
-
-        # RustFS shared storage - enabled when rustfs_enabled is true
-        # When RustFS is enabled, Loki uses S3 backend for SimpleScalable mode
-        rustfs_enabled = data.get("rustfs_enabled", False)
-        data["rustfs_enabled"] = rustfs_enabled
-        if rustfs_enabled:
-            # Set default storage class for RustFS if not specified
-            data.setdefault(
-                "rustfs_storage_class", data.get("storage_class", "local-path")
-            )
-
-        # Loki deployment mode is determined by RustFS availability
-        # SimpleScalable mode when RustFS is available, SingleBinary otherwise
-        if data.get("loki_enabled"):
-            if rustfs_enabled:
-                data["loki_deployment_mode"] = "SimpleScalable"
-            else:
-                data["loki_deployment_mode"] = "SingleBinary"
-
-        # If there is more than one node, enable spegel (can be overridden by user)
-        if "spegel_enabled" not in data:
-            data["spegel_enabled"] = len(data.get("nodes", [])) > 1
-
-        # CloudNativePG - enabled when cnpg_enabled is true
-        cnpg_enabled = data.get("cnpg_enabled", False)
-        data["cnpg_enabled"] = cnpg_enabled
-
+        ),
+        "backup_s3_internal": "svc.cluster.local" in backup_s3_endpoint,
+    }
+
+
+# OIDC/JWT authentication - enabled when issuer URL and JWKS URI are configured
+# Both oidc_issuer_url and oidc_jwks_uri must be set to enable; Keycloak fills
+# them in when they are left unset (derive_keycloak_oidc runs first)
+@RULES.rule(inputs=["oidc_issuer_url", "oidc_jwks_uri"], outputs=["oidc_enabled"])
+def derive_oidc_enabled(data: Mapping[str, Any]) -> dict[str, Any]:
+    return {
+        "oidc_enabled": bool(data.get("oidc_issuer_url") and data.get("oidc_jwks_uri"))
+    }
+
+
+# RustFS shared storage - enabled when rustfs_enabled is true
+# When RustFS is enabled, Loki uses S3 backend for SimpleScalable mode
+@RULES.rule(
+    inputs=["storage_class"], outputs=["rustfs_enabled", "rustfs_storage_class"]
+)
+def derive_rustfs(data: Mapping[str, Any]) -> dict[str, Any]:
+    rustfs_enabled = data.get("rustfs_enabled", False)
+    derived = {"rustfs_enabled": rustfs_enabled}
+    if rustfs_enabled and "rustfs_storage_class" not in data:
+        # Set default storage class for RustFS if not specified
+        derived["rustfs_storage_class"] = data.get("storage_class", "local-path")
+    return derived
+
+
+# Loki deployment mode is determined by RustFS availability
+# SimpleScalable mode when RustFS is available, SingleBinary otherwise
+@RULES.rule(inputs=["loki_enabled", "rustfs_enabled"], outputs=["loki_deployment_mode"])
+def derive_loki_deployment_mode(data: Mapping[str, Any]) -> dict[str, Any]:
+    if not data.get("loki_enabled"):
+        return {}
+    if data["rustfs_enabled"]:
+        return {"loki_deployment_mode": "SimpleScalable"}
+    return {"loki_deployment_mode": "SingleBinary"}
+
+
+# If there is more than one node, enable spegel (can be overridden by user)
+@RULES.rule(inputs=["nodes"], outputs=["spegel_enabled"])
+def derive_spegel_enabled(data: Mapping[str, Any]) -> dict[str, Any]:
+    if "spegel_enabled" in data:
+        return {}
+    return {"spegel_enabled": len(data.get("nodes", [])) > 1}
+
+
+# CloudNativePG - enabled when cnpg_enabled is true
+@RULES.rule(
+    inputs=["rustfs_enabled", "cnpg_s3_access_key", "cnpg_s3_secret_key"],
+    outputs=[
+        "cnpg_enabled",
+        "cnpg_backup_enabled",
+        "cnpg_barman_plugin_enabled",
+        "cnpg_pgvector_enabled",
+    ],
+)
+def derive_cnpg(data: Mapping[str, Any]) -> dict[str, Any]:
+    cnpg_enabled = data.get("cnpg_enabled", False)
+    return {
+        "cnpg_enabled": cnpg_enabled,
         # CNPG backup - enabled when cnpg, rustfs, and backup flag are all enabled with credentials
-        cnpg_backup_enabled = (
+        "cnpg_backup_enabled": (
             cnpg_enabled
             and data.get("rustfs_enabled", False)
             and data.get("cnpg_backup_enabled", False)
             and data.get("cnpg_s3_access_key")
             and data.get("cnpg_s3_secret_key")
-        )
-        data["cnpg_backup_enabled"] = cnpg_backup_enabled
-
-        # Default PostgreSQL image for CNPG clusters
-        cnpg_postgres_image = data.get(
-            "cnpg_postgres_image",
-            "ghcr.io/cloudnative-pg/postgresql:18.1-standard-trixie",
-        )
-        data["cnpg_postgres_image"] = cnpg_postgres_image
-
+        ),
         # Barman Cloud Plugin - enabled when explicitly set or any backup is enabled
         # Plugin provides barman-cloud binaries via sidecar (no -system- images needed)
         # Requires cnpg_enabled for the operator to be present
-        cnpg_barman_plugin_enabled = cnpg_enabled and data.get(
-            "cnpg_barman_plugin_enabled", False
-        )
-        data["cnpg_barman_plugin_enabled"] = cnpg_barman_plugin_enabled
-
+        "cnpg_barman_plugin_enabled": cnpg_enabled
+        and data.get("cnpg_barman_plugin_enabled", False),
         # pgvector extension - enabled when cnpg and pgvector are both enabled
-        cnpg_pgvector_enabled = cnpg_enabled and data.get(
-            "cnpg_pgvector_enabled", False
-        )
-        data["cnpg_pgvector_enabled"] = cnpg_pgvector_enabled
-
-        # Default pgvector image and version
-        cnpg_pgvector_image = data.get(
-            "cnpg_pgvector_image",
-            "ghcr.io/cloudnative-pg/pgvector:0.8.1-18-trixie",
-        )
-        data["cnpg_pgvector_image"] = cnpg_pgvector_image
-        data.setdefault("cnpg_pgvector_version", "0.8.1")
-
-        # Keycloak OIDC Provider - enabled when keycloak_enabled is true
-        keycloak_enabled = data.get("keycloak_enabled", False)
-        data["keycloak_enabled"] = keycloak_enabled
-
-        if keycloak_enabled:
-            # Derive full hostname from subdomain + cloudflare_domain
-            keycloak_subdomain = data.get("keycloak_subdomain", "auth")
-            cloudflare_domain = data.get("cloudflare_domain", "")
-            keycloak_hostname = f"{keycloak_subdomain}.{cloudflare_domain}"
-            data["keycloak_hostname"] = keycloak_hostname
-
-            # Derive OIDC endpoints for SecurityPolicy integration
-            keycloak_realm = data.get("keycloak_realm", "matherlynet")
-            data["keycloak_realm"] = keycloak_realm
-            data["keycloak_issuer_url"] = (
-                f"https://{keycloak_hostname}/realms/{keycloak_realm}"
-            )
-            # Internal issuer URL for backchannel OIDC discovery (pod-to-pod)
-            # Used by apps like Langfuse that need to reach Keycloak from inside the cluster
-            # Keycloak's backchannelDynamic:true returns external issuer in tokens but
-            # internal URLs for token/userinfo endpoints when queried via internal URL
-            data["keycloak_internal_issuer_url"] = (
-                f"http://keycloak-service.identity.svc.cluster.local:8080/realms/{keycloak_realm}"
-            )
-            data["keycloak_jwks_uri"] = (
-                f"https://{keycloak_hostname}/realms/{keycloak_realm}/protocol/openid-connect/certs"
-            )
-
-            # Auto-populate OIDC JWT variables from Keycloak if not explicitly set
-            # This enables JWT SecurityPolicy when Keycloak is deployed without
-            # requiring manual oidc_* configuration in cluster.yaml
-            if not data.get("oidc_issuer_url"):
-                data["oidc_issuer_url"] = data["keycloak_issuer_url"]
-            if not data.get("oidc_jwks_uri"):
-                data["oidc_jwks_uri"] = data["keycloak_jwks_uri"]
-            if not data.get("oidc_provider_name"):
-                data["oidc_provider_name"] = "keycloak"
-
-            # Recalculate oidc_enabled now that Keycloak values may have been applied
-            # This must happen here (inside keycloak block) to override the earlier check
-            data["oidc_enabled"] = bool(
-                data.get("oidc_issuer_url") and data.get("oidc_jwks_uri")
-            )
-
-            # Default operator version
-            data.setdefault("keycloak_operator_version", "26.5.0")
-
-            # Default database settings
-            data.setdefault("keycloak_db_mode", "embedded")
-            data.setdefault("keycloak_db_name", "keycloak")
-            data.setdefault("keycloak_db_user", "keycloak")
-            data.setdefault("keycloak_db_instances", 1)
-            data.setdefault("keycloak_replicas", 1)
-            data.setdefault("keycloak_storage_size", "5Gi")
-
-            # When Keycloak uses CNPG mode, require cnpg_enabled
-            keycloak_db_mode = data.get("keycloak_db_mode", "embedded")
-            if keycloak_db_mode == "cnpg" and not cnpg_enabled:
-                # This will be caught by CUE validation, but set a flag for clarity
-                data["keycloak_cnpg_missing"] = True
-
-            # Keycloak PostgreSQL backup - enabled when RustFS and credentials are provided
-            # Works with both CNPG mode (barmanObjectStore) and embedded mode (pg_dump CronJob)
-            keycloak_backup_enabled = (
-                data.get("rustfs_enabled", False)
-                and data.get("keycloak_s3_access_key")
-                and data.get("keycloak_s3_secret_key")
-            )
-            data["keycloak_backup_enabled"] = keycloak_backup_enabled
-
-            # Keycloak OpenTelemetry tracing - requires global tracing_enabled
-            # When both are true, Keycloak exports traces to Tempo via OTLP gRPC
-            keycloak_tracing_enabled = data.get("tracing_enabled", False) and data.get(
-                "keycloak_tracing_enabled", False
-            )
-            data["keycloak_tracing_enabled"] = keycloak_tracing_enabled
-
-            # Keycloak Grafana monitoring - requires global monitoring_enabled
-            # When both are true, Keycloak deploys ServiceMonitor and dashboards
-            keycloak_monitoring_enabled = data.get(
-                "monitoring_enabled", False
-            ) and data.get("keycloak_monitoring_enabled", False)
-            data["keycloak_monitoring_enabled"] = keycloak_monitoring_enabled
-        else:
-            data["keycloak_backup_enabled"] = False
-            data["keycloak_tracing_enabled"] = False
-            data["keycloak_monitoring_enabled"] = False
-
-        # RustFS Grafana monitoring - requires global monitoring_enabled
-        # When both are true, RustFS deploys ServiceMonitor and dashboards
-        if data.get("rustfs_enabled", False):
-            rustfs_monitoring_enabled = data.get(
-                "monitoring_enabled", False
-            ) and data.get("rustfs_monitoring_enabled", False)
-            data["rustfs_monitoring_enabled"] = rustfs_monitoring_enabled
-        else:
-            data["rustfs_monitoring_enabled"] = False
-
-        # Loki Grafana monitoring - requires global monitoring_enabled
-        # When both are true, Loki deploys supplemental stack monitoring dashboard
-        if data.get("loki_enabled", False):
-            loki_monitoring_enabled = data.get(
-                "monitoring_enabled", False
-            ) and data.get("loki_monitoring_enabled", False)
-            data["loki_monitoring_enabled"] = loki_monitoring_enabled
-        else:
-            data["loki_monitoring_enabled"] = False
-
-        # Grafana OIDC - native OAuth for Grafana RBAC
-        # Requires monitoring_enabled, keycloak_enabled, and explicit enable with client secret
-        # When enabled, creates dedicated Keycloak client and configures Grafana auth.generic_oauth
-        grafana_oidc_enabled = (
+        "cnpg_pgvector_enabled": cnpg_enabled and data.get("cnpg_pgvector_enabled", False),
+    }
+
+
+# Default PostgreSQL and pgvector images for CNPG clusters
+RULES.add(
+    defaults_rule(
+        "derive_cnpg_defaults",
+        cue_defaults(
+            "cnpg_postgres_image", "cnpg_pgvector_image", "cnpg_pgvector_version"
+        ),
+    )
+)
+
+
+# Keycloak OIDC Provider - enabled when keycloak_enabled is true
+# Derive full hostname from subdomain + cloudflare_domain
+@RULES.rule(
+    inputs=["keycloak_subdomain", "cloudflare_domain"],
+    outputs=["keycloak_enabled", "keycloak_hostname", "keycloak_realm"],
+)
+def derive_keycloak_enabled(data: Mapping[str, Any]) -> dict[str, Any]:
+    keycloak_enabled = data.get("keycloak_enabled", False)
+    if not keycloak_enabled:
+        return {"keycloak_enabled": keycloak_enabled}
+    keycloak_subdomain = data.get("keycloak_subdomain", "auth")
+    cloudflare_domain = data.get("cloudflare_domain", "")
+    return {
+        "keycloak_enabled": keycloak_enabled,
+        "keycloak_hostname": f"{keycloak_subdomain}.{cloudflare_domain}",
+        "keycloak_realm": data.get("keycloak_realm", "matherlynet"),
+    }
+
+
+# Derive OIDC endpoints for SecurityPolicy integration
+@RULES.rule(
+    inputs=["keycloak_enabled", "keycloak_hostname", "keycloak_realm"],
+    outputs=["keycloak_issuer_url", "keycloak_internal_issuer_url", "keycloak_jwks_uri"],
+)
+def derive_keycloak_urls(data: Mapping[str, Any]) -> dict[str, Any]:
+    if not data["keycloak_enabled"]:
+        return {}
+    keycloak_hostname = data["keycloak_hostname"]
+    keycloak_realm = data["keycloak_realm"]
+    return {
+        "keycloak_issuer_url": f"https://{keycloak_hostname}/realms/{keycloak_realm}",
+        # Internal issuer URL for backchannel OIDC discovery (pod-to-pod)
+        # Used by apps like Langfuse that need to reach Keycloak from inside the cluster
+        # Keycloak's backchannelDynamic:true returns external issuer in tokens but
+        # internal URLs for token/userinfo endpoints when queried via internal URL
+        "keycloak_internal_issuer_url": (
+            f"http://keycloak-service.identity.svc.cluster.local:8080/realms/{keycloak_realm}"
+        ),
+        "keycloak_jwks_uri": (
+            f"https://{keycloak_hostname}/realms/{keycloak_realm}/protocol/openid-connect/certs"
+        ),
+    }
+
+
+# Auto-populate OIDC JWT variables from Keycloak if not explicitly set
+# This enables JWT SecurityPolicy when Keycloak is deployed without
+# requiring manual oidc_* configuration in cluster.yaml
+@RULES.rule(
+    inputs=["keycloak_enabled", "keycloak_issuer_url", "keycloak_jwks_uri"],
+    outputs=["oidc_issuer_url", "oidc_jwks_uri", "oidc_provider_name"],
+)
+def derive_keycloak_oidc(data: Mapping[str, Any]) -> dict[str, Any]:
+    if not data["keycloak_enabled"]:
+        return {}
+    derived = {}
+    if not data.get("oidc_issuer_url"):
+        derived["oidc_issuer_url"] = data["keycloak_issuer_url"]
+    if not data.get("oidc_jwks_uri"):
+        derived["oidc_jwks_uri"] = data["keycloak_jwks_uri"]
+    if not data.get("oidc_provider_name"):
+        derived["oidc_provider_name"] = "keycloak"
+    return derived
+
+
+# Default operator version and database settings
+RULES.add(
+    defaults_rule(
+        "derive_keycloak_defaults",
+        cue_defaults(
+            "keycloak_operator_version",
+            "keycloak_db_mode",
+            "keycloak_db_name",
+            "keycloak_db_user",
+            "keycloak_db_instances",
+            "keycloak_replicas",
+            "keycloak_storage_size",
+        ),
+        when="keycloak_enabled",
+    )
+)
+
+
+@RULES.rule(
+    inputs=[
+        "keycloak_enabled",
+        "keycloak_db_mode",
+        "cnpg_enabled",
+        "rustfs_enabled",
+        "keycloak_s3_access_key",
+        "keycloak_s3_secret_key",
+        "tracing_enabled",
+        "monitoring_enabled",
+    ],
+    outputs=[
+        "keycloak_cnpg_missing",
+        "keycloak_backup_enabled",
+        "keycloak_tracing_enabled",
+        "keycloak_monitoring_enabled",
+    ],
+)
+def derive_keycloak_features(data: Mapping[str, Any]) -> dict[str, Any]:
+    if not data["keycloak_enabled"]:
+        return {
+            "keycloak_backup_enabled": False,
+            "keycloak_tracing_enabled": False,
+            "keycloak_monitoring_enabled": False,
+        }
+    derived = {
+        # Keycloak PostgreSQL backup - enabled when RustFS and credentials are provided
+        # Works with both CNPG mode (barmanObjectStore) and embedded mode (pg_dump CronJob)
+        "keycloak_backup_enabled": (
+            data.get("rustfs_enabled", False)
+            and data.get("keycloak_s3_access_key")
+            and data.get("keycloak_s3_secret_key")
+        ),
+        # Keycloak OpenTelemetry tracing - requires global tracing_enabled
+        # When both are true, Keycloak exports traces to Tempo via OTLP gRPC
+        "keycloak_tracing_enabled": data.get("tracing_enabled", False)
+        and data.get("keycloak_tracing_enabled", False),
+        # Keycloak Grafana monitoring - requires global monitoring_enabled
+        # When both are true, Keycloak deploys ServiceMonitor and dashboards
+        "keycloak_monitoring_enabled": data.get("monitoring_enabled", False)
+        and data.get("keycloak_monitoring_enabled", False),
+    }
+    # When Keycloak uses CNPG mode, require cnpg_enabled
+    if data.get("keycloak_db_mode", "embedded") == "cnpg" and not data["cnpg_enabled"]:
+        # This will be caught by CUE validation, but set a flag for clarity
+        derived["keycloak_cnpg_missing"] = True
+    return derived
+
+
+# RustFS Grafana monitoring - requires global monitoring_enabled
+# When both are true, RustFS deploys ServiceMonitor and dashboards
+@RULES.rule(
+    inputs=["rustfs_enabled", "monitoring_enabled"],
+    outputs=["rustfs_monitoring_enabled"],
+)
+def derive_rustfs_monitoring_enabled(data: Mapping[str, Any]) -> dict[str, Any]:
+    if not data.get("rustfs_enabled", False):
+        return {"rustfs_monitoring_enabled": False}
+    return {
+        "rustfs_monitoring_enabled": data.get("monitoring_enabled", False)
+        and data.get("rustfs_monitoring_enabled", False)
+    }
+
+
+# Loki Grafana monitoring - requires global monitoring_enabled
+# When both are true, Loki deploys supplemental stack monitoring dashboard
+@RULES.rule(
+    inputs=["loki_enabled", "monitoring_enabled"], outputs=["loki_monitoring_enabled"]
+)
+def derive_loki_monitoring_enabled(data: Mapping[str, Any]) -> dict[str, Any]:
+    if not data.get("loki_enabled", False):
+        return {"loki_monitoring_enabled": False}
+    return {
+        "loki_monitoring_enabled": data.get("monitoring_enabled", False)
+        and data.get("loki_monitoring_enabled", False)
+    }
+
+
+# Grafana OIDC - native OAuth for Grafana RBAC
+# Requires monitoring_enabled, keycloak_enabled, and explicit enable with client secret
+# When enabled, creates dedicated Keycloak client and configures Grafana auth.generic_oauth
+@RULES.rule(
+    inputs=["monitoring_enabled", "keycloak_enabled", "grafana_oidc_client_secret"],
+    outputs=["grafana_oidc_enabled"],
+)
+def derive_grafana_oidc_enabled(data: Mapping[str, Any]) -> dict[str, Any]:
+    return {
+        "grafana_oidc_enabled": (
             data.get("monitoring_enabled", False)
             and data.get("keycloak_enabled", False)
             and data.get("grafana_oidc_enabled", False)
             and data.get("grafana_oidc_client_secret")
         )
-        data["grafana_oidc_enabled"] = grafana_oidc_enabled
-
-        # OIDC SSO (Web browser authentication) - requires explicit enable and client credentials
-        # Distinct from oidc_enabled (JWT API auth) - this enables session-based browser SSO
-        # Requires: oidc_issuer_url (shared with JWT), client_id, client_secret
-        # Optional: oidc_redirect_url (omit for dynamic redirect based on request hostname)
-        oidc_sso_enabled = (
+    }
+
+
+# OIDC SSO (Web browser authentication) - requires explicit enable and client credentials
+# Distinct from oidc_enabled (JWT API auth) - this enables session-based browser SSO
+# Requires: oidc_issuer_url (shared with JWT), client_id, client_secret
+# Optional: oidc_redirect_url (omit for dynamic redirect based on request hostname)
+@RULES.rule(
+    inputs=["oidc_issuer_url", "oidc_client_id", "oidc_client_secret"],
+    outputs=["oidc_sso_enabled"],
+)
+def derive_oidc_sso_enabled(data: Mapping[str, Any]) -> dict[str, Any]:
+    return {
+        "oidc_sso_enabled": (
             data.get("oidc_sso_enabled", False)
             and data.get("oidc_issuer_url")
             and data.get("oidc_client_id")
             and data.get("oidc_client_secret")
         )
-        data["oidc_sso_enabled"] = oidc_sso_enabled
-
-        # Keycloak OIDC client bootstrap - auto-create envoy-gateway client in realm import
-        # When keycloak_enabled + oidc_sso_enabled + oidc_client_secret are all set,
-        # the OIDC client is automatically bootstrapped with the provided secret.
-        # This eliminates manual Keycloak admin console setup for the Envoy Gateway client.
-        keycloak_bootstrap_oidc_client = (
-            keycloak_enabled and oidc_sso_enabled and data.get("oidc_client_secret")
+    }
+
+
+# Keycloak OIDC client bootstrap - auto-create envoy-gateway client in realm import
+# When keycloak_enabled + oidc_sso_enabled + oidc_client_secret are all set,
+# the OIDC client is automatically bootstrapped with the provided secret.
+# This eliminates manual Keycloak admin console setup for the Envoy Gateway client.
+@RULES.rule(
+    inputs=["keycloak_enabled", "oidc_sso_enabled", "oidc_client_secret"],
+    outputs=["keycloak_bootstrap_oidc_client"],
+)
+def derive_keycloak_bootstrap_oidc_client(data: Mapping[str, Any]) -> dict[str, Any]:
+    return {
+        "keycloak_bootstrap_oidc_client": (
+            data["keycloak_enabled"]
+            and data["oidc_sso_enabled"]
+            and data.get("oidc_client_secret")
         )
-        data["keycloak_bootstrap_oidc_client"] = keycloak_bootstrap_oidc_client
+    }
 
-        # Dragonfly cache - Redis-compatible in-memory data store
-        # Enabled when dragonfly_enabled is true
-        dragonfly_enabled = data.get("dragonfly_enabled", False)
-        data["dragonfly_enabled"] = dragonfly_enabled
 
-        if dragonfly_enabled:
+# Dragonfly cache - Redis-compatible in-memory data store
+# Enabled when dragonfly_enabled is true
+RULES.add(
+    defaults_rule(
+        "derive_dragonfly_defaults",
+        cue_defaults(
             # Default versions
-            data.setdefault("dragonfly_version", "v1.36.0")
-            data.setdefault("dragonfly_operator_version", "1.3.1")
-            data.setdefault("dragonfly_replicas", 1)
-            data.setdefault("dragonfly_maxmemory", "512mb")
-            data.setdefault("dragonfly_threads", 2)
-
+            "dragonfly_version",
+            "dragonfly_operator_version",
+            "dragonfly_replicas",
+            "dragonfly_maxmemory",
+            "dragonfly_threads",
             # Performance and debugging defaults
-            data.setdefault("dragonfly_cache_mode", False)
-            data.setdefault("dragonfly_slowlog_threshold", 10000)
-            data.setdefault("dragonfly_slowlog_max_len", 128)
-
-            # Backup configuration - requires RustFS and credentials
-            dragonfly_backup_enabled = (
-                data.get("rustfs_enabled", False)
-                and data.get("dragonfly_backup_enabled", False)
-                and data.get("dragonfly_s3_access_key")
-                and data.get("dragonfly_s3_secret_key")
-            )
-            data["dragonfly_backup_enabled"] = dragonfly_backup_enabled
-
-            # Monitoring configuration - requires global monitoring_enabled
-            dragonfly_monitoring_enabled = data.get(
-                "monitoring_enabled", False
-            ) and data.get("dragonfly_monitoring_enabled", False)
-            data["dragonfly_monitoring_enabled"] = dragonfly_monitoring_enabled
-
-            # ACL configuration - enabled when explicitly set
-            dragonfly_acl_enabled = data.get("dragonfly_acl_enabled", False)
-            data["dragonfly_acl_enabled"] = dragonfly_acl_enabled
-        else:
-            data["dragonfly_backup_enabled"] = False
-            data["dragonfly_monitoring_enabled"] = False
-            data["dragonfly_acl_enabled"] = False
-
-        # LiteLLM Proxy Gateway - AI model gateway with multi-provider support
-        # Enabled when litellm_enabled is true
-        litellm_enabled = data.get("litellm_enabled", False)
-        data["litellm_enabled"] = litellm_enabled
-
-        if litellm_enabled:
-            # Derive full hostname from subdomain + cloudflare_domain
-            litellm_subdomain = data.get("litellm_subdomain", "litellm")
-            cloudflare_domain = data.get("cloudflare_domain", "")
-            litellm_hostname = f"{litellm_subdomain}.{cloudflare_domain}"
-            data["litellm_hostname"] = litellm_hostname
-
-            # Default settings
-            data.setdefault("litellm_replicas", 1)
-            data.setdefault("litellm_db_name", "litellm")
-            data.setdefault("litellm_db_user", "litellm")
-            data.setdefault("litellm_db_instances", 1)
-
+            "dragonfly_cache_mode",
+            "dragonfly_slowlog_threshold",
+            "dragonfly_slowlog_max_len",
+        ),
+        when="dragonfly_enabled",
+    )
+)
+
+
+@RULES.rule(
+    inputs=[
+        "rustfs_enabled",
+        "dragonfly_s3_access_key",
+        "dragonfly_s3_secret_key",
+        "monitoring_enabled",
+    ],
+    outputs=[
+        "dragonfly_enabled",
+        "dragonfly_backup_enabled",
+        "dragonfly_monitoring_enabled",
+        "dragonfly_acl_enabled",
+    ],
+)
+def derive_dragonfly(data: Mapping[str, Any]) -> dict[str, Any]:
+    dragonfly_enabled = data.get("dragonfly_enabled", False)
+    if not dragonfly_enabled:
+        return {
+            "dragonfly_enabled": dragonfly_enabled,
+            "dragonfly_backup_enabled": False,
+            "dragonfly_monitoring_enabled": False,
+            "dragonfly_acl_enabled": False,
+        }
+    return {
+        "dragonfly_enabled": dragonfly_enabled,
+        # Backup configuration - requires RustFS and credentials
+        "dragonfly_backup_enabled": (
+            data.get("rustfs_enabled", False)
+            and data.get("dragonfly_backup_enabled", False)
+            and data.get("dragonfly_s3_access_key")
+            and data.get("dragonfly_s3_secret_key")
+        ),
+        # Monitoring configuration - requires global monitoring_enabled
+        "dragonfly_monitoring_enabled": data.get("monitoring_enabled", False)
+        and data.get("dragonfly_monitoring_enabled", False),
+        # ACL configuration - enabled when explicitly set
+        "dragonfly_acl_enabled": data.get("dragonfly_acl_enabled", False),
+    }
+
+
+# LiteLLM Proxy Gateway - AI model gateway with multi-provider support
+# Enabled when litellm_enabled is true
+RULES.add(
+    defaults_rule(
+        "derive_litellm_defaults",
+        cue_defaults(
+            "litellm_replicas",
+            "litellm_db_name",
+            "litellm_db_user",
+            "litellm_db_instances",
             # Azure OpenAI API version defaults
             # These are used in credential_list for centralized credential management
-            data.setdefault("azure_openai_us_east_api_version", "2025-01-01-preview")
-            data.setdefault("azure_openai_us_east2_api_version", "2025-04-01-preview")
-
-            # LiteLLM OIDC - native SSO for LiteLLM UI
-            # Requires keycloak_enabled and explicit enable with client secret
-            litellm_oidc_enabled = (
-                data.get("keycloak_enabled", False)
-                and data.get("litellm_oidc_enabled", False)
-                and data.get("litellm_oidc_client_secret")
-            )
-            data["litellm_oidc_enabled"] = litellm_oidc_enabled
-
-            # LiteLLM backup - enabled when RustFS and credentials are provided
-            litellm_backup_enabled = (
-                data.get("rustfs_enabled", False)
-                and data.get("litellm_s3_access_key")
-                and data.get("litellm_s3_secret_key")
-            )
-            data["litellm_backup_enabled"] = litellm_backup_enabled
-
-            # LiteLLM Grafana monitoring - requires global monitoring_enabled
-            litellm_monitoring_enabled = data.get(
-                "monitoring_enabled", False
-            ) and data.get("litellm_monitoring_enabled", False)
-            data["litellm_monitoring_enabled"] = litellm_monitoring_enabled
-
-            # LiteLLM OpenTelemetry tracing - requires global tracing_enabled
-            litellm_tracing_enabled = data.get("tracing_enabled", False) and data.get(
-                "litellm_tracing_enabled", False
-            )
-            data["litellm_tracing_enabled"] = litellm_tracing_enabled
-
-            # Langfuse observability - optional LLM observability
-            # Can connect to self-hosted Langfuse (langfuse_enabled) or Langfuse Cloud
-            litellm_langfuse_enabled = (
-                data.get("litellm_langfuse_enabled", False)
-                and data.get("litellm_langfuse_public_key")
-                and data.get("litellm_langfuse_secret_key")
-            )
-            data["litellm_langfuse_enabled"] = litellm_langfuse_enabled
-
-            # Auto-derive Langfuse host URL for self-hosted Langfuse
-            # If langfuse_enabled (self-hosted), use internal cluster URL
-            # Otherwise, use the configured host (defaults to cloud.langfuse.com)
-            if data.get("langfuse_enabled", False):
-                data.setdefault(
-                    "litellm_langfuse_host",
-                    "http://langfuse-web.ai-system.svc.cluster.local:3000",
-                )
-            else:
-                data.setdefault("litellm_langfuse_host", "https://cloud.langfuse.com")
-
-            # LiteLLM Alerting - Slack/Discord webhook notifications
-            # Enabled when alerting flag is set and at least one webhook is configured
-            litellm_alerting_enabled = data.get("litellm_alerting_enabled", False) and (
-                data.get("litellm_slack_webhook_url")
-                or data.get("litellm_discord_webhook_url")
-            )
-            data["litellm_alerting_enabled"] = litellm_alerting_enabled
-            data.setdefault("litellm_alerting_threshold", 300)
-
-            # LiteLLM Guardrails - content safety and security
-            # Each guardrail feature can be independently enabled
-            litellm_guardrails_enabled = data.get("litellm_guardrails_enabled", False)
-            data["litellm_guardrails_enabled"] = litellm_guardrails_enabled
-
-            litellm_presidio_enabled = data.get("litellm_presidio_enabled", False)
-            data["litellm_presidio_enabled"] = litellm_presidio_enabled
+            "azure_openai_us_east_api_version",
+            "azure_openai_us_east2_api_version",
+            "litellm_alerting_threshold",
+        ),
+        when="litellm_enabled",
+    )
+)
+
+
+@RULES.rule(
+    inputs=[
+        "litellm_subdomain",
+        "cloudflare_domain",
+        "keycloak_enabled",
+        "litellm_oidc_client_secret",
+        "rustfs_enabled",
+        "litellm_s3_access_key",
+        "litellm_s3_secret_key",
+        "monitoring_enabled",
+        "tracing_enabled",
+        "litellm_langfuse_public_key",
+        "litellm_langfuse_secret_key",
+        "langfuse_enabled",
+        "litellm_slack_webhook_url",
+        "litellm_discord_webhook_url",
+    ],
+    outputs=[
+        "litellm_enabled",
+        "litellm_hostname",
+        "litellm_oidc_enabled",
+        "litellm_backup_enabled",
+        "litellm_monitoring_enabled",
+        "litellm_tracing_enabled",
+        "litellm_langfuse_enabled",
+        "litellm_langfuse_host",
+        "litellm_alerting_enabled",
+        "litellm_guardrails_enabled",
+        "litellm_presidio_enabled",
+        "litellm_prompt_injection_check",
+    ],
+)
+def derive_litellm(data: Mapping[str, Any]) -> dict[str, Any]:
+    litellm_enabled = data.get("litellm_enabled", False)
+    if not litellm_enabled:
+        return {
+            "litellm_enabled": litellm_enabled,
+            "litellm_oidc_enabled": False,
+            "litellm_backup_enabled": False,
+            "litellm_monitoring_enabled": False,
+            "litellm_tracing_enabled": False,
+            "litellm_langfuse_enabled": False,
+            "litellm_alerting_enabled": False,
+            "litellm_guardrails_enabled": False,
+            "litellm_presidio_enabled": False,
+            "litellm_prompt_injection_check": False,
+        }
 
-            litellm_prompt_injection_check = data.get(
-                "litellm_prompt_injection_check", False
+    # Derive full hostname from subdomain + cloudflare_domain
+    litellm_subdomain = data.get("litellm_subdomain", "litellm")
+    cloudflare_domain = data.get("cloudflare_domain", "")
+    derived = {
+        "litellm_enabled": litellm_enabled,
+        "litellm_hostname": f"{litellm_subdomain}.{cloudflare_domain}",
+        # LiteLLM OIDC - native SSO for LiteLLM UI
+        # Requires keycloak_enabled and explicit enable with client secret
+        "litellm_oidc_enabled": (
+            data.get("keycloak_enabled", False)
+            and data.get("litellm_oidc_enabled", False)
+            and data.get("litellm_oidc_client_secret")
+        ),
+        # LiteLLM backup - enabled when RustFS and credentials are provided
+        "litellm_backup_enabled": (
+            data.get("rustfs_enabled", False)
+            and data.get("litellm_s3_access_key")
+            and data.get("litellm_s3_secret_key")
+        ),
+        # LiteLLM Grafana monitoring - requires global monitoring_enabled
+        "litellm_monitoring_enabled": data.get("monitoring_enabled", False)
+        and data.get("litellm_monitoring_enabled", False),
+        # LiteLLM OpenTelemetry tracing - requires global tracing_enabled
+        "litellm_tracing_enabled": data.get("tracing_enabled", False)
+        and data.get("litellm_tracing_enabled", False),
+        # Langfuse observability - optional LLM observability
+        # Can connect to self-hosted Langfuse (langfuse_enabled) or Langfuse Cloud
+        "litellm_langfuse_enabled": (
+            data.get("litellm_langfuse_enabled", False)
+            and data.get("litellm_langfuse_public_key")
+            and data.get("litellm_langfuse_secret_key")
+        ),
+        # LiteLLM Alerting - Slack/Discord webhook notifications
+        # Enabled when alerting flag is set and at least one webhook is configured
+        "litellm_alerting_enabled": data.get("litellm_alerting_enabled", False)
+        and (
+            data.get("litellm_slack_webhook_url")
+            or data.get("litellm_discord_webhook_url")
+        ),
+        # LiteLLM Guardrails - content safety and security
+        # Each guardrail feature can be independently enabled
+        "litellm_guardrails_enabled": data.get("litellm_guardrails_enabled", False),
+        "litellm_presidio_enabled": data.get("litellm_presidio_enabled", False),
+        "litellm_prompt_injection_check": data.get(
+            "litellm_prompt_injection_check", False
+        ),
+    }
+
+    # Auto-derive Langfuse host URL for self-hosted Langfuse
+    # If langfuse_enabled (self-hosted), use internal cluster URL
+    # Otherwise, use the configured host (defaults to cloud.langfuse.com)
+    if "litellm_langfuse_host" not in data:
+        if data.get("langfuse_enabled", False):
+            derived["litellm_langfuse_host"] = (
+                "http://langfuse-web.ai-system.svc.cluster.local:3000"
             )
-            data["litellm_prompt_injection_check"] = litellm_prompt_injection_check
         else:
-            data["litellm_oidc_enabled"] = False
-            data["litellm_backup_enabled"] = False
-            data["litellm_monitoring_enabled"] = False
-            data["litellm_tracing_enabled"] = False
-            data["litellm_langfuse_enabled"] = False
-            data["litellm_alerting_enabled"] = False
-            data["litellm_guardrails_enabled"] = False
-            data["litellm_presidio_enabled"] = False
-            data["litellm_prompt_injection_check"] = False
-
-        # Obot MCP Gateway - AI agent platform with MCP server hosting
-        # Enabled when obot_enabled is true
-        obot_enabled = data.get("obot_enabled", False)
-        data["obot_enabled"] = obot_enabled
-
-        if obot_enabled:
-            # Derive full hostname from subdomain + cloudflare_domain
-            obot_subdomain = data.get("obot_subdomain", "obot")
-            cloudflare_domain = data.get("cloudflare_domain", "")
-            obot_hostname = f"{obot_subdomain}.{cloudflare_domain}"
-            data["obot_hostname"] = obot_hostname
-
-            # Default settings
-            data.setdefault("obot_version", "0.2.33")
-            data.setdefault("obot_replicas", 1)
-            data.setdefault("obot_cpu_request", "500m")
-            data.setdefault("obot_cpu_limit", "2000m")
-            data.setdefault("obot_memory_request", "1Gi")
-            data.setdefault("obot_memory_limit", "4Gi")
-            data.setdefault("obot_mcp_namespace", "obot-mcp")
-            data.setdefault("obot_postgres_user", "obot")
-            data.setdefault("obot_postgres_db", "obot")
-            data.setdefault("obot_postgresql_replicas", 1)
-            data.setdefault("obot_postgresql_storage_size", "10Gi")
-            data.setdefault("obot_storage_size", "20Gi")
-            data.setdefault("obot_workspace_provider", "directory")
-            data.setdefault("obot_s3_bucket", "obot-workspaces")
-            data.setdefault(
-                "obot_s3_endpoint", "http://rustfs-svc.storage.svc.cluster.local:9000"
-            )
-            data.setdefault("obot_s3_region", "us-east-1")
-            data.setdefault("obot_encryption_provider", "custom")
-            data.setdefault("obot_allowed_email_domains", "*")
-            data.setdefault("obot_otel_sample_prob", "0.1")
-            data.setdefault("obot_keycloak_client_id", "obot")
-
-            # Keycloak integration - derive URLs for custom auth provider
-            # Uses jrmatherly/obot-entraid fork with OBOT_KEYCLOAK_AUTH_PROVIDER_* vars
-            if data.get("obot_keycloak_enabled") and data.get("keycloak_enabled"):
-                keycloak_realm = data.get("keycloak_realm", "matherlynet")
-                keycloak_hostname = data.get("keycloak_hostname")
-                # External base URL for OBOT_KEYCLOAK_AUTH_PROVIDER_URL
-                # All traffic routes through Cloudflare Tunnel to avoid hairpin NAT
-                # and ensure OIDC issuer consistency (Keycloak returns external issuer)
-                data["obot_keycloak_base_url"] = f"https://{keycloak_hostname}"
-                # Issuer URL for reference (external - matches Keycloak's returned issuer)
-                data["obot_keycloak_issuer_url"] = (
-                    f"https://{keycloak_hostname}/realms/{keycloak_realm}"
-                )
-                # Realm name for OBOT_KEYCLOAK_AUTH_PROVIDER_REALM
-                data["obot_keycloak_realm"] = keycloak_realm
-                data["obot_keycloak_enabled"] = True
-            else:
-                data["obot_keycloak_enabled"] = False
-
-            # Backup enabled when RustFS + credentials configured
-            obot_backup_enabled = (
-                data.get("rustfs_enabled", False)
-                and data.get("obot_s3_access_key")
-                and data.get("obot_s3_secret_key")
-            )
-            data["obot_backup_enabled"] = obot_backup_enabled
-
-            # Audit log export enabled when RustFS + audit credentials configured
-            obot_audit_logs_enabled = (
-                data.get("rustfs_enabled", False)
-                and data.get("obot_audit_s3_access_key")
-                and data.get("obot_audit_s3_secret_key")
-            )
-            data["obot_audit_logs_enabled"] = obot_audit_logs_enabled
-
+            derived["litellm_langfuse_host"] = "https://cloud.langfuse.com"
+    return derived
+
+
+# Obot MCP Gateway - AI agent platform with MCP server hosting
+# Enabled when obot_enabled is true
+RULES.add(
+    defaults_rule(
+        "derive_obot_defaults",
+        {
+            **cue_defaults(
+                "obot_version",
+                "obot_replicas",
+                "obot_cpu_request",
+                "obot_cpu_limit",
+                "obot_memory_request",
+                "obot_memory_limit",
+                "obot_mcp_namespace",
+                "obot_postgres_user",
+                "obot_postgres_db",
+                "obot_postgresql_replicas",
+                "obot_postgresql_storage_size",
+                "obot_storage_size",
+                "obot_workspace_provider",
+                "obot_s3_bucket",
+                "obot_s3_endpoint",
+                "obot_s3_region",
+                "obot_encryption_provider",
+                "obot_allowed_email_domains",
+                "obot_otel_sample_prob",
+                "obot_keycloak_client_id",
+            ),
             # Obot tool registries (default: fork's embedded tools)
             # Comma-separated list of gptscript tool repositories
             # Default uses jrmatherly/obot-entraid fork's embedded tools at /obot-tools/tools
-            obot_tool_registries = data.get(
-                "obot_tool_registries", ["/obot-tools/tools"]
-            )
-            data["obot_tool_registries"] = obot_tool_registries
-
+            "obot_tool_registries": ["/obot-tools/tools"],
             # Obot default MCP catalog (default: none)
             # Pre-populated MCP server catalog accessible to all users
             # Can be GitHub repo URL, HTTP(S) URL, or local path
-            obot_default_mcp_catalog = data.get("obot_default_mcp_catalog", "")
-            data["obot_default_mcp_catalog"] = obot_default_mcp_catalog
-
-            # Monitoring enabled when both flags set
-            obot_monitoring_enabled = data.get(
-                "monitoring_enabled", False
-            ) and data.get("obot_monitoring_enabled", False)
-            data["obot_monitoring_enabled"] = obot_monitoring_enabled
-
-            # Tracing enabled when both flags set
-            obot_tracing_enabled = data.get("tracing_enabled", False) and data.get(
-                "obot_tracing_enabled", False
-            )
-            data["obot_tracing_enabled"] = obot_tracing_enabled
-        else:
-            data["obot_keycloak_enabled"] = False
-            data["obot_backup_enabled"] = False
-            data["obot_audit_logs_enabled"] = False
-            data["obot_monitoring_enabled"] = False
-            data["obot_tracing_enabled"] = False
-
-        # MCP Context Forge - MCP Gateway Platform (IBM)
-        # Enabled when mcp_context_forge_enabled is true
-        mcp_context_forge_enabled = data.get("mcp_context_forge_enabled", False)
-        data["mcp_context_forge_enabled"] = mcp_context_forge_enabled
-
-        if mcp_context_forge_enabled:
-            # Derive full hostname from subdomain + cloudflare_domain
-            mcp_context_forge_subdomain = data.get("mcp_context_forge_subdomain", "mcp")
-            cloudflare_domain = data.get("cloudflare_domain", "")
-            mcp_context_forge_hostname = (
-                f"{mcp_context_forge_subdomain}.{cloudflare_domain}"
-            )
-            data["mcp_context_forge_hostname"] = mcp_context_forge_hostname
-
-            # Default settings
-            data.setdefault("mcp_context_forge_version", "1.0.0-BETA-1")
-            data.setdefault("mcp_context_forge_replicas", 1)
-            data.setdefault("mcp_context_forge_cpu_request", "100m")
-            data.setdefault("mcp_context_forge_cpu_limit", "1000m")
-            data.setdefault("mcp_context_forge_memory_request", "512Mi")
-            data.setdefault("mcp_context_forge_memory_limit", "1Gi")
-            data.setdefault("mcp_context_forge_db_name", "mcpgateway")
-            data.setdefault("mcp_context_forge_db_user", "mcpgateway")
-            data.setdefault("mcp_context_forge_db_instances", 1)
-            data.setdefault("mcp_context_forge_storage_size", "10Gi")
-            data.setdefault("mcp_context_forge_keycloak_client_id", "mcp-context-forge")
+            "obot_default_mcp_catalog": "",
+        },
+        when="obot_enabled",
+    )
+)
+
+
+@RULES.rule(
+    inputs=[
+        "obot_subdomain",
+        "cloudflare_domain",
+        "keycloak_enabled",
+        "keycloak_realm",
+        "keycloak_hostname",
+        "rustfs_enabled",
+        "obot_s3_access_key",
+        "obot_s3_secret_key",
+        "obot_audit_s3_access_key",
+        "obot_audit_s3_secret_key",
+        "monitoring_enabled",
+        "tracing_enabled",
+    ],
+    outputs=[
+        "obot_enabled",
+        "obot_hostname",
+        "obot_keycloak_enabled",
+        "obot_keycloak_base_url",
+        "obot_keycloak_issuer_url",
+        "obot_keycloak_realm",
+        "obot_backup_enabled",
+        "obot_audit_logs_enabled",
+        "obot_monitoring_enabled",
+        "obot_tracing_enabled",
+    ],
+)
+def derive_obot(data: Mapping[str, Any]) -> dict[str, Any]:
+    obot_enabled = data.get("obot_enabled", False)
+    if not obot_enabled:
+        return {
+            "obot_enabled": obot_enabled,
+            "obot_keycloak_enabled": False,
+            "obot_backup_enabled": False,
+            "obot_audit_logs_enabled": False,
+            "obot_monitoring_enabled": False,
+            "obot_tracing_enabled": False,
+        }
 
+    # Derive full hostname from subdomain + cloudflare_domain
+    obot_subdomain = data.get("obot_subdomain", "obot")
+    cloudflare_domain = data.get("cloudflare_domain", "")
+    derived = {
+        "obot_enabled": obot_enabled,
+        "obot_hostname": f"{obot_subdomain}.{cloudflare_domain}",
+        # Backup enabled when RustFS + credentials configured
+        "obot_backup_enabled": (
+            data.get("rustfs_enabled", False)
+            and data.get("obot_s3_access_key")
+            and data.get("obot_s3_secret_key")
+        ),
+        # Audit log export enabled when RustFS + audit credentials configured
+        "obot_audit_logs_enabled": (
+            data.get("rustfs_enabled", False)
+            and data.get("obot_audit_s3_access_key")
+            and data.get("obot_audit_s3_secret_key")
+        ),
+        # Monitoring enabled when both flags set
+        "obot_monitoring_enabled": data.get("monitoring_enabled", False)
+        and data.get("obot_monitoring_enabled", False),
+        # Tracing enabled when both flags set
+        "obot_tracing_enabled": data.get("tracing_enabled", False)
+        and data.get("obot_tracing_enabled", False),
+    }
+
+    # Keycloak integration - derive URLs for custom auth provider
+    # Uses jrmatherly/obot-entraid fork with OBOT_KEYCLOAK_AUTH_PROVIDER_* vars
+    if data.get("obot_keycloak_enabled") and data.get("keycloak_enabled"):
+        keycloak_realm = data.get("keycloak_realm", "matherlynet")
+        keycloak_hostname = data.get("keycloak_hostname")
+        # External base URL for OBOT_KEYCLOAK_AUTH_PROVIDER_URL
+        # All traffic routes through Cloudflare Tunnel to avoid hairpin NAT
+        # and ensure OIDC issuer consistency (Keycloak returns external issuer)
+        derived["obot_keycloak_base_url"] = f"https://{keycloak_hostname}"
+        # Issuer URL for reference (external - matches Keycloak's returned issuer)
+        derived["obot_keycloak_issuer_url"] = (
+            f"https://{keycloak_hostname}/realms/{keycloak_realm}"
+        )
+        # Realm name for OBOT_KEYCLOAK_AUTH_PROVIDER_REALM
+        derived["obot_keycloak_realm"] = keycloak_realm
+        derived["obot_keycloak_enabled"] = True
+    else:
+        derived["obot_keycloak_enabled"] = False
+    return derived
+
+
+# MCP Context Forge - MCP Gateway Platform (IBM)
+# Enabled when mcp_context_forge_enabled is true
+RULES.add(
+    defaults_rule(
+        "derive_mcp_context_forge_defaults",
+        cue_defaults(
+            "mcp_context_forge_version",
+            "mcp_context_forge_replicas",
+            "mcp_context_forge_cpu_request",
+            "mcp_context_forge_cpu_limit",
+            "mcp_context_forge_memory_request",
+            "mcp_context_forge_memory_limit",
+            "mcp_context_forge_db_name",
+            "mcp_context_forge_db_user",
+            "mcp_context_forge_db_instances",
+            "mcp_context_forge_storage_size",
+            "mcp_context_forge_keycloak_client_id",
             # Dynamic Client Registration (DCR) defaults - RFC 7591
-            data.setdefault("mcp_context_forge_dcr_enabled", True)
-            data.setdefault("mcp_context_forge_dcr_allowed_issuers", [])
-            data.setdefault("mcp_context_forge_dcr_default_scopes", "mcp:read")
-
+            "mcp_context_forge_dcr_enabled",
+            "mcp_context_forge_dcr_allowed_issuers",
+            "mcp_context_forge_dcr_default_scopes",
             # HyprMCP anonymous DCR proxy (optional)
-            data.setdefault("mcp_context_forge_hyprmcp_enabled", False)
-
-            # Keycloak integration - derive URLs for native SSO
-            # Uses Keycloak OIDC with KEYCLOAK_* env vars in deployment
-            if data.get("mcp_context_forge_keycloak_enabled") and data.get(
-                "keycloak_enabled"
-            ):
-                keycloak_realm = data.get("keycloak_realm", "matherlynet")
-                keycloak_hostname = data.get("keycloak_hostname")
-                # External issuer URL (matches Keycloak's returned issuer)
-                data["mcp_context_forge_keycloak_issuer_url"] = (
-                    f"https://{keycloak_hostname}/realms/{keycloak_realm}"
-                )
-                # Internal token endpoint for backchannel validation
-                data["mcp_context_forge_keycloak_token_endpoint"] = (
-                    f"http://keycloak-service.identity.svc.cluster.local:8080/realms/{keycloak_realm}/protocol/openid-connect/token"
-                )
-                data["mcp_context_forge_keycloak_enabled"] = True
-            else:
-                data["mcp_context_forge_keycloak_enabled"] = False
-
-            # Backup enabled when RustFS + credentials configured
-            mcp_context_forge_backup_enabled = (
-                data.get("rustfs_enabled", False)
-                and data.get("mcp_context_forge_backup_enabled", False)
-                and data.get("mcp_context_forge_s3_access_key")
-                and data.get("mcp_context_forge_s3_secret_key")
-            )
-            data["mcp_context_forge_backup_enabled"] = mcp_context_forge_backup_enabled
-
-            # Monitoring enabled when both flags set
-            mcp_context_forge_monitoring_enabled = data.get(
-                "monitoring_enabled", False
-            ) and data.get("mcp_context_forge_monitoring_enabled", False)
-            data["mcp_context_forge_monitoring_enabled"] = (
-                mcp_context_forge_monitoring_enabled
-            )
-
-            # Tracing enabled when both flags set
-            mcp_context_forge_tracing_enabled = data.get(
-                "tracing_enabled", False
-            ) and data.get("mcp_context_forge_tracing_enabled", False)
-            data["mcp_context_forge_tracing_enabled"] = (
-                mcp_context_forge_tracing_enabled
-            )
-            data.setdefault("mcp_context_forge_tracing_sample_rate", "0.1")
-
+            "mcp_context_forge_hyprmcp_enabled",
+            "mcp_context_forge_tracing_sample_rate",
             # Internal observability (built-in database-backed tracing with Admin UI)
-            data.setdefault("mcp_context_forge_internal_observability_enabled", True)
-            data.setdefault(
-                "mcp_context_forge_internal_observability_sample_rate", "0.1"
-            )
-
+            "mcp_context_forge_internal_observability_enabled",
+            "mcp_context_forge_internal_observability_sample_rate",
             # Plugins (MCP server extensions)
-            data.setdefault("mcp_context_forge_plugins_enabled", True)
-
+            "mcp_context_forge_plugins_enabled",
             # Header passthrough (forward headers to MCP servers for tracing/auth context)
-            data.setdefault("mcp_context_forge_passthrough_enabled", False)
-            data.setdefault(
-                "mcp_context_forge_passthrough_headers",
-                '["X-Trace-Id", "X-Span-Id", "X-Request-Id"]',
-            )
-            data.setdefault("mcp_context_forge_passthrough_source", "env")
-        else:
-            data["mcp_context_forge_keycloak_enabled"] = False
-            data["mcp_context_forge_backup_enabled"] = False
-            data["mcp_context_forge_monitoring_enabled"] = False
-            data["mcp_context_forge_tracing_enabled"] = False
-
-        # Langfuse LLM Observability - tracing, prompts, evaluation, analytics
-        # Enabled when langfuse_enabled is true
-        langfuse_enabled = data.get("langfuse_enabled", False)
-        data["langfuse_enabled"] = langfuse_enabled
-
-        if langfuse_enabled:
-            # Derive full hostname from subdomain + cloudflare_domain
-            langfuse_subdomain = data.get("langfuse_subdomain", "langfuse")
-            cloudflare_domain = data.get("cloudflare_domain", "")
-            langfuse_hostname = f"{langfuse_subdomain}.{cloudflare_domain}"
-            data["langfuse_hostname"] = langfuse_hostname
-            data["langfuse_url"] = f"https://{langfuse_hostname}"
-
-            # Default settings
-            data.setdefault("langfuse_subdomain", "langfuse")
-            data.setdefault("langfuse_postgres_instances", 1)
-            data.setdefault("langfuse_postgres_storage", "10Gi")
-            data.setdefault("langfuse_clickhouse_storage", "20Gi")
-            data.setdefault("langfuse_clickhouse_replicas", 1)
-            data.setdefault("langfuse_log_level", "info")
-            data.setdefault("langfuse_trace_sampling_ratio", "0.1")
-            data.setdefault("langfuse_web_replicas", 1)
-            data.setdefault("langfuse_worker_replicas", 1)
-
-            # Headless initialization defaults
-            # Default admin display name
-            data.setdefault("langfuse_init_user_name", "Admin")
-            # Default org name derived from cluster_name
-            data.setdefault(
-                "langfuse_init_org_name", data.get("cluster_name", "Langfuse")
-            )
-            # Disable signup defaults to false (allow signups unless explicitly disabled)
-            data.setdefault("langfuse_disable_signup", False)
-
-            # Langfuse SSO - Keycloak OIDC integration
-            # Requires keycloak_enabled and explicit enable with client secret
-            langfuse_sso_enabled = (
-                data.get("keycloak_enabled", False)
-                and data.get("langfuse_sso_enabled", False)
-                and data.get("langfuse_keycloak_client_secret")
-            )
-            data["langfuse_sso_enabled"] = langfuse_sso_enabled
-
-            # Langfuse backup - enabled when RustFS and credentials are provided
-            langfuse_backup_enabled = (
-                data.get("rustfs_enabled", False)
-                and data.get("langfuse_backup_enabled", False)
-                and data.get("langfuse_s3_access_key")
-                and data.get("langfuse_s3_secret_key")
-            )
-            data["langfuse_backup_enabled"] = langfuse_backup_enabled
+            "mcp_context_forge_passthrough_enabled",
+            "mcp_context_forge_passthrough_headers",
+            "mcp_context_forge_passthrough_source",
+        ),
+        when="mcp_context_forge_enabled",
+    )
+)
+
+
+@RULES.rule(
+    inputs=[
+        "mcp_context_forge_subdomain",
+        "cloudflare_domain",
+        "keycloak_enabled",
+        "keycloak_realm",
+        "keycloak_hostname",
+        "rustfs_enabled",
+        "mcp_context_forge_s3_access_key",
+        "mcp_context_forge_s3_secret_key",
+        "monitoring_enabled",
+        "tracing_enabled",
+    ],
+    outputs=[
+        "mcp_context_forge_enabled",
+        "mcp_context_forge_hostname",
+        "mcp_context_forge_keycloak_enabled",
+        "mcp_context_forge_keycloak_issuer_url",
+        "mcp_context_forge_keycloak_token_endpoint",
+        "mcp_context_forge_backup_enabled",
+        "mcp_context_forge_monitoring_enabled",
+        "mcp_context_forge_tracing_enabled",
+    ],
+)
+def derive_mcp_context_forge(data: Mapping[str, Any]) -> dict[str, Any]:
+    mcp_context_forge_enabled = data.get("mcp_context_forge_enabled", False)
+    if not mcp_context_forge_enabled:
+        return {
+            "mcp_context_forge_enabled": mcp_context_forge_enabled,
+            "mcp_context_forge_keycloak_enabled": False,
+            "mcp_context_forge_backup_enabled": False,
+            "mcp_context_forge_monitoring_enabled": False,
+            "mcp_context_forge_tracing_enabled": False,
+        }
 
-            # Langfuse Grafana monitoring - requires global monitoring_enabled
-            langfuse_monitoring_enabled = data.get(
-                "monitoring_enabled", False
-            ) and data.get("langfuse_monitoring_enabled", False)
-            data["langfuse_monitoring_enabled"] = langfuse_monitoring_enabled
+    # Derive full hostname from subdomain + cloudflare_domain
+    mcp_context_forge_subdomain = data.get("mcp_context_forge_subdomain", "mcp")
+    cloudflare_domain = data.get("cloudflare_domain", "")
+    derived = {
+        "mcp_context_forge_enabled": mcp_context_forge_enabled,
+        "mcp_context_forge_hostname": f"{mcp_context_forge_subdomain}.{cloudflare_domain}",
+        # Backup enabled when RustFS + credentials configured
+        "mcp_context_forge_backup_enabled": (
+            data.get("rustfs_enabled", False)
+            and data.get("mcp_context_forge_backup_enabled", False)
+            and data.get("mcp_context_forge_s3_access_key")
+            and data.get("mcp_context_forge_s3_secret_key")
+        ),
+        # Monitoring enabled when both flags set
+        "mcp_context_forge_monitoring_enabled": data.get("monitoring_enabled", False)
+        and data.get("mcp_context_forge_monitoring_enabled", False),
+        # Tracing enabled when both flags set
+        "mcp_context_forge_tracing_enabled": data.get("tracing_enabled", False)
+        and data.get("mcp_context_forge_tracing_enabled", False),
+    }
+
+    # Keycloak integration - derive URLs for native SSO
+    # Uses Keycloak OIDC with KEYCLOAK_* env vars in deployment
+    if data.get("mcp_context_forge_keycloak_enabled") and data.get("keycloak_enabled"):
+        keycloak_realm = data.get("keycloak_realm", "matherlynet")
+        keycloak_hostname = data.get("keycloak_hostname")
+        # External issuer URL (matches Keycloak's returned issuer)
+        derived["mcp_context_forge_keycloak_issuer_url"] = (
+            f"https://{keycloak_hostname}/realms/{keycloak_realm}"
+        )
+        # Internal token endpoint for backchannel validation
+        derived["mcp_context_forge_keycloak_token_endpoint"] = (
+            f"http://keycloak-service.identity.svc.cluster.local:8080/realms/{keycloak_realm}/protocol/openid-connect/token"
+        )
+        derived["mcp_context_forge_keycloak_enabled"] = True
+    else:
+        derived["mcp_context_forge_keycloak_enabled"] = False
+    return derived
+
+
+# Langfuse LLM Observability - tracing, prompts, evaluation, analytics
+# Enabled when langfuse_enabled is true
+RULES.add(
+    defaults_rule(
+        "derive_langfuse_defaults",
+        {
+            **cue_defaults(
+                "langfuse_postgres_instances",
+                "langfuse_postgres_storage",
+                "langfuse_clickhouse_storage",
+                "langfuse_clickhouse_replicas",
+                "langfuse_log_level",
+                "langfuse_trace_sampling_ratio",
+                "langfuse_web_replicas",
+                "langfuse_worker_replicas",
+                # Headless initialization defaults
+                # Default admin display name
+                "langfuse_init_user_name",
+                # Disable signup defaults to false (allow signups unless explicitly disabled)
+                "langfuse_disable_signup",
+                # Default SCIM sync schedule (every 5 minutes)
+                "langfuse_scim_sync_schedule",
+                # Default Keycloak sync client ID
+                "langfuse_sync_keycloak_client_id",
+            ),
+            # Default role mapping (Keycloak roles → Langfuse roles)
+            # admin → ADMIN, operator/developer → MEMBER, default → VIEWER
+            "langfuse_role_mapping": {
+                "admin": "ADMIN",
+                "operator": "MEMBER",
+                "developer": "MEMBER",
+                "default": "VIEWER",
+            },
+        },
+        when="langfuse_enabled",
+    )
+)
+
+
+@RULES.rule(
+    inputs=[
+        "cloudflare_domain",
+        "cluster_name",
+        "keycloak_enabled",
+        "langfuse_keycloak_client_secret",
+        "rustfs_enabled",
+        "langfuse_s3_access_key",
+        "langfuse_s3_secret_key",
+        "monitoring_enabled",
+        "tracing_enabled",
+        "langfuse_scim_public_key",
+        "langfuse_scim_secret_key",
+        "langfuse_sync_keycloak_client_secret",
+    ],
+    outputs=[
+        "langfuse_enabled",
+        "langfuse_subdomain",
+        "langfuse_hostname",
+        "langfuse_url",
+        "langfuse_init_org_name",
+        "langfuse_sso_enabled",
+        "langfuse_backup_enabled",
+        "langfuse_monitoring_enabled",
+        "langfuse_tracing_enabled",
+        "langfuse_scim_sync_enabled",
+    ],
+)
+def derive_langfuse(data: Mapping[str, Any]) -> dict[str, Any]:
+    langfuse_enabled = data.get("langfuse_enabled", False)
+    if not langfuse_enabled:
+        return {
+            "langfuse_enabled": langfuse_enabled,
+            "langfuse_sso_enabled": False,
+            "langfuse_backup_enabled": False,
+            "langfuse_monitoring_enabled": False,
+            "langfuse_tracing_enabled": False,
+            "langfuse_scim_sync_enabled": False,
+        }
 
-            # Langfuse OpenTelemetry tracing - requires global tracing_enabled
-            langfuse_tracing_enabled = data.get("tracing_enabled", False) and data.get(
-                "langfuse_tracing_enabled", False
-            )
-            data["langfuse_tracing_enabled"] = langfuse_tracing_enabled
-
-            # Langfuse SCIM role sync - requires keycloak_enabled and explicit enable
-            # Syncs Keycloak realm roles to Langfuse organization roles via SCIM API
-            # REF: docs/research/langfuse-scim-role-sync-implementation-jan-2026.md
-            langfuse_scim_sync_enabled = (
-                data.get("keycloak_enabled", False)
-                and data.get("langfuse_scim_sync_enabled", False)
-                and data.get("langfuse_scim_public_key")
-                and data.get("langfuse_scim_secret_key")
-                and data.get("langfuse_sync_keycloak_client_secret")
-            )
-            data["langfuse_scim_sync_enabled"] = langfuse_scim_sync_enabled
+    # Derive full hostname from subdomain + cloudflare_domain
+    langfuse_subdomain = data.get("langfuse_subdomain", "langfuse")
+    cloudflare_domain = data.get("cloudflare_domain", "")
+    langfuse_hostname = f"{langfuse_subdomain}.{cloudflare_domain}"
+    return {
+        "langfuse_enabled": langfuse_enabled,
+        "langfuse_subdomain": langfuse_subdomain,
+        "langfuse_hostname": langfuse_hostname,
+        "langfuse_url": f"https://{langfuse_hostname}",
+        # Default org name derived from cluster_name
+        "langfuse_init_org_name": data.get(
+            "langfuse_init_org_name", data.get("cluster_name", "Langfuse")
+        ),
+        # Langfuse SSO - Keycloak OIDC integration
+        # Requires keycloak_enabled and explicit enable with client secret
+        "langfuse_sso_enabled": (
+            data.get("keycloak_enabled", False)
+            and data.get("langfuse_sso_enabled", False)
+            and data.get("langfuse_keycloak_client_secret")
+        ),
+        # Langfuse backup - enabled when RustFS and credentials are provided
+        "langfuse_backup_enabled": (
+            data.get("rustfs_enabled", False)
+            and data.get("langfuse_backup_enabled", False)
+            and data.get("langfuse_s3_access_key")
+            and data.get("langfuse_s3_secret_key")
+        ),
+        # Langfuse Grafana monitoring - requires global monitoring_enabled
+        "langfuse_monitoring_enabled": data.get("monitoring_enabled", False)
+        and data.get("langfuse_monitoring_enabled", False),
+        # Langfuse OpenTelemetry tracing - requires global tracing_enabled
+        "langfuse_tracing_enabled": data.get("tracing_enabled", False)
+        and data.get("langfuse_tracing_enabled", False),
+        # Langfuse SCIM role sync - requires keycloak_enabled and explicit enable
+        # Syncs Keycloak realm roles to Langfuse organization roles via SCIM API
+        # REF: docs/research/langfuse-scim-role-sync-implementation-jan-2026.md
+        "langfuse_scim_sync_enabled": (
+            data.get("keycloak_enabled", False)
+            and data.get("langfuse_scim_sync_enabled", False)
+            and data.get("langfuse_scim_public_key")
+            and data.get("langfuse_scim_secret_key")
+            and data.get("langfuse_sync_keycloak_client_secret")
+        ),
+    }
+
+
+# Infrastructure (OpenTofu/Proxmox) defaults
+# Check if infrastructure provisioning is enabled
+# With several hosts, proxmox_node defaults to the first one; it holds what is
+# not tied to a VM
+@RULES.rule(
+    inputs=["proxmox_api_url", "proxmox_hosts"],
+    outputs=["infrastructure_enabled", "proxmox_node"],
+)
+def derive_infrastructure_enabled(data: Mapping[str, Any]) -> dict[str, Any]:
+    derived = {"infrastructure_enabled": infrastructure_enabled(data)}
+    if derived["infrastructure_enabled"] and "proxmox_node" not in data:
+        derived["proxmox_node"] = data["proxmox_hosts"][0]["name"]
+    return derived
+
+
+@RULES.rule(
+    inputs=["infrastructure_enabled"],
+    outputs=[
+        "proxmox_iso_storage",
+        "proxmox_disk_storage",
+        "proxmox_vm_defaults",
+        "proxmox_vm_controller_defaults",
+        "proxmox_vm_worker_defaults",
+        "proxmox_vm_advanced",
+    ],
+)
+def derive_proxmox_vm_settings(data: Mapping[str, Any]) -> dict[str, Any]:
+    if not data["infrastructure_enabled"]:
+        return {}
+
+    # Set Proxmox storage defaults
+    derived = {
+        key: value
+        for key, value in cue_defaults(
+            "proxmox_iso_storage", "proxmox_disk_storage"
+        ).items()
+        if key not in data
+    }
+
+    # Merge user-provided vm_defaults with our defaults (global fallback)
+    user_vm_defaults = data.get("proxmox_vm_defaults", {})
+    merged_vm_defaults = {**PROXMOX_VM_DEFAULTS, **user_vm_defaults}
+    derived["proxmox_vm_defaults"] = merged_vm_defaults
+
+    # Merge user-provided controller VM defaults with our defaults
+    # Fallback chain: user controller -> built-in controller -> global defaults
+    user_vm_controller = data.get("proxmox_vm_controller_defaults", {})
+    derived["proxmox_vm_controller_defaults"] = {
+        **merged_vm_defaults,  # Start with global defaults
+        **PROXMOX_VM_CONTROLLER_DEFAULTS,  # Apply built-in controller defaults
+        **user_vm_controller,  # Apply user overrides
+    }
+
+    # Merge user-provided worker VM defaults with our defaults
+    # Fallback chain: user worker -> built-in worker -> global defaults
+    user_vm_worker = data.get("proxmox_vm_worker_defaults", {})
+    derived["proxmox_vm_worker_defaults"] = {
+        **merged_vm_defaults,  # Start with global defaults
+        **PROXMOX_VM_WORKER_DEFAULTS,  # Apply built-in worker defaults
+        **user_vm_worker,  # Apply user overrides
+    }
+
+    # Merge user-provided vm_advanced with our defaults
+    user_vm_advanced = data.get("proxmox_vm_advanced", {})
+    derived["proxmox_vm_advanced"] = {**PROXMOX_VM_ADVANCED, **user_vm_advanced}
+    return derived
+
+
+# Target Proxmox host of every node VM. Without proxmox_hosts they all go on
+# proxmox_node, whose capacity is unknown, so nothing is checked
+@RULES.rule(
+    inputs=[
+        "infrastructure_enabled",
+        "nodes",
+        "proxmox_hosts",
+        "proxmox_node",
+        "proxmox_vm_controller_defaults",
+        "proxmox_vm_worker_defaults",
+    ],
+    outputs=["proxmox_vm_placement"],
+)
+def derive_proxmox_vm_placement(data: Mapping[str, Any]) -> dict[str, Any]:
+    if not data["infrastructure_enabled"]:
+        return {}
+    if not data.get("proxmox_hosts"):
+        return {
+            "proxmox_vm_placement": {
+                node["name"]: data["proxmox_node"] for node in data.get("nodes", [])
+            }
+        }
+    placement = plan_placement(
+        data,
+        data["proxmox_vm_controller_defaults"],
+        data["proxmox_vm_worker_defaults"],
+    )
+    return {"proxmox_vm_placement": placement.assignments}
+
+
+# RULES plus the rule bound to a plugin instance; tools that only need the
+# dependency graph (template_index.py) pass a compute function that does nothing
+def build_rules(talos_patch_index: Compute) -> RuleSet:
+    rules = RuleSet(RULES)
+    rules.add(
+        Rule(
+            "derive_talos_patch_index",
+            frozenset(["nodes"]),
+            ("talos_patch_index",),
+            talos_patch_index,
+        )
+    )
+    return rules
 
-            # Default SCIM sync schedule (every 5 minutes)
-            data.setdefault("langfuse_scim_sync_schedule", "*/5 * * * *")
 
-            # Default Keycloak sync client ID
-            data.setdefault("langfuse_sync_keycloak_client_id", "langfuse-sync")
+class Plugin(makejinja.plugin.Plugin):
+    def __init__(
+        self, data: dict[str, Any], config: makejinja.config.Config | None = None
+    ):
+        # Built once; templates see it as a mapping of the fields that are set
+        self._data = Cluster.from_dict(data)
+        self._input_roots = (
+            [Path(path).resolve() for path in config.inputs]
+            if config is not None
+            else [Path("templates/config").resolve()]
+        )
+        # Scanned once so templates never touch the filesystem for patches
+        self._talos_patches = index_talos_patches(self._input_roots)
+        # The talos_patch_index rule needs the patch index, so it is bound here
+        self._derivation = Derivation(build_rules(self._talos_patch_index), self._data)
+        self._derived = False
 
-            # Default role mapping (Keycloak roles → Langfuse roles)
-            # admin → ADMIN, operator/developer → MEMBER, default → VIEWER
-            data.setdefault(
-                "langfuse_role_mapping",
-                {
-                    "admin": "ADMIN",
-                    "operator": "MEMBER",
-                    "developer": "MEMBER",
-                    "default": "VIEWER",
+    def data(self) -> makejinja.plugin.Data:
+        # Derived on the first call; update() keeps the same mapping current afterwards
+        if not self._derived:
+            self._derivation.run()
+            self._derived = True
+        return self._data
+
+    def update(self, data: dict[str, Any]) -> set[str]:
+        """Apply a reloaded config, re-running only the rules downstream of the changed keys.
+
+        Returns the keys whose values may have changed.
+        """
+        return self._derivation.update(Cluster.from_dict(data))
+
+    # Talos patches resolved per role and per node (patches/<node name>/)
+    def _talos_patch_index(self, data: Mapping[str, Any]) -> dict[str, Any]:
+        return {
+            "talos_patch_index": {
+                **{role: self.talos_patches(role) for role in TALOS_PATCH_ROLES},
+                "nodes": {
+                    node["name"]: self.talos_patches(node["name"])
+                    for node in data.get("nodes", [])
+                    if node.get("name")
                 },
-            )
-        else:
-            data["langfuse_sso_enabled"] = False
-            data["langfuse_backup_enabled"] = False
-            data["langfuse_monitoring_enabled"] = False
-            data["langfuse_tracing_enabled"] = False
-            data["langfuse_scim_sync_enabled"] = False
-
-        # Infrastructure (OpenTofu/Proxmox) defaults
-        # Check if infrastructure provisioning is enabled
-        data["infrastructure_enabled"] = infrastructure_enabled(data)
-
-        if data["infrastructure_enabled"]:
-            # Set Proxmox storage defaults
-            data.setdefault("proxmox_iso_storage", "local")
-            data.setdefault("proxmox_disk_storage", "local-lvm")
-
-            # Merge user-provided vm_defaults with our defaults (global fallback)
-            user_vm_defaults = data.get("proxmox_vm_defaults", {})
-            merged_vm_defaults = {**PROXMOX_VM_DEFAULTS, **user_vm_defaults}
-            data["proxmox_vm_defaults"] = merged_vm_defaults
-
-            # Merge user-provided controller VM defaults with our defaults
-            # Fallback chain: user controller -> built-in controller -> global defaults
-            user_vm_controller = data.get("proxmox_vm_controller_defaults", {})
-            merged_vm_controller = {
-                **merged_vm_defaults,  # Start with global defaults
-                **PROXMOX_VM_CONTROLLER_DEFAULTS,  # Apply built-in controller defaults
-                **user_vm_controller,  # Apply user overrides
-            }
-            data["proxmox_vm_controller_defaults"] = merged_vm_controller
-
-            # Merge user-provided worker VM defaults with our defaults
-            # Fallback chain: user worker -> built-in worker -> global defaults
-            user_vm_worker = data.get("proxmox_vm_worker_defaults", {})
-            merged_vm_worker = {
-                **merged_vm_defaults,  # Start with global defaults
-                **PROXMOX_VM_WORKER_DEFAULTS,  # Apply built-in worker defaults
-                **user_vm_worker,  # Apply user overrides
             }
-            data["proxmox_vm_worker_defaults"] = merged_vm_worker
+        }
+
+    def path_filters(self) -> makejinja.plugin.PathFilters:
+        # Called after data(), so the feature flags are already computed
+        # Compared as path parts, since this runs for every file below the inputs
+        disabled = [Path(d).parts for d in disabled_feature_directories(self._data)]
+
+        def skip_disabled_features(path: Path) -> bool:
+            for root in self._input_roots:
+                if path.is_relative_to(root):
+                    parts = path.parts[len(root.parts) :]
+                    return not any(parts[: len(d)] == d for d in disabled)
+            return True
 
-            # Merge user-provided vm_advanced with our defaults
-            user_vm_advanced = data.get("proxmox_vm_advanced", {})
-            merged_vm_advanced = {**PROXMOX_VM_ADVANCED, **user_vm_advanced}
-            data["proxmox_vm_advanced"] = merged_vm_advanced
+        return [skip_disabled_features]
 
-        return data
+    # Return the indexed patch templates for a role or node name
+    def talos_patches(self, value: str) -> list[str]:
+        return list(self._talos_patches.get(value, []))
 
     def filters(self) -> makejinja.plugin.Filters:
         return [basename, nthhost]
@@ -948,6 +1422,6 @@ class Plugin(makejinja.plugin.Plugin):
             cloudflare_tunnel_secret,
             github_deploy_key,
             github_push_token,
-            talos_patches,
+            self.talos_patches,
             infrastructure_enabled,
         ]